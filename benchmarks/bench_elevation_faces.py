@@ -0,0 +1,99 @@
+"""
+Compare the legacy loop-based face generation of elevation_to_mesh with the vectorized
+one, and check that both produce the exact same face arrays.
+
+Usage: uv run python benchmarks/bench_elevation_faces.py [--sizes 500 1500 3601]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from gpx2mesh.mesh.elevation import _grid_faces, _side_faces
+
+
+def legacy_faces(rows, cols):
+    top_faces = []
+    for i in range(rows - 1):
+        for j in range(cols - 1):
+            v1 = i * cols + j
+            v2 = i * cols + (j + 1)
+            v3 = (i + 1) * cols + j
+            v4 = (i + 1) * cols + (j + 1)
+            top_faces.extend([[v1, v2, v3], [v2, v4, v3]])
+
+    bottom_faces = []
+    offset = rows * cols
+    for i in range(rows - 1):
+        for j in range(cols - 1):
+            v1 = offset + i * cols + j
+            v2 = offset + i * cols + (j + 1)
+            v3 = offset + (i + 1) * cols + j
+            v4 = offset + (i + 1) * cols + (j + 1)
+            bottom_faces.extend([[v1, v3, v2], [v2, v3, v4]])
+
+    side_faces = []
+    for j in range(cols - 1):
+        side_faces.extend([[j, offset + j, j + 1], [j + 1, offset + j, offset + j + 1]])
+        back_row = (rows - 1) * cols
+        side_faces.extend(
+            [
+                [back_row + j, back_row + j + 1, offset + back_row + j],
+                [back_row + j + 1, offset + back_row + j + 1, offset + back_row + j],
+            ]
+        )
+    for i in range(rows - 1):
+        left_1 = i * cols
+        left_2 = (i + 1) * cols
+        side_faces.extend(
+            [
+                [left_1, left_2, offset + left_1],
+                [left_2, offset + left_2, offset + left_1],
+            ]
+        )
+        right_1 = i * cols + (cols - 1)
+        right_2 = (i + 1) * cols + (cols - 1)
+        side_faces.extend(
+            [
+                [right_1, offset + right_1, right_2],
+                [right_2, offset + right_1, offset + right_2],
+            ]
+        )
+
+    return np.array(top_faces + bottom_faces + side_faces)
+
+
+def vectorized_faces(rows, cols):
+    offset = rows * cols
+    top_faces = _grid_faces(rows, cols)
+    bottom_faces = top_faces[:, [0, 2, 1]] + offset
+    side_faces = _side_faces(rows, cols, offset)
+    return np.vstack([top_faces, bottom_faces, side_faces])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1500, 3601])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        start = time.perf_counter()
+        legacy = legacy_faces(size, size)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = vectorized_faces(size, size)
+        vectorized_time = time.perf_counter() - start
+
+        identical = np.array_equal(legacy, vectorized)
+        print(
+            f"{size}x{size}: {len(vectorized)} faces, legacy {legacy_time:.3f}s, "
+            f"vectorized {vectorized_time:.3f}s "
+            f"(x{legacy_time / vectorized_time:.0f}), identical: {identical}"
+        )
+        assert identical, f"Face arrays differ for a {size}x{size} grid"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare the boolean clipping of the medal, intersecting the square terrain with a
+cylinder, with the analytic disc meshing, and check that both medals are watertight.
+
+Usage: uv run python benchmarks/bench_medal_clipping.py [--sizes 200 700 1000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from gpx2mesh.mesh import generate_mesh
+
+
+def synthetic_terrain(size, rng):
+    """Smooth random hills, with a wandering track crossing the whole medal."""
+    y, x = np.mgrid[0:size, 0:size] / (size - 1)
+    elevation = np.zeros((size, size))
+    for _ in range(8):
+        fx, fy, phase = rng.uniform(1, 8), rng.uniform(1, 8), rng.uniform(0, 6)
+        elevation += np.sin(fx * x + phase) * np.cos(fy * y)
+
+    steps = rng.normal(scale=0.01, size=(2000, 2))
+    track = np.cumsum(steps, axis=0)
+    track = (track - track.min(axis=0)) / np.ptp(track, axis=0).max()
+    return elevation * 100 + 1000, track
+
+
+def time_clip(elevation, track, clip):
+    start = time.perf_counter()
+    try:
+        mesh = generate_mesh(elevation, track, width=50, clip=clip)
+    except Exception as error:
+        return time.perf_counter() - start, f"failed ({error})"
+    return time.perf_counter() - start, f"watertight: {mesh.is_watertight}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 700, 1000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        elevation, track = synthetic_terrain(size, rng)
+        boolean_time, boolean_status = time_clip(elevation, track, "boolean")
+        disc_time, disc_status = time_clip(elevation, track, "disc")
+        print(
+            f"{size}x{size} terrain: boolean {boolean_time:.2f}s ({boolean_status}), "
+            f"disc {disc_time:.2f}s ({disc_status}), x{boolean_time / disc_time:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
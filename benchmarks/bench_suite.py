@@ -0,0 +1,297 @@
+"""
+Time and memory-profile the medal generation stages, and the whole build_mesh, on
+synthetic elevation tiles and tracks, and store the results to compare them across
+commits.
+
+Each case is a track pattern (within a tile, across a tile edge or a tile corner) and a
+number of track points. Stages are timed over --repeat runs, then run once more while
+tracing memory allocations for their peak memory. Results are written as JSON to
+benchmarks/results/<commit>.json by default, and compared with a previous results file
+given with --compare, failing if a stage is slower than --threshold times its previous
+time. Comparisons use the fastest run of each stage, less sensitive to noise than the
+median.
+
+Usage: uv run python benchmarks/bench_suite.py [--patterns tile edge corner]
+    [--points 1000 20000] [--repeat 3] [--compare benchmarks/results/<commit>.json]
+"""
+
+import argparse
+from datetime import datetime, timezone
+import io
+import json
+import os
+from pathlib import Path
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import trimesh
+
+from gpx2mesh import build_mesh
+from gpx2mesh.elevation import (
+    get_crop_filenames,
+    get_crop_tiles,
+    load_cropped_elevation_map,
+    load_elevation_map,
+)
+from gpx2mesh.elevation.sources import AssetsFolderProvider
+from gpx2mesh.export import export_mesh
+from gpx2mesh.mesh.elevation import elevation_to_disc_mesh, elevation_to_mesh
+from gpx2mesh.mesh.medal import add_ring_and_hook, shape_mesh_into_medal
+from gpx2mesh.mesh.track import add_gpx_track_to_terrain
+from gpx2mesh.profiling import profile, stage
+from gpx2mesh.track import load_track
+from synthetic import TRACK_CENTERS, write_tile, write_track
+
+# Medal dimensions of build_mesh and generate_mesh, in mm
+WIDTH = 50
+DEPTH = 5
+BASE_THICKNESS = 1
+TRACK_HEIGHT = 0.5
+TRACK_WIDTH = 1
+TERRAIN_ERROR = 0.05
+
+RESULTS = Path(__file__).parent / "results"
+
+
+def measure(function, repeat):
+    """
+    Run function repeat times, then once more tracing memory. Returns the timings and
+    peak allocated memory, and the result of the last run.
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+
+    with profile(memory=True) as profiler:
+        with stage("measure"):
+            result = function()
+
+    timings = {
+        "median_s": statistics.median(seconds),
+        "min_s": min(seconds),
+        # Nested stages end, and are recorded, before the measured one
+        "peak_bytes": profiler.records[-1].peak_alloc,
+    }
+    return timings, result
+
+
+def run_case(track_path, assets, repeat):
+    """Benchmark the stages of the medal generation of a track."""
+    provider = AssetsFolderProvider(assets)
+    track, bounds = load_track(track_path)
+    stages = {}
+
+    stages["load_elevation_map"], _ = measure(
+        lambda: load_elevation_map(bounds, provider), repeat
+    )
+    stages["load_cropped_elevation_map"], (elevation, shift, scale) = measure(
+        lambda: load_cropped_elevation_map(bounds, provider), repeat
+    )
+    track = (track - shift) / scale
+
+    stages["elevation_to_mesh"], square_terrain = measure(
+        lambda: elevation_to_mesh(
+            elevation, WIDTH, DEPTH, BASE_THICKNESS, max_error=TERRAIN_ERROR
+        ),
+        repeat,
+    )
+    stages["elevation_to_disc_mesh"], disc_terrain = measure(
+        lambda: elevation_to_disc_mesh(
+            elevation, WIDTH, DEPTH, BASE_THICKNESS, max_error=TERRAIN_ERROR
+        ),
+        repeat,
+    )
+    radius = WIDTH / 2
+    stages["create_track_mesh"], track_mesh = measure(
+        lambda: add_gpx_track_to_terrain(
+            elevation,
+            track,
+            WIDTH,
+            DEPTH,
+            TRACK_HEIGHT,
+            TRACK_WIDTH,
+            clip_radius=radius - TRACK_WIDTH / 2,
+        ),
+        repeat,
+    )
+    stages["shape_mesh_into_medal"], _ = measure(
+        lambda: shape_mesh_into_medal(square_terrain), repeat
+    )
+    disc = trimesh.util.concatenate(
+        [m for m in (disc_terrain, track_mesh) if m is not None]
+    )
+    stages["add_ring_and_hook"], medal = measure(
+        lambda: add_ring_and_hook(disc, radius, radius, radius), repeat
+    )
+    stages["export"], _ = measure(
+        lambda: export_mesh(medal, io.BytesIO(), "stl"), repeat
+    )
+    stages["build_mesh"], _ = measure(
+        lambda: build_mesh(str(track_path), provider), repeat
+    )
+
+    # Breakdown of build_mesh by the stages it reports
+    breakdown = {}
+    for _ in range(repeat):
+        with profile() as profiler:
+            build_mesh(str(track_path), provider)
+        for record in profiler.records:
+            breakdown.setdefault(record.name, []).append(record.wall)
+
+    return {
+        "tiles": get_crop_filenames(bounds),
+        "grid": list(elevation.shape),
+        "faces": len(medal.faces),
+        "stages": stages,
+        "build_mesh_stages": {
+            name: statistics.median(walls) for name, walls in breakdown.items()
+        },
+    }
+
+
+def git_commit():
+    """Short hash of the current commit, suffixed with -dirty for local changes."""
+    root = Path(__file__).parent
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if status.strip() else commit
+
+
+def compare(results, baseline, threshold):
+    """Print the time ratios of each stage, returning the regressed stages."""
+    previous_cases = {
+        (case["pattern"], case["points"]): case for case in baseline["cases"]
+    }
+    print(f"\nComparison with {baseline['commit']} (ratio = new / old fastest run)")
+    regressions = []
+    for case in results["cases"]:
+        previous = previous_cases.get((case["pattern"], case["points"]))
+        if previous is None:
+            continue
+        for name, timings in case["stages"].items():
+            if name not in previous["stages"]:
+                continue
+            old = previous["stages"][name]["min_s"]
+            ratio = timings["min_s"] / max(old, 1e-9)
+            flag = ""
+            if ratio > threshold:
+                flag = "  REGRESSION"
+                regressions.append((case["pattern"], case["points"], name))
+            print(
+                f"  {case['pattern']:<7} {case['points']:>7} {name:<27} "
+                f"{old * 1e3:>9.1f} ms -> {timings['min_s'] * 1e3:>9.1f} ms "
+                f"x{ratio:.2f}{flag}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--patterns",
+        nargs="+",
+        choices=list(TRACK_CENTERS),
+        default=list(TRACK_CENTERS),
+    )
+    parser.add_argument("--points", type=int, nargs="+", default=[1000, 20000])
+    parser.add_argument(
+        "--extent", type=float, default=0.1, help="track size, in degrees"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=Path(tempfile.gettempdir()) / "gpx2mesh-benchmarks",
+        help="folder of the synthetic tiles and tracks, reused between runs",
+    )
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="time ratio over which a stage is reported as a regression",
+    )
+    args = parser.parse_args()
+
+    assets = args.data / f"assets-{args.seed}"
+    os.makedirs(assets, exist_ok=True)
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "options": {
+            "extent": args.extent,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "cases": [],
+    }
+    for pattern in args.patterns:
+        for points in args.points:
+            track_path = write_track(
+                args.data / f"{pattern}-{points}-{args.extent}-{args.seed}.gpx",
+                points,
+                args.extent,
+                pattern,
+                args.seed,
+            )
+            _, bounds = load_track(track_path)
+            for lat, lon in get_crop_tiles(bounds):
+                write_tile(assets, lat, lon, args.seed)
+
+            case = {"pattern": pattern, "points": points}
+            case.update(run_case(track_path, assets, args.repeat))
+            results["cases"].append(case)
+
+            print(
+                f"{pattern} track, {points} points, {len(case['tiles'])} tiles, "
+                f"{case['grid'][0]}x{case['grid'][1]} grid, {case['faces']} faces"
+            )
+            for name, timings in case["stages"].items():
+                print(
+                    f"  {name:<27} {timings['median_s'] * 1e3:>9.1f} ms "
+                    f"(min {timings['min_s'] * 1e3:.1f}), "
+                    f"peak {timings['peak_bytes'] / 1e6:.1f} MB"
+                )
+
+    output = args.output or RESULTS / f"{commit}.json"
+    os.makedirs(output.parent, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written in {output}")
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Compare the legacy loop-based track ribbon construction of create_track_mesh with the
+vectorized one, and check that both produce the same faces, and the same vertices up to
+floating point rounding.
+
+Usage: uv run python benchmarks/bench_track_ribbon.py [--sizes 1000 50000 500000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from gpx2mesh.mesh.track import _track_ribbon
+
+
+def legacy_ribbon(track_coords, track_elevations, track_height, track_width):
+    unique_indices = [0]
+    for i in range(1, len(track_coords)):
+        if not np.allclose(track_coords[i], track_coords[i - 1], atol=0.01):
+            unique_indices.append(i)
+
+    track_coords = track_coords[unique_indices]
+    track_elevations = track_elevations[unique_indices]
+    track_z = track_elevations + track_height
+
+    vertices = []
+    faces = []
+    for i in range(len(track_coords)):
+        x, y = track_coords[i]
+        z = track_z[i]
+
+        if i == 0:
+            direction = track_coords[i + 1] - track_coords[i]
+        elif i == len(track_coords) - 1:
+            direction = track_coords[i] - track_coords[i - 1]
+        else:
+            dir1 = track_coords[i] - track_coords[i - 1]
+            dir2 = track_coords[i + 1] - track_coords[i]
+            direction = (dir1 + dir2) / 2
+
+        direction_length = np.linalg.norm(direction)
+        if direction_length > 1e-6:
+            direction = direction / direction_length
+            perpendicular = np.array([-direction[1], direction[0]])
+        else:
+            perpendicular = np.array([1, 0])
+
+        half_width = track_width / 2
+        left_point = np.array([x, y]) + perpendicular * half_width
+        right_point = np.array([x, y]) - perpendicular * half_width
+
+        base_idx = len(vertices)
+        vertices.extend(
+            [
+                [left_point[0], left_point[1], z],
+                [right_point[0], right_point[1], z],
+                [left_point[0], left_point[1], track_elevations[i]],
+                [right_point[0], right_point[1], track_elevations[i]],
+            ]
+        )
+
+        if i > 0:
+            p = base_idx - 4
+            c = base_idx
+            faces.extend(
+                [
+                    [p, p + 1, c],
+                    [p + 1, c + 1, c],
+                    [p + 2, c + 2, p + 3],
+                    [p + 3, c + 2, c + 3],
+                    [p, c, p + 2],
+                    [c, c + 2, p + 2],
+                    [p + 1, p + 3, c + 1],
+                    [c + 1, p + 3, c + 3],
+                ]
+            )
+
+    end_base = len(vertices) - 4
+    faces.extend(
+        [
+            [0, 2, 1],
+            [1, 2, 3],
+            [end_base, end_base + 1, end_base + 2],
+            [end_base + 1, end_base + 3, end_base + 2],
+        ]
+    )
+
+    return np.array(vertices), np.array(faces)
+
+
+def random_walk(size, rng):
+    """A wandering track in a 50 mm square, with some repeated points."""
+    steps = rng.normal(scale=0.05, size=(size, 2))
+    steps[rng.random(size) < 0.05] = 0
+    coords = np.cumsum(steps, axis=0)
+    coords = (coords - coords.min(axis=0)) / np.ptp(coords, axis=0).max() * 50
+    return coords, rng.uniform(0, 5, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 50000, 500000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        coords, elevations = random_walk(size, rng)
+
+        start = time.perf_counter()
+        legacy_vertices, legacy_faces = legacy_ribbon(coords, elevations, 0.5, 1.0)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vertices, faces = _track_ribbon(coords, elevations, 0.5, 1.0)
+        vectorized_time = time.perf_counter() - start
+
+        same_faces = np.array_equal(legacy_faces, faces)
+        deviation = np.abs(legacy_vertices - vertices).max()
+        print(
+            f"{size} points: {len(vertices)} vertices, {len(faces)} faces, "
+            f"legacy {legacy_time:.3f}s, vectorized {vectorized_time:.3f}s "
+            f"(x{legacy_time / vectorized_time:.0f}), identical faces: {same_faces}, "
+            f"max vertex deviation: {deviation:.1e} mm"
+        )
+        assert same_faces, f"Faces differ for a {size} points track"
+        assert deviation < 1e-9, f"Vertices differ for a {size} points track"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare the legacy void filling of elevation maps, a single distance transform over the
+whole map, with fill_voids, on maps with many small scattered voids and with a few
+large ones, and check that both fill voids with the same values.
+
+Usage: uv run python benchmarks/bench_void_fill.py [--sizes 900 3601]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from scipy import ndimage
+
+from gpx2mesh.elevation import fill_voids
+
+
+def legacy_fill(elev):
+    nan_mask = np.isnan(elev)
+    _, indices = ndimage.distance_transform_edt(nan_mask, return_indices=True)
+    elev[nan_mask] = elev[tuple(indices[:, nan_mask])]
+
+
+def scattered_voids(size, fraction, rng, max_side=4):
+    """Map with square voids of 1 to max_side samples, covering about fraction."""
+    elev = rng.uniform(0, 1000, (size, size))
+    mean_area = np.mean(np.arange(1, max_side + 1) ** 2)
+    for row, col, side in zip(
+        *rng.integers(0, size, (2, round(fraction * size * size / mean_area))),
+        rng.integers(1, max_side + 1, round(fraction * size * size / mean_area)),
+    ):
+        elev[row : row + side, col : col + side] = np.nan
+    return elev
+
+
+def large_voids(size, fraction, rng, count=4):
+    """Map with count square voids, covering about fraction."""
+    elev = rng.uniform(0, 1000, (size, size))
+    side = round(size * np.sqrt(fraction / count))
+    for row, col in rng.integers(0, size - side, (count, 2)):
+        elev[row : row + side, col : col + side] = np.nan
+    return elev
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[900, 3601])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        for name, elev in [
+            ("1% scattered", scattered_voids(size, 0.01, rng)),
+            ("5% scattered", scattered_voids(size, 0.05, rng)),
+            ("1% large", large_voids(size, 0.01, rng)),
+        ]:
+            legacy = elev.copy()
+            start = time.perf_counter()
+            legacy_fill(legacy)
+            legacy_time = time.perf_counter() - start
+
+            filled = elev.copy()
+            start = time.perf_counter()
+            fill_voids(filled)
+            fill_time = time.perf_counter() - start
+
+            # Voids cells equally distant from several valid cells may take any of
+            # their values
+            matching = np.mean(filled == legacy)
+            print(
+                f"{size}x{size} {name} voids: legacy {legacy_time:.3f}s, "
+                f"fill_voids {fill_time:.3f}s (x{legacy_time / fill_time:.1f}), "
+                f"{100 * matching:.2f}% identical values"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Synthetic inputs for the benchmarks: fractal elevation tiles with voids, in the NASADEM
+.hgts format, and random walk .gpx tracks crossing tiles in a given pattern. Inputs are
+deterministic for a given seed, so that benchmark results can be compared.
+"""
+
+from pathlib import Path
+import zlib
+
+import numpy as np
+
+from gpx2mesh.elevation import ELEVATION_NAN_VALUE, TILE_SIZE, tile_filename
+
+# Center (lat, lon) of the tracks of each pattern: within a single tile, across the
+# edge of two tiles, and across the corner of four tiles
+TRACK_CENTERS = {
+    "tile": (45.5, 4.5),
+    "edge": (45.5, 5.0),
+    "corner": (46.0, 5.0),
+}
+
+
+def fractal_terrain(size, rng, beta=3.0, relief=2000.0):
+    """
+    Square terrain of size x size elevations, in meters, by spectral synthesis: random
+    phases with an amplitude decreasing as the frequency to the power of -beta / 2.
+    Larger beta give smoother terrains.
+    """
+    fy = np.fft.fftfreq(size)[:, None]
+    fx = np.fft.rfftfreq(size)[None, :]
+    frequency = np.hypot(fx, fy)
+    frequency[0, 0] = 1  # The mean is set below
+
+    amplitude = frequency ** (-beta / 2)
+    phase = rng.uniform(0, 2 * np.pi, amplitude.shape)
+    terrain = np.fft.irfft2(amplitude * np.exp(1j * phase), s=(size, size))
+
+    terrain -= terrain.min()
+    return terrain * (relief / terrain.max()) + 100
+
+
+def add_voids(terrain, rng, fraction=0.01, radius=20):
+    """Set discs of about radius samples to the void value, covering about fraction."""
+    size = terrain.shape[0]
+    count = round(fraction * size * size / (np.pi * radius**2))
+    y, x = np.ogrid[-radius : radius + 1, -radius : radius + 1]
+    disc = x**2 + y**2 <= radius**2
+    for row, col in rng.integers(0, size - 2 * radius - 1, size=(count, 2)):
+        window = terrain[row : row + 2 * radius + 1, col : col + 2 * radius + 1]
+        window[disc] = ELEVATION_NAN_VALUE
+    return terrain
+
+
+def write_tile(folder: Path, lat: int, lon: int, seed=0, void_fraction=0.01) -> Path:
+    """
+    Write the tile of the south-west corner (lat, lon) unless it exists. Adjacent tiles
+    are generated independently, so their edges do not match.
+    """
+    path = Path(folder) / tile_filename(lat, lon)
+    if path.exists():
+        return path
+
+    rng = np.random.default_rng([seed, zlib.crc32(path.name.encode())])
+    terrain = add_voids(fractal_terrain(TILE_SIZE, rng), rng, void_fraction)
+    terrain.astype(">f4").tofile(path)
+    return path
+
+
+def random_walk(points, extent, rng):
+    """
+    Smooth random walk of points (lat, lon), centered on (0, 0), whose largest side is
+    extent degrees.
+    """
+    heading = np.cumsum(rng.normal(scale=0.05, size=points))
+    walk = np.cumsum(np.column_stack([np.sin(heading), np.cos(heading)]), axis=0)
+    walk -= (walk.min(axis=0) + walk.max(axis=0)) / 2
+    return walk * (extent / np.ptp(walk, axis=0).max())
+
+
+def write_track(path: Path, points=1000, extent=0.1, pattern="tile", seed=0) -> Path:
+    """Write a .gpx track of points points, extent degrees wide, for a pattern."""
+    rng = np.random.default_rng([seed, points])
+    walk = random_walk(points, extent, rng) + TRACK_CENTERS[pattern]
+    elevations = rng.uniform(100, 2000, points)
+
+    trkpts = "\n".join(
+        f'      <trkpt lat="{lat:.7f}" lon="{lon:.7f}"><ele>{ele:.1f}</ele></trkpt>'
+        for (lat, lon), ele in zip(walk, elevations)
+    )
+    Path(path).write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" '
+        'creator="gpx2mesh benchmarks">\n'
+        f"  <trk>\n    <trkseg>\n{trkpts}\n    </trkseg>\n  </trk>\n</gpx>\n"
+    )
+    return Path(path)
@@ -1,12 +1,14 @@
 import argparse
+import contextlib
+import json
+import logging
 from pathlib import Path
 import re
+import sys
+import time
 
 from dotenv import dotenv_values
 
-from gpx2mesh import build_mesh
-from gpx2mesh.elevation.sources import NasaConnection, NasaProvider
-
 
 def main():
     config = dotenv_values(".env")
@@ -14,10 +16,127 @@ def main():
     parser = argparse.ArgumentParser(
         prog="elevation", description="Generate elevation mesh from a .gpx file"
     )
-    parser.add_argument("-f", "--file")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-f", "--file")
+    source.add_argument(
+        "-b",
+        "--batch",
+        help="folder, glob pattern or manifest file of the .gpx files to render",
+    )
+    source.add_argument(
+        "-s",
+        "--serve",
+        type=int,
+        metavar="PORT",
+        help="run a render server on this port, see gpx2mesh.server",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="render server address")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes in batch mode, one per CPU by default, or "
+        "of render threads of the server, 2 by default",
+    )
     parser.add_argument("-d", "--debug", default=False)
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="only log warnings and errors"
+    )
+    parser.add_argument(
+        "-t",
+        "--track-tolerance",
+        type=float,
+        default=0.05,
+        help="maximum track simplification error on the medal, in mm",
+    )
+    parser.add_argument(
+        "--terrain-error",
+        type=float,
+        default=0.05,
+        help="maximum terrain resampling error on the medal, in mm",
+    )
+    parser.add_argument(
+        "--terrain-triangles",
+        type=int,
+        default=None,
+        help="maximum number of terrain triangles, approximate for the disc terrain",
+    )
+    for option, default, description in [
+        ("--width", 50.0, "medal diameter"),
+        ("--depth", 5.0, "terrain relief"),
+        ("--base-thickness", 1.0, "thickness of the base below the terrain"),
+        ("--track-height", 0.5, "track height above the terrain"),
+        ("--track-width", 1.0, "track width"),
+    ]:
+        parser.add_argument(
+            option, type=float, default=default, help=f"{description}, in mm"
+        )
+    parser.add_argument(
+        "--resolution",
+        type=float,
+        default=None,
+        help="elevation sample spacing needed on the medal, in mm, coarser elevation "
+        "being loaded when it is enough, full resolution by default",
+    )
+    parser.add_argument(
+        "--void-fill",
+        choices=["nearest", "harmonic"],
+        default="nearest",
+        help="fill elevation voids with the nearest value, or interpolate them "
+        "smoothly, when tiles are not preprocessed",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="check and repair the medal mesh before exporting it, which is slower",
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print a JSON report of the tracks, needed tiles and cost estimates "
+        "instead of rendering them",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        default=None,
+        metavar="MB",
+        help="reject tracks whose estimated peak memory exceeds this, in dry runs",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        default=None,
+        help="write the time and memory of each rendering stage to this file",
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=["json", "chrome"],
+        default="json",
+        help="stage records, or a trace for chrome://tracing and Perfetto",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="also trace the peak memory allocated by each stage, which is slower",
+    )
 
     args = parser.parse_args()
+    if args.dry_run and args.serve:
+        parser.error("--dry-run cannot be used with --serve")
+    if args.profile and not args.file:
+        parser.error("--profile can only be used with --file")
+
+    logging.basicConfig(
+        level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s"
+    )
+
+    # Imported once arguments are parsed, and only those needed by the mode, so that
+    # --help and invalid arguments do not wait for them
+    from gpx2mesh.elevation.cache import MemoryTileCache, PreprocessedTileCache
+    from gpx2mesh.elevation.sources import NasaConnection, NasaProvider
 
     nasa_connection = NasaConnection(
         user=config["LOGIN"], pwd=config["PWD"], url=config["URL_PREFIX"]
@@ -26,12 +145,119 @@ def main():
         assets=Path(config["ASSETS"]), connection=nasa_connection
     )
 
-    mesh = build_mesh(args.file, nasa_provider, debug=args.debug)
+    build_options = dict(
+        track_tolerance=args.track_tolerance,
+        terrain_error=args.terrain_error,
+        terrain_triangles=args.terrain_triangles,
+        validate=args.validate,
+        width=args.width,
+        depth=args.depth,
+        base_thickness=args.base_thickness,
+        track_height=args.track_height,
+        track_width=args.track_width,
+        void_fill=args.void_fill,
+        resolution=args.resolution,
+    )
+
+    if args.dry_run:
+        from gpx2mesh.batch import collect_tracks
+        from gpx2mesh.preflight import preflight
+
+        memory_budget = None
+        if args.memory_budget is not None:
+            memory_budget = int(args.memory_budget * 1024**2)
+        tracks = collect_tracks(args.batch) if args.batch else [args.file]
+        reports = [
+            preflight(
+                track,
+                nasa_provider,
+                terrain_error=args.terrain_error,
+                terrain_triangles=args.terrain_triangles,
+                memory_budget=memory_budget,
+                width=args.width,
+                resolution=args.resolution,
+            )
+            for track in tracks
+        ]
+        print(json.dumps(reports if args.batch else reports[0], indent=2))
+        return 0 if all(report["ok"] for report in reports) else 1
+
+    if args.batch:
+        from gpx2mesh.batch import collect_tracks, print_summary, render_batch
+
+        tracks = collect_tracks(args.batch)
+        print(f"Rendering {len(tracks)} tracks")
+        start = time.perf_counter()
+        results = render_batch(
+            tracks,
+            nasa_provider,
+            workers=args.workers,
+            cache_folder=Path(config["CACHE"]) if config.get("CACHE") else None,
+            **build_options,
+        )
+        print_summary(results, time.perf_counter() - start)
+        return 0 if all(result.error is None for result in results) else 1
+
+    tile_cache = None
+    if config.get("CACHE"):
+        tile_cache = PreprocessedTileCache(Path(config["CACHE"]))
+
+    # Stages are reused between renders of the server, and between runs if they are
+    # stored on disk
+    from gpx2mesh.memo import StageCache
+
+    stage_folder = config.get("STAGE_CACHE")
+    if stage_folder or args.serve:
+        build_options["stage_cache"] = StageCache(
+            folder=Path(stage_folder) if stage_folder else None
+        )
+
+    if args.serve:
+        from gpx2mesh.server import RenderService, make_server
+
+        service = RenderService(
+            nasa_provider,
+            MemoryTileCache(backing=tile_cache),
+            workers=args.workers or 2,
+            **build_options,
+        )
+        server = make_server(service, args.host, args.serve)
+        print(f"Render server listening on http://{args.host}:{args.serve}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+        service.stop()
+        return 0
+
+    from gpx2mesh import build_mesh
+    from gpx2mesh.export import export_mesh
+    from gpx2mesh.profiling import profile, stage
 
     export_file = re.sub(r"\.gpx$", ".stl", args.file)
-    mesh.export(export_file)
+    with (
+        profile(memory=args.profile_memory)
+        if args.profile
+        else contextlib.nullcontext()
+    ) as profiler:
+        mesh = build_mesh(
+            args.file,
+            nasa_provider,
+            debug=args.debug,
+            tile_cache=tile_cache,
+            **build_options,
+        )
+        with stage("export"):
+            export_mesh(mesh, export_file)
     print(f"Mesh exported in {export_file}")
 
+    if profiler is not None:
+        profiler.write(args.profile, args.profile_format)
+        print(profiler.summary())
+        print(f"Profile written in {args.profile}")
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
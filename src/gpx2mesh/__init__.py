@@ -1,26 +1,133 @@
-from gpx2mesh.elevation import (
-    crop_elevation_map,
-    load_elevation_map,
-)
-from gpx2mesh.elevation.sources import IGetElevationFiles
-from gpx2mesh.mesh import generate_mesh
-from gpx2mesh.track import load_track
+import io
+import logging
+from typing import TYPE_CHECKING
+
+from gpx2mesh.profiling import stage
+
+if TYPE_CHECKING:
+    from gpx2mesh.elevation.sources import IGetElevationFiles
+
+logger = logging.getLogger(__name__)
 
 
 def build_mesh(
-    filename: str, elevation_files_provider: IGetElevationFiles, debug=False
+    filename: str,
+    elevation_files_provider: "IGetElevationFiles",
+    debug=False,
+    tile_cache=None,
+    track_tolerance=0.05,
+    terrain_error=0.05,
+    terrain_triangles=None,
+    validate=False,
+    width=50.0,
+    depth=5.0,
+    base_thickness=1.0,
+    track_height=0.5,
+    track_width=1.0,
+    stage_cache=None,
+    void_fill="nearest",
+    resolution=None,
+    parsed_track=None,
 ):
-    track, track_bounds = load_track(filename)
+    """
+    Build the medal mesh of a .gpx track, given as a path or a file object. The track
+    is simplified so that it deviates at most track_tolerance mm from the original one
+    on the medal, 0 to disable. The terrain is resampled so that it deviates at most
+    terrain_error mm from the elevation data, and has about terrain_triangles faces at
+    most, None to disable. The terrain is meshed directly within the medal disc. The
+    medal dimensions, in mm, are those of generate_mesh. Elevation voids are filled with
+    the void_fill method of gpx2mesh.elevation.fill_voids. With a resolution, elevation
+    is loaded from the coarsest level of the tiles pyramid whose samples are at most
+    resolution mm apart on the medal, see gpx2mesh.elevation.pyramid_level. A track
+    already parsed by gpx2mesh.track.load_track is given as parsed_track, the file
+    being then left unread.
+
+    The mesh pieces are generated watertight and consistently wound, so the mesh is not
+    repaired afterwards unless validate is set, see gpx2mesh.mesh.validate_mesh.
+
+    With a stage_cache (see gpx2mesh.memo), the stages whose inputs did not change
+    since a previous build are not run again: rendering a track with other medal
+    dimensions reuses its parsed track and elevation map, and changing only the track
+    dimensions also reuses the terrain mesh. Elevation tiles are assumed not to change.
+    """
+    # Imported on first use, as scipy and trimesh are slow to import
+    from gpx2mesh.elevation import (
+        SMOOTHING_RADIUS,
+        SMOOTHING_SIGMA,
+        load_cropped_elevation_map,
+        pyramid_level,
+    )
+    from gpx2mesh.memo import memoize
+    from gpx2mesh.mesh import generate_mesh, validate_mesh
+    from gpx2mesh.track import load_track
+    from gpx2mesh.track.simplify import simplify_track
 
-    print(f"Track bounds: {track_bounds}")
+    if parsed_track is not None:
+        track, track_bounds = parsed_track
+    else:
+        with stage("track_parse"):
+            gpx = _read_track_file(filename)
+            track, track_bounds = memoize(
+                stage_cache, "track", (gpx,), lambda: load_track(io.BytesIO(gpx))
+            )
 
-    elevation = load_elevation_map(track_bounds, elevation_files_provider)
-    (elevation, [x_min, y_min], scale) = crop_elevation_map(elevation, track_bounds)
+    logger.info(f"Track bounds: {track_bounds}")
+    level = pyramid_level(track_bounds, width, resolution)
+    if level > 0:
+        logger.info(f"Loading elevation from level {level} of the tiles pyramid")
+
+    # Preprocessed tiles are filtered independently, see load_cropped_elevation_map
+    (elevation, [x_min, y_min], scale) = memoize(
+        stage_cache,
+        "elevation",
+        (
+            track_bounds,
+            SMOOTHING_SIGMA,
+            SMOOTHING_RADIUS,
+            tile_cache is None,
+            void_fill,
+            level,
+        ),
+        lambda: load_cropped_elevation_map(
+            track_bounds, elevation_files_provider, tile_cache, void_fill, level
+        ),
+    )
     track = (track - [x_min, y_min]) / [scale, scale]
 
-    print("Generating mesh")
-    mesh = generate_mesh(elevation, track, width=50, debug=debug)
+    # Track coordinates are normalized to the medal width
+    with stage("track_simplify"):
+        simplified_track = simplify_track(track, track_tolerance / width)
+    logger.info(
+        f"Track simplification: {len(track)} points in, {len(simplified_track)} out"
+    )
+    track = simplified_track
+
+    logger.info("Generating mesh")
+    mesh = generate_mesh(
+        elevation,
+        track,
+        width=width,
+        depth=depth,
+        base_thickness=base_thickness,
+        track_height=track_height,
+        track_width=track_width,
+        debug=debug,
+        terrain_error=terrain_error,
+        terrain_triangles=terrain_triangles,
+        stage_cache=stage_cache,
+    )
 
-    mesh.merge_vertices()
+    if validate:
+        with stage("validate"):
+            validate_mesh(mesh)
 
     return mesh
+
+
+def _read_track_file(filename) -> bytes:
+    """Content of a track given as a path or a file object."""
+    if hasattr(filename, "read"):
+        content = filename.read()
+        return content.encode() if isinstance(content, str) else content
+    with open(filename, "rb") as f:
+        return f.read()
@@ -0,0 +1,272 @@
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import glob
+import logging
+import os
+from itertools import repeat
+from pathlib import Path
+import time
+from typing import Dict, List, Optional
+from xml.etree.ElementTree import ParseError
+
+from gpx2mesh import build_mesh
+from gpx2mesh.elevation import get_crop_filenames
+from gpx2mesh.elevation.cache import PreprocessedTileCache
+from gpx2mesh.elevation.shared import SharedTileReader, SharedTileRegistry
+from gpx2mesh.elevation.sources import ElevationFileNotFoundError, IGetElevationFiles
+from gpx2mesh.export import export_mesh
+from gpx2mesh.profiling import stage
+from gpx2mesh.track import InvalidTrackFile, load_track
+
+logger = logging.getLogger(__name__)
+
+# Outcome of a track rendering: the exported file, or the error that prevented it
+BatchResult = namedtuple("BatchResult", ["track", "output", "seconds", "error"])
+
+# Errors of tracks that cannot be rendered, other errors being logged with their
+# traceback as they are likely bugs
+TRACK_ERRORS = (ElevationFileNotFoundError, InvalidTrackFile, ParseError, OSError)
+
+
+def collect_tracks(source: str) -> List[Path]:
+    """
+    List the .gpx files of a batch. The source is either a folder, searched
+    recursively, a manifest file listing one track per line relative to the manifest
+    folder, or a glob pattern.
+    """
+    path = Path(source)
+    if path.is_dir():
+        return sorted(path.rglob("*.gpx"))
+
+    if path.is_file() and path.suffix.lower() != ".gpx":
+        lines = (line.strip() for line in path.read_text().splitlines())
+        return [
+            path.parent / line for line in lines if line and not line.startswith("#")
+        ]
+
+    return sorted(Path(p) for p in glob.glob(source, recursive=True))
+
+
+def render_batch(
+    tracks: List[Path],
+    files_provider: IGetElevationFiles,
+    workers: Optional[int] = None,
+    cache_folder: Optional[Path] = None,
+    chunk_size: int = 16,
+    max_pending: Optional[int] = None,
+    **build_options,
+) -> List[BatchResult]:
+    """
+    Render the medals of many tracks across a process pool, exporting each one as a
+    .stl file next to its track. Tiles are fetched once, by this process, and
+    preprocessed once if a cache_folder is given, before rendering. Tracks on the same
+    tiles are then rendered by chunks of chunk_size tracks, each chunk by a single
+    worker. Workers only log warnings and errors, and results are returned in the
+    order of the tracks.
+
+    With a cache_folder, preprocessed tiles are published in shared memory for the
+    chunks being rendered, at most max_pending at once (twice the number of workers
+    by default), so that workers share a single copy of each tile.
+    """
+    results: Dict[Path, BatchResult] = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        parsed = list(executor.map(_parse_track, tracks, chunksize=chunk_size))
+
+        # Tracks are rendered from their parsed points, rather than parsed again
+        groups: Dict[tuple, List[tuple]] = {}
+        for track, parsed_track in zip(tracks, parsed):
+            if isinstance(parsed_track, BatchResult):
+                results[track] = parsed_track
+            else:
+                files = get_crop_filenames(parsed_track[1])
+                groups.setdefault(tuple(sorted(files)), []).append(
+                    (track, parsed_track)
+                )
+
+        needed = sorted({file for files in groups for file in files})
+        paths = _fetch_tiles(needed, files_provider)
+        logger.info(f"{len(paths)} of {len(needed)} elevation tiles available")
+
+        # Preprocess each tile once, rather than by every worker needing it
+        if cache_folder is not None:
+            list(executor.map(_preprocess_tile, repeat(cache_folder), paths.values()))
+
+        chunks = [
+            (files, group[i : i + chunk_size])
+            for files, group in groups.items()
+            for i in range(0, len(group), chunk_size)
+        ]
+        registry = None
+        if cache_folder is not None:
+            registry = SharedTileRegistry(PreprocessedTileCache(cache_folder))
+        max_pending = max_pending or 2 * (workers or os.cpu_count() or 1)
+        try:
+            for result in _run_chunks(
+                executor, chunks, paths, registry, build_options, max_pending
+            ):
+                results[result.track] = result
+        finally:
+            if registry is not None:
+                registry.close()
+
+    return [results[track] for track in tracks]
+
+
+def print_summary(results: List[BatchResult], elapsed: float):
+    """Print the outcome of each track, and the batch throughput."""
+    for result in results:
+        if result.error is None:
+            print(f"ok      {result.track} -> {result.output} ({result.seconds:.2f}s)")
+        else:
+            print(f"FAILED  {result.track}: {result.error}")
+
+    succeeded = sum(result.error is None for result in results)
+    render_time = sum(result.seconds for result in results)
+    print(
+        f"{succeeded}/{len(results)} medals rendered in {elapsed:.1f}s: "
+        f"{len(results) / max(elapsed, 1e-9):.2f} tracks/s, "
+        f"{render_time / max(len(results), 1):.2f}s of work per track"
+    )
+
+
+class _FetchedFilesProvider(IGetElevationFiles):
+    """Provide the paths of files fetched beforehand."""
+
+    def __init__(self, paths: Dict[str, Path]):
+        self.paths = paths
+
+    def get_paths(self, files) -> List[Path]:
+        """Raise ElevationFileNotFoundError if some files were not fetched."""
+        missing_files = [file for file in files if file not in self.paths]
+        if len(missing_files) > 0:
+            raise ElevationFileNotFoundError(missing_files)
+
+        return [self.paths[file] for file in files]
+
+    def get_local_paths(self, files) -> List[Path]:
+        return [self.paths[file] for file in files if file in self.paths]
+
+
+def _fetch_tiles(files: List[str], files_provider: IGetElevationFiles):
+    """Fetch the files at once, returning the paths of those available by name."""
+    if not files:
+        return {}
+
+    try:
+        paths = files_provider.get_paths(files)
+    except ElevationFileNotFoundError as e:
+        # Files fetched before the error are available locally now. Missing files may
+        # be reported without their extension.
+        missing = {file.removesuffix(".hgts") for file in e.missing_files}
+        available = [
+            file for file in files if file.removesuffix(".hgts") not in missing
+        ]
+        paths = files_provider.get_paths(available) if available else []
+
+    return {path.name: path for path in paths}
+
+
+def _run_chunks(executor, chunks, paths, registry, build_options, max_pending):
+    """
+    Render chunks of tracks, a limited number at once so that only the tiles of the
+    pending chunks are kept in shared memory. Yields the results as they come.
+    """
+    chunks = iter(chunks)
+    pending = {}
+    while True:
+        for files, tracks in chunks:
+            chunk_paths = [paths[file] for file in files if file in paths]
+            shared_tiles = None
+            if registry is not None:
+                shared_tiles = {
+                    str(path): registry.acquire(path) for path in chunk_paths
+                }
+            future = executor.submit(
+                _render_tracks, tracks, paths, shared_tiles, build_options
+            )
+            pending[future] = chunk_paths
+            if len(pending) >= max_pending:
+                break
+
+        if not pending:
+            return
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            chunk_paths = pending.pop(future)
+            if registry is not None:
+                for path in chunk_paths:
+                    registry.release(path)
+            yield from future.result()
+
+
+def _init_worker():
+    # Per track progress messages would be interleaved between workers
+    logging.getLogger("gpx2mesh").setLevel(logging.WARNING)
+
+
+def _preprocess_tile(cache_folder: Path, path: Path):
+    PreprocessedTileCache(cache_folder).get(path)
+
+
+def _parse_track(track: Path):
+    """Points and bounds of a track, or the failed BatchResult of an invalid track."""
+    start = time.perf_counter()
+    try:
+        return load_track(track)
+    except (InvalidTrackFile, ParseError, OSError) as e:
+        return BatchResult(track, None, time.perf_counter() - start, _describe(e))
+
+
+# Shared tiles read by this worker process, kept mapped between chunks
+_shared_tiles = SharedTileReader()
+
+
+def _render_tracks(
+    tracks: List[tuple],
+    paths: Dict[str, Path],
+    shared_tiles: Optional[Dict[str, Path]],
+    build_options: dict,
+) -> List[BatchResult]:
+    files_provider = _FetchedFilesProvider(paths)
+    tile_cache = None
+    if shared_tiles is not None:
+        _shared_tiles.update(shared_tiles)
+        tile_cache = _shared_tiles
+
+    results = []
+    for track, parsed_track in tracks:
+        start = time.perf_counter()
+        output = track.with_suffix(".stl")
+        try:
+            mesh = build_mesh(
+                str(track),
+                files_provider,
+                tile_cache=tile_cache,
+                parsed_track=parsed_track,
+                **build_options,
+            )
+            with stage("export"):
+                export_mesh(mesh, output)
+            error = None
+        except TRACK_ERRORS as e:
+            error = _describe(e)
+        except Exception as e:
+            # A failing track does not stop the batch
+            logger.error(f"Unexpected error rendering {track}", exc_info=e)
+            error = _describe(e)
+        results.append(
+            BatchResult(
+                track,
+                output if error is None else None,
+                time.perf_counter() - start,
+                error,
+            )
+        )
+    return results
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ElevationFileNotFoundError):
+        return f"missing elevation files {', '.join(error.missing_files)}"
+    return f"{type(error).__name__}: {error}"
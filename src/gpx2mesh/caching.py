@@ -0,0 +1,85 @@
+from collections import OrderedDict
+import os
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+import threading
+from typing import Callable, Hashable, List
+
+
+class LoadOnceLRU:
+    """
+    In-memory mapping of the most recently used values, whose missing values are
+    loaded by a single thread when requested concurrently, the others waiting for it.
+    Subclasses decide which values to keep in _evict, called with the lock held after
+    each value is added.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def _get(self, key: Hashable, load: Callable):
+        """
+        Return the value of key, loading it with load() if it is not in memory. load
+        counts the misses, as it may find the value elsewhere.
+        """
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                self.hits += 1
+                return self._values[key]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                if key in self._values:
+                    self.hits += 1
+                    return self._values[key]
+
+            value = load()
+            with self._lock:
+                self._values[key] = value
+                self._loading.pop(key, None)
+                self._evict(key)
+            return value
+
+    def _evict(self, added: Hashable):
+        pass
+
+    def __len__(self):
+        return len(self._values)
+
+
+def write_atomically(entry: Path, write: Callable):
+    """
+    Write a file with write(f), through a temporary file of the same folder renamed
+    once complete, so that concurrent readers never see it partial.
+    """
+    with NamedTemporaryFile(dir=Path(entry).parent, suffix=".tmp", delete=False) as f:
+        write(f)
+    os.replace(f.name, entry)
+
+
+def evict_least_recently_used(
+    folder: Path, pattern: str, max_size: int, keep: Path
+) -> List[Path]:
+    """
+    Remove the least recently modified files of folder matching pattern until they
+    total at most max_size bytes, except keep. Returns the removed files.
+    """
+    entries = sorted(Path(folder).glob(pattern), key=lambda e: e.stat().st_mtime)
+    size = sum(e.stat().st_size for e in entries)
+
+    evicted = []
+    for entry in entries:
+        if size <= max_size:
+            break
+        if entry == keep:
+            continue
+        size -= entry.stat().st_size
+        os.remove(entry)
+        evicted.append(entry)
+    return evicted
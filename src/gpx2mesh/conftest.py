@@ -0,0 +1,45 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pytest
+
+import gpx2mesh.elevation
+from gpx2mesh.elevation import ELEVATION_NAN_VALUE
+from gpx2mesh.elevation.sources import AssetsFolderProvider
+
+# Voids of the n45e004 tile, relative to the crop window of 45.3-45.5N 4.4-4.6E
+VOIDS = [
+    (slice(165, 180), slice(220, 240)),  # Straddles the window border
+    (slice(200, 205), slice(150, 160)),  # Inside the window
+    (slice(0, 3), slice(0, 40)),  # Outside the window
+]
+
+
+@pytest.fixture
+def tile_size(monkeypatch):
+    """Size of the synthetic tiles of the tests, set as TILE_SIZE."""
+    monkeypatch.setattr(gpx2mesh.elevation, "TILE_SIZE", 361)
+    return 361
+
+
+@pytest.fixture
+def assets(request, tile_size):
+    """
+    Folder holding a random n45e004 tile of tile_size x tile_size samples. Its voids
+    are VOIDS, or the (rows, cols) slices the fixture is indirectly parametrized
+    with.
+    """
+    rng = np.random.default_rng(42)
+    elevation = rng.uniform(0, 1000, (tile_size, tile_size)).astype(np.float32)
+    for rows, cols in getattr(request, "param", VOIDS):
+        elevation[rows, cols] = ELEVATION_NAN_VALUE
+
+    with TemporaryDirectory() as tmp_dir:
+        elevation.astype(">f4").tofile(Path(tmp_dir) / "n45e004.hgts")
+        yield Path(tmp_dir)
+
+
+@pytest.fixture
+def provider(assets):
+    return AssetsFolderProvider(assets)
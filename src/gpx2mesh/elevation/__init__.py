@@ -1,19 +1,39 @@
+from collections import namedtuple
 from itertools import product
+import logging
 from math import ceil, floor
-from typing import List
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 import numpy as np
-from scipy import ndimage
-from scipy.ndimage import gaussian_filter
 
 from gpx2mesh.track import TrackBounds
 from gpx2mesh.elevation.sources import IGetElevationFiles
+from gpx2mesh.profiling import stage
+
+logger = logging.getLogger(__name__)
 
 ELEVATION_NAN_VALUE = -32768
+TILE_SIZE = 3601
+SMOOTHING_SIGMA = 3
+SMOOTHING_RADIUS = 4
+VOID_FILL_METHODS = ("nearest", "harmonic")
+# Fixed cost of filling a void within its bounding box, in cells of the box
+VOID_FILL_OVERHEAD = 400
+
+# Windows are expressed in global sample indices: rows are counted from the north pole
+# and columns from the antimeridian, TILE_SIZE - 1 samples per degree. Adjacent tiles
+# share their edge rows and columns. Level l of the tiles pyramid keeps every 2**l-th
+# sample, with (TILE_SIZE - 1) >> l samples per degree, and its windows are expressed
+# in the global sample indices of that level.
+CropWindow = namedtuple(
+    "CropWindow",
+    ["row_min", "row_max", "col_min", "col_max", "shift_vector", "scale"],
+)
 
 
 def get_filenames(bounds: TrackBounds) -> List[str]:
     return [
-        _map_filename(lat, lon)
+        tile_filename(lat, lon)
         for lat, lon in product(
             range(floor(bounds.lat_min), floor(bounds.lat_max + 1)),
             range(floor(bounds.lon_min), floor(bounds.lon_max + 1)),
@@ -21,46 +41,462 @@ def get_filenames(bounds: TrackBounds) -> List[str]:
     ]
 
 
-def _map_filename(lat: int, lon: int) -> str:
+def tile_filename(lat: int, lon: int) -> str:
+    """Name of the tile file of the south-west corner (lat, lon)."""
     _lat = f"{'n' if lat >= 0 else 's'}{abs(floor(lat)):>02}"
     _lon = f"{'e' if lon >= 0 else 'w'}{abs(floor(lon)):>03}"
 
     return _lat + _lon + ".hgts"
 
 
+class TileMosaic:
+    """
+    Lazy mosaic of adjacent elevation tiles. Tiles are memory-mapped and only the
+    requested windows are read from them.
+    """
+
+    def __init__(
+        self,
+        tiles: Dict[Tuple[int, int], Path],
+        reader: Optional[Callable[[Path], np.ndarray]] = None,
+        level: int = 0,
+    ):
+        """
+        `tiles` maps the (lat, lon) of the south-west corner of a tile to its path, and
+        `reader` maps a path to the tile values, read_tile by default. With a level, the
+        reader returns the tiles at that level of the pyramid, and windows are in its
+        sample indices.
+        """
+        self.tiles = tiles
+        self.reader = reader if reader is not None else read_tile
+        self.steps = (TILE_SIZE - 1) >> level
+
+        steps = self.steps
+        lats = [lat for lat, _ in tiles]
+        lons = [lon for _, lon in tiles]
+        self.row_min = (89 - max(lats)) * steps
+        self.row_max = (90 - min(lats)) * steps + 1
+        self.col_min = (min(lons) + 180) * steps
+        self.col_max = (max(lons) + 181) * steps + 1
+
+    def read(self, row_min: int, row_max: int, col_min: int, col_max: int):
+        """
+        Read a window of the mosaic as float32, with voids and areas not covered by any
+        tile set to NaN.
+        """
+        steps = self.steps
+        elev = np.full((row_max - row_min, col_max - col_min), np.nan, dtype=np.float32)
+
+        for (lat, lon), path in self.tiles.items():
+            tile_row = (89 - lat) * steps
+            tile_col = (lon + 180) * steps
+
+            r0 = max(row_min, tile_row)
+            r1 = min(row_max, tile_row + steps + 1)
+            c0 = max(col_min, tile_col)
+            c1 = min(col_max, tile_col + steps + 1)
+            if r0 >= r1 or c0 >= c1:
+                continue
+
+            tile = self.reader(path)
+            elev[r0 - row_min : r1 - row_min, c0 - col_min : c1 - col_min] = tile[
+                r0 - tile_row : r1 - tile_row, c0 - tile_col : c1 - tile_col
+            ]
+
+        elev[elev == ELEVATION_NAN_VALUE] = np.nan
+        return elev
+
+    def view(self, row_min: int, row_max: int, col_min: int, col_max: int):
+        """
+        Same as read, but without copy when the window is covered by a single tile. Only
+        meant for tiles without voids, such as preprocessed tiles.
+        """
+        steps = self.steps
+        for (lat, lon), path in self.tiles.items():
+            tile_row = (89 - lat) * steps
+            tile_col = (lon + 180) * steps
+
+            if (
+                tile_row <= row_min
+                and row_max <= tile_row + steps + 1
+                and tile_col <= col_min
+                and col_max <= tile_col + steps + 1
+            ):
+                return self.reader(path)[
+                    row_min - tile_row : row_max - tile_row,
+                    col_min - tile_col : col_max - tile_col,
+                ]
+
+        return self.read(row_min, row_max, col_min, col_max)
+
+
+def get_crop_filenames(track_bounds: TrackBounds) -> List[str]:
+    """Names of the tile files needed to load the elevation map of the track bounds."""
+    return [tile_filename(lat, lon) for lat, lon in get_crop_tiles(track_bounds)]
+
+
+def get_crop_tiles(track_bounds: TrackBounds) -> List[Tuple[int, int]]:
+    """(lat, lon) of the south-west corners of the tiles of get_crop_filenames."""
+    return _window_tiles(crop_window(track_bounds))
+
+
+def pyramid_level(
+    track_bounds: TrackBounds, width: float, resolution: Optional[float]
+) -> int:
+    """
+    Coarsest level of the tiles pyramid whose crop of the track bounds has samples at
+    most resolution mm apart on a medal of width mm, 0 (full resolution) without
+    resolution. Levels whose crop would need other tiles than get_crop_filenames are
+    not used.
+    """
+    if resolution is None:
+        return 0
+
+    tiles = set(get_crop_tiles(track_bounds))
+    level = 0
+    while ((TILE_SIZE - 1) >> level) % 2 == 0:
+        window = crop_window(track_bounds, level + 1)
+        if width / (window.col_max - window.col_min - 1) > resolution:
+            break
+        if not set(_window_tiles(window, level + 1)) <= tiles:
+            break
+        level += 1
+    return level
+
+
 def load_elevation_map(
-    track_bounds: TrackBounds, files_provider: IGetElevationFiles
+    track_bounds: TrackBounds,
+    files_provider: IGetElevationFiles,
+    void_fill: str = "nearest",
 ) -> np.ndarray:
     """
-    Load elevation values from file, interpolate missing values, and apply a gaussian filter.
+    Load elevation values from the files covering the track crop, interpolate missing
+    values with the void_fill method of fill_voids, and apply a gaussian filter. The
+    returned map covers whole tiles, use crop_elevation_map to extract the track crop
+    from it.
     """
-    files = get_filenames(track_bounds)
-    paths = files_provider.get_paths(files)
+    mosaic = _load_mosaic(crop_window(track_bounds), files_provider)
 
-    print(f"loading elevation from file {paths[0]}")
-    size = 3601
+    with stage("tile_decode"):
+        elev = mosaic.read(
+            mosaic.row_min, mosaic.row_max, mosaic.col_min, mosaic.col_max
+        )
+
+    fill_voids(elev, void_fill)
+    return smooth_elevation(elev)
+
+
+def load_cropped_elevation_map(
+    track_bounds: TrackBounds,
+    files_provider: IGetElevationFiles,
+    tile_cache=None,
+    void_fill: str = "nearest",
+    level: int = 0,
+):
+    """
+    Load only the part of the elevation map needed by the track bounds, plus a margin
+    for the gaussian filter and void filling. Returns the same values as
+    crop_elevation_map(load_elevation_map(...)) without decoding whole tiles.
+
+    If a tile_cache (see gpx2mesh.elevation.cache) is given, the crop is read from
+    its preprocessed tiles instead, skipping void filling and smoothing. Tiles are then
+    filtered independently, which may slightly differ near tile edges, and their voids
+    are always filled with the nearest method.
+
+    With a level (see pyramid_level), the crop is taken from that level of the tiles
+    pyramid: read from the tile_cache pyramid, or otherwise loaded at full resolution
+    and downsampled with downsample_elevation.
+    """
+    with stage("crop"):
+        window = crop_window(track_bounds, level)
+
+    if tile_cache is not None:
+        mosaic = _load_mosaic(
+            window, files_provider, lambda path: tile_cache.get(path, level), level
+        )
+        with stage("tile_decode"):
+            cropped_elevation = mosaic.view(
+                window.row_min, window.row_max, window.col_min, window.col_max
+            )
+        return (cropped_elevation, window.shift_vector, window.scale)
+
+    # Full resolution window starting and ending on samples of the level, with a
+    # margin keeping it so, and wide enough for the filters of every downsampling
+    factor = 2**level
+    full_window = window._replace(
+        row_min=window.row_min * factor,
+        row_max=(window.row_max - 1) * factor + 1,
+        col_min=window.col_min * factor,
+        col_max=(window.col_max - 1) * factor + 1,
+    )
+    mosaic = _load_mosaic(full_window, files_provider)
+
+    margin = -(-(SMOOTHING_RADIUS + factor - 1) // factor) * factor
+    while True:
+        row_min = max(full_window.row_min - margin, mosaic.row_min)
+        row_max = min(full_window.row_max + margin, mosaic.row_max)
+        col_min = max(full_window.col_min - margin, mosaic.col_min)
+        col_max = min(full_window.col_max + margin, mosaic.col_max)
 
-    elev = np.fromfile(paths[0], dtype=">f4")
-    elev = np.where(elev == ELEVATION_NAN_VALUE, np.nan, elev)
-    elev = elev.reshape((size, size))
+        with stage("tile_decode"):
+            elev = mosaic.read(row_min, row_max, col_min, col_max)
+
+        # Voids cut by the window may have their nearest valid value, or the valid
+        # cells they are interpolated from, outside of it: widen the window until
+        # every void touching it is fully loaded.
+        if not _voids_cut_by_window(elev, (row_min, row_max, col_min, col_max), mosaic):
+            break
+        margin *= 2
+
+    fill_voids(elev, void_fill)
+    elev = smooth_elevation(elev)
+
+    for _ in range(level):
+        elev = downsample_elevation(elev)
+    row_min //= factor
+    col_min //= factor
+
+    with stage("crop"):
+        cropped_elevation = elev[
+            window.row_min - row_min : window.row_max - row_min,
+            window.col_min - col_min : window.col_max - col_min,
+        ]
+    return (cropped_elevation, window.shift_vector, window.scale)
+
+
+def read_tile(path) -> np.ndarray:
+    """Memory-map a raw elevation tile, without reading its values."""
+    return np.memmap(path, dtype=">f4", mode="r", shape=(TILE_SIZE, TILE_SIZE))
+
+
+def preprocess_tile(path) -> np.ndarray:
+    """Load a whole tile, interpolate missing values, and apply a gaussian filter."""
+    elev = np.array(read_tile(path), dtype=np.float32)
+    elev[elev == ELEVATION_NAN_VALUE] = np.nan
+
+    fill_voids(elev)
+    return smooth_elevation(elev)
+
+
+def fill_voids(elev: np.ndarray, method: str = "nearest"):
+    """
+    Replace NaN values, in place, by the value of the nearest valid cell with
+    method="nearest", or by the harmonic interpolation of the valid cells around each
+    void with method="harmonic", which is smoother. Each void is filled within its
+    bounding box, so that the time and memory needed depend on the voids size, unless
+    there are so many voids that filling them all at once is faster.
+    """
+    if method not in VOID_FILL_METHODS:
+        raise ValueError(f"Unknown void filling method: {method}")
 
     nan_mask = np.isnan(elev)
-    _, indices = ndimage.distance_transform_edt(nan_mask, return_indices=True)
-    elev[nan_mask] = elev[tuple(indices[:, nan_mask])]
+    if not nan_mask.any() or nan_mask.all():
+        return
+
+    from scipy import ndimage
 
-    elev = gaussian_filter(elev, sigma=3, radius=4)
+    with stage("void_fill"):
+        # Voids are only labelled within the rows and columns having some, and the
+        # valid cells around them
+        row_min, row_max = _nonzero_range(nan_mask.any(axis=1), elev.shape[0])
+        col_min, col_max = _nonzero_range(nan_mask.any(axis=0), elev.shape[1])
+
+        # Voids touching by a corner are merged, so that the cells around a void are
+        # all valid
+        labels, count = ndimage.label(
+            nan_mask[row_min:row_max, col_min:col_max], structure=np.ones((3, 3))
+        )
+        fill = _fill_nearest if method == "nearest" else _fill_harmonic
+        region = (slice(row_min, row_max), slice(col_min, col_max))
+
+        # Filling each void has a fixed cost, so many small voids are filled at once
+        # within the region having voids, all the cells around it being valid. The
+        # number of voids gives a lower bound of the cost without finding their boxes
+        if count * VOID_FILL_OVERHEAD >= labels.size:
+            fill(elev[region], nan_mask[region])
+            return
+
+        # Bounding boxes of the voids and the valid cells around them
+        boxes = [
+            (
+                slice(max(rows.start - 1, 0), min(rows.stop + 1, labels.shape[0])),
+                slice(max(cols.start - 1, 0), min(cols.stop + 1, labels.shape[1])),
+            )
+            for rows, cols in ndimage.find_objects(labels)
+        ]
+        cost = sum(
+            (rows.stop - rows.start) * (cols.stop - cols.start) + VOID_FILL_OVERHEAD
+            for rows, cols in boxes
+        )
+        if cost >= labels.size:
+            fill(elev[region], nan_mask[region])
+            return
 
-    return elev
+        for label, (rows, cols) in enumerate(boxes, start=1):
+            box = (
+                slice(row_min + rows.start, row_min + rows.stop),
+                slice(col_min + cols.start, col_min + cols.stop),
+            )
+            fill(elev[box], labels[rows, cols] == label)
+
+
+def _nonzero_range(values: np.ndarray, size: int) -> Tuple[int, int]:
+    """Range of the non zero values, widened by one within [0, size)."""
+    indices = np.flatnonzero(values)
+    return max(indices[0] - 1, 0), min(indices[-1] + 2, size)
+
+
+def _fill_nearest(elev: np.ndarray, void: np.ndarray):
+    """Fill the void cells of elev by the value of the nearest valid cell."""
+    from scipy import ndimage
+
+    # Other voids may cross the box, their cells are not valid either
+    _, indices = ndimage.distance_transform_edt(np.isnan(elev), return_indices=True)
+    elev[void] = elev[tuple(indices[:, void])]
+
+
+def _fill_harmonic(elev: np.ndarray, void: np.ndarray):
+    """
+    Fill the void cells of elev by solving the Laplace equation, each void cell being
+    the mean of its 4 neighbours, the valid cells around the void being fixed.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.linalg import spsolve
+
+    rows, cols = np.nonzero(void)
+    count = len(rows)
+    index = np.full(void.shape, -1)
+    index[rows, cols] = np.arange(count)
+
+    diagonal = np.zeros(count)
+    rhs = np.zeros(count)
+    neighbours_i, neighbours_j = [], []
+    for di, dj in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+        i, j = rows + di, cols + dj
+        # Neighbours out of the map are ignored
+        inside = (i >= 0) & (i < void.shape[0]) & (j >= 0) & (j < void.shape[1])
+        unknown = inside.copy()
+        unknown[inside] = void[i[inside], j[inside]]
+        known = inside & ~unknown
+
+        diagonal += inside
+        np.add.at(rhs, np.nonzero(known)[0], elev[i[known], j[known]])
+        neighbours_i.append(np.nonzero(unknown)[0])
+        neighbours_j.append(index[i[unknown], j[unknown]])
+
+    neighbours_i = np.concatenate(neighbours_i)
+    neighbours_j = np.concatenate(neighbours_j)
+    matrix = coo_matrix(
+        (
+            np.concatenate([diagonal, -np.ones(len(neighbours_i))]),
+            (
+                np.concatenate([np.arange(count), neighbours_i]),
+                np.concatenate([np.arange(count), neighbours_j]),
+            ),
+        ),
+        shape=(count, count),
+    ).tocsr()
+    elev[rows, cols] = spsolve(matrix, rhs)
+
+
+def smooth_elevation(elev: np.ndarray) -> np.ndarray:
+    from scipy.ndimage import gaussian_filter
+
+    with stage("smoothing"):
+        return gaussian_filter(elev, sigma=SMOOTHING_SIGMA, radius=SMOOTHING_RADIUS)
+
+
+def downsample_elevation(elev: np.ndarray) -> np.ndarray:
+    """
+    Halve the resolution of an elevation map of odd dimensions, keeping every other
+    sample. Each kept sample is the mean of the area it covers at the lower
+    resolution, its neighbours being weighted half as much as itself, and samples out
+    of the map being ignored.
+    """
+    with stage("downsampling"):
+        elev = np.asarray(elev, dtype=np.float32)
+        for axis in (0, 1):
+            elev = np.moveaxis(elev, axis, 0)
+            total = 2 * elev[::2]
+            weight = np.full((len(total), 1), 2, dtype=np.float32)
+            total[1:] += elev[1::2]
+            total[:-1] += elev[1::2]
+            weight[1:] += 1
+            weight[:-1] += 1
+            elev = np.moveaxis(total / weight, 0, axis)
+        return elev
+
+
+def _load_mosaic(
+    window: CropWindow, files_provider: IGetElevationFiles, reader=None, level=0
+) -> TileMosaic:
+    """Get the paths of the tiles covered by a window at a level, and mosaic them."""
+    tiles = _window_tiles(window, level)
+    files = [tile_filename(lat, lon) for lat, lon in tiles]
+
+    # Providers may return paths in a different order than the requested files
+    with stage("tile_fetch"):
+        paths = {path.name: path for path in files_provider.get_paths(files)}
+
+    logger.info(
+        f"Loading elevation from files {', '.join(str(p) for p in paths.values())}"
+    )
+    return TileMosaic(
+        {tile: paths[file] for tile, file in zip(tiles, files)}, reader, level
+    )
+
+
+def _window_tiles(window: CropWindow, level: int = 0) -> List[Tuple[int, int]]:
+    """(lat, lon) of the south-west corners of the tiles covered by a window."""
+    steps = (TILE_SIZE - 1) >> level
+    lat_max = 89 - window.row_min // steps
+    lat_min = 89 - (window.row_max - 2) // steps
+    lon_min = window.col_min // steps - 180
+    lon_max = (window.col_max - 2) // steps - 180
+
+    return list(product(range(lat_min, lat_max + 1), range(lon_min, lon_max + 1)))
+
+
+def _voids_cut_by_window(elev, window, mosaic: TileMosaic) -> bool:
+    """Check for voids on the window borders that are not mosaic borders."""
+    row_min, row_max, col_min, col_max = window
+    borders = [
+        (row_min > mosaic.row_min, elev[0, :]),
+        (row_max < mosaic.row_max, elev[-1, :]),
+        (col_min > mosaic.col_min, elev[:, 0]),
+        (col_max < mosaic.col_max, elev[:, -1]),
+    ]
+    return any(is_cut and np.isnan(border).any() for is_cut, border in borders)
 
 
 def crop_elevation_map(elevation: np.ndarray, track_bounds: TrackBounds):
     """
-    Crop an elevation map to fit the track bounds. Returns the crop map together with
-    the coordinate shift vector.
+    Crop an elevation map returned by load_elevation_map to fit the track bounds.
+    Returns the crop map together with the coordinate shift vector and scale.
+    """
+    with stage("crop"):
+        window = crop_window(track_bounds)
+
+        # load_elevation_map covers the whole tiles intersecting the crop window
+        steps = TILE_SIZE - 1
+        origin_row = window.row_min // steps * steps
+        origin_col = window.col_min // steps * steps
+
+        cropped_elevation = elevation[
+            window.row_min - origin_row : window.row_max - origin_row,
+            window.col_min - origin_col : window.col_max - origin_col,
+        ]
+    return (cropped_elevation, window.shift_vector, window.scale)
+
+
+def crop_window(track_bounds: TrackBounds, level: int = 0) -> CropWindow:
+    """
+    Compute the square window of elevation samples covering the track bounds with a
+    margin, in global sample indices of a level of the tiles pyramid. The shift vector
+    is the (lon, lat) of the south-west sample of the window, and the scale its width
+    in degrees.
     """
-    rows, cols = elevation.shape
-    assert rows == cols
-    size = rows
+    steps = (TILE_SIZE - 1) >> level
 
     width_c = (
         max(
@@ -69,25 +505,26 @@ def crop_elevation_map(elevation: np.ndarray, track_bounds: TrackBounds):
         )
         * 1.2
     )
+    width = max(ceil(width_c * steps), 1)
 
     mid_lat = (track_bounds.lat_max + track_bounds.lat_min) / 2
-    cropped_lat_min = mid_lat - width_c / 2
-    cropped_lat_max = mid_lat + width_c / 2
-    row_min = floor((1 - (cropped_lat_max % 1)) * size)
-    row_max = ceil((1 - (cropped_lat_min % 1)) * size)
+    row_min = floor((90 - (mid_lat + width_c / 2)) * steps)
+    row_max = row_min + width + 1
 
     mid_lon = (track_bounds.lon_max + track_bounds.lon_min) / 2
-    cropped_lon_min = mid_lon - width_c / 2
-    cropped_lon_max = mid_lon + width_c / 2
-    col_min = floor((cropped_lon_min % 1) * size)
-    col_max = ceil((cropped_lon_max % 1) * size)
-
-    print(row_min, row_max, col_min, col_max)
+    col_min = floor((180 + (mid_lon - width_c / 2)) * steps)
+    col_max = col_min + width + 1
 
-    cropped_elevation = elevation[
-        row_min:row_max,
-        col_min:col_max,
-    ]
-    shift_vector = [cropped_lon_min, cropped_lat_min]
-    print(f"shift vector: {shift_vector}")
-    return (cropped_elevation, shift_vector, width_c)
+    shift_vector = [col_min / steps - 180, 90 - (row_max - 1) / steps]
+    logger.debug(
+        f"Crop window rows {row_min}-{row_max}, columns {col_min}-{col_max}, "
+        f"shift vector {shift_vector}"
+    )
+    return CropWindow(
+        row_min=row_min,
+        row_max=row_max,
+        col_min=col_min,
+        col_max=col_max,
+        shift_vector=shift_vector,
+        scale=width / steps,
+    )
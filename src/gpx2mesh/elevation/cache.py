@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+from gpx2mesh.caching import LoadOnceLRU, evict_least_recently_used, write_atomically
+import gpx2mesh.elevation as elevation
+
+logger = logging.getLogger(__name__)
+
+
+class PreprocessedTileCache:
+    """
+    Store filled and smoothed elevation tiles on disk as little-endian float32 .npy
+    files, so that they can be memory-mapped instead of being preprocessed again.
+
+    Entries are keyed by tile name, filter parameters and source file hash. The least
+    recently used entries are evicted when the cache grows over max_size bytes.
+
+    The cache also stores the levels of a pyramid of each tile, level l being
+    downsampled 2**l times from the preprocessed tile with downsample_elevation.
+    """
+
+    def __init__(self, folder: Path, max_size: int = 2 * 1024**3):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.max_size = max_size
+        self._hashes = {}
+
+    def get(self, path: Path, level: int = 0) -> np.ndarray:
+        """
+        Return the preprocessed tile, or a level of its pyramid, as a read-only memory
+        map. Levels are computed from the previous one, which is cached as well.
+        """
+        entry = self.folder / self._entry_name(path, level)
+
+        if os.path.exists(entry):
+            os.utime(entry)  # Mark the entry as recently used
+        elif level > 0:
+            elev = elevation.downsample_elevation(self.get(path, level - 1))
+            self._store(entry, elev)
+            self._evict(keep=entry)
+        else:
+            logger.info(f"Preprocessing elevation file {path}")
+            self._store(entry, elevation.preprocess_tile(path))
+            self._evict(keep=entry)
+
+        return np.load(entry, mmap_mode="r")
+
+    def _entry_name(self, path: Path, level: int = 0) -> str:
+        tile = Path(path).name.removesuffix(".hgts")
+        filters = f"s{elevation.SMOOTHING_SIGMA}r{elevation.SMOOTHING_RADIUS}"
+        suffix = f"-l{level}" if level > 0 else ""
+        return f"{tile}-{filters}-{self._hash(path)}{suffix}.npy"
+
+    def _hash(self, path: Path) -> str:
+        """Hash a source file content, memoized on its size and modification time."""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+        if key not in self._hashes:
+            digest = hashlib.blake2b(digest_size=8)
+            with open(path, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    digest.update(chunk)
+            self._hashes[key] = digest.hexdigest()
+
+        return self._hashes[key]
+
+    def _store(self, entry: Path, elev: np.ndarray):
+        write_atomically(entry, lambda f: np.save(f, elev.astype("<f4", copy=False)))
+
+    def _evict(self, keep: Path):
+        for entry in evict_least_recently_used(
+            self.folder, "*.npy", self.max_size, keep
+        ):
+            logger.info(f"Evicted preprocessed elevation file {entry.name}")
+
+
+class MemoryTileCache(LoadOnceLRU):
+    """
+    Keep the max_tiles most recently used preprocessed tiles in memory, for long
+    running processes. Missing tiles are read from a backing cache, such as a
+    PreprocessedTileCache, or preprocessed if there is none. Safe to share between
+    threads, a tile being loaded only once when requested concurrently.
+
+    Levels of the tiles pyramid are kept as separate tiles, read from the backing
+    cache or downsampled from the previous level if there is none.
+    """
+
+    def __init__(self, max_tiles: int = 8, backing=None):
+        super().__init__()
+        self.max_tiles = max_tiles
+        self.backing = backing
+
+    def get(self, path: Path, level: int = 0) -> np.ndarray:
+        return self._get(
+            (os.path.abspath(path), level), lambda: self._load(path, level)
+        )
+
+    def _load(self, path: Path, level: int) -> np.ndarray:
+        with self._lock:
+            self.misses += 1
+
+        if self.backing is not None:
+            elev = np.array(
+                self.backing.get(path, level) if level else self.backing.get(path)
+            )
+        elif level > 0:
+            elev = elevation.downsample_elevation(self.get(path, level - 1))
+        else:
+            elev = elevation.preprocess_tile(path)
+        elev.flags.writeable = False
+        return elev
+
+    def _evict(self, added):
+        while len(self._values) > self.max_tiles:
+            self._values.popitem(last=False)
@@ -0,0 +1,114 @@
+import os
+from pathlib import Path
+import shutil
+from tempfile import gettempdir, mkdtemp
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from gpx2mesh.elevation import downsample_elevation
+
+# Memory backed file system of Linux, where shared tiles are kept when available
+SHARED_MEMORY_FOLDER = Path("/dev/shm")
+
+
+class SharedTileRegistry:
+    """
+    Publish preprocessed elevation tiles in shared memory, so that worker processes map
+    them read-only instead of holding their own copy. Each tile is copied once from a
+    tile cache (see gpx2mesh.elevation.cache) to a file of a memory backed folder, and
+    removed when its last reference is released.
+
+    Tiles are shared as files rather than multiprocessing.shared_memory blocks, as
+    closing a block unmaps it even if NumPy views on it are still alive, while a
+    memory-mapped file stays mapped as long as a view needs it.
+    """
+
+    def __init__(self, tile_cache, folder: Optional[Path] = None):
+        if folder is None:
+            shared = SHARED_MEMORY_FOLDER
+            folder = shared if shared.is_dir() else Path(gettempdir())
+        self.tile_cache = tile_cache
+        self.folder = Path(mkdtemp(prefix="gpx2mesh-tiles-", dir=folder))
+        self._tiles: Dict[str, Path] = {}
+        self._references: Dict[str, int] = {}
+        self._published = 0
+
+    def acquire(self, path: Path) -> Path:
+        """
+        Reference a tile, loading it in shared memory if it is not already. Returns
+        the shared file to read with a SharedTileReader.
+        """
+        key = str(path)
+        if key not in self._tiles:
+            # Files are never reused, as other processes may still map removed ones
+            self._published += 1
+            shared_file = self.folder / f"{self._published}-{Path(path).name}.npy"
+            np.save(shared_file, self.tile_cache.get(path))
+            self._tiles[key] = shared_file
+            self._references[key] = 0
+
+        self._references[key] += 1
+        return self._tiles[key]
+
+    def release(self, path: Path):
+        """
+        Drop a reference to a tile, removing it with the last one. Processes still
+        mapping it keep it in memory until they drop their views.
+        """
+        key = str(path)
+        self._references[key] -= 1
+        if self._references[key] == 0:
+            del self._references[key]
+            os.remove(self._tiles.pop(key))
+
+    def close(self):
+        """Remove every tile, whatever their references."""
+        shutil.rmtree(self.folder, ignore_errors=True)
+        self._tiles.clear()
+        self._references.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class SharedTileReader:
+    """
+    Read tiles published by a SharedTileRegistry, possibly from another process. Like
+    a tile cache, get returns the preprocessed tile of a path, here as a read-only
+    memory map of its shared file. Levels of the tiles pyramid are downsampled from it
+    by each process, and kept as long as the tile is published.
+    """
+
+    def __init__(self, tiles: Optional[Dict[str, Path]] = None):
+        self.tiles: Dict[str, Path] = {}
+        self._mapped: Dict[Path, np.ndarray] = {}
+        self._levels: Dict[Tuple[Path, int], np.ndarray] = {}
+        self.update(tiles or {})
+
+    def update(self, tiles: Dict[str, Path]):
+        """Replace the published tiles, dropping the maps of those no longer listed."""
+        self.tiles = dict(tiles)
+        shared_files = set(self.tiles.values())
+        for shared_file in list(self._mapped):
+            if shared_file not in shared_files:
+                del self._mapped[shared_file]
+        for shared_file, level in list(self._levels):
+            if shared_file not in shared_files:
+                del self._levels[shared_file, level]
+
+    def get(self, path: Path, level: int = 0) -> np.ndarray:
+        shared_file = self.tiles[str(path)]
+        if level > 0:
+            if (shared_file, level) not in self._levels:
+                self._levels[shared_file, level] = downsample_elevation(
+                    self.get(path, level - 1)
+                )
+            return self._levels[shared_file, level]
+
+        if shared_file not in self._mapped:
+            self._mapped[shared_file] = np.load(shared_file, mmap_mode="r")
+        return self._mapped[shared_file]
@@ -1,14 +1,20 @@
 import abc
-import io
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import os
 from pathlib import Path
 import shutil
 from tempfile import TemporaryDirectory
-from typing import List
+import threading
+import time
+from typing import List, Optional
+from urllib.parse import urlparse
 import zipfile
 
 import requests
 
+logger = logging.getLogger(__name__)
+
 
 class ElevationFileNotFoundError(Exception):
     def __init__(self, missing_files: List[str]):
@@ -23,6 +29,13 @@ class IGetElevationFiles(metaclass=abc.ABCMeta):
         """May raise ElevationFileNotFound if a file cannot be found."""
         pass
 
+    def get_local_paths(self, files: List[str]) -> List[Path]:
+        """
+        Paths of the files available without fetching them, such as downloading.
+        Providers that cannot tell return none.
+        """
+        return []
+
 
 class AssetsFolderProvider(IGetElevationFiles):
     """Provide elevation file location from a given assets folder."""
@@ -48,47 +61,115 @@ class AssetsFolderProvider(IGetElevationFiles):
 
         return paths
 
+    def get_local_paths(self, files) -> List[Path]:
+        return [self.assets / f for f in files if os.path.exists(self.assets / f)]
+
 
 class NasaConnectionError(Exception):
     def __init__(self, error_code):
         self.error_code = error_code
 
 
+class EarthdataSession(requests.Session):
+    """Session keeping its authorization header when redirected to EarthData login.
+    Snippet adapted from https://urs.earthdata.nasa.gov/documentation/for_users/data_access/python"""
+
+    AUTH_HOST = "urs.earthdata.nasa.gov"
+
+    def rebuild_auth(self, prepared_request, response):
+        headers = prepared_request.headers
+        if "Authorization" in headers:
+            original_host = urlparse(response.request.url).hostname
+            redirect_host = urlparse(prepared_request.url).hostname
+            if (
+                original_host != redirect_host
+                and redirect_host != self.AUTH_HOST
+                and original_host != self.AUTH_HOST
+            ):
+                del headers["Authorization"]
+
+
 class NasaConnection:
     def __init__(
         self,
         user: str,
         pwd: str,
         url: str,
+        pool_size: int = 8,
+        retries: int = 3,
+        backoff: float = 1.0,
     ):
         self.auth = (user, pwd)
         self.url = url
-        self.session = requests.Session()
+        self.retries = retries
+        self.backoff = backoff
+        self.session = EarthdataSession()
         self.session.auth = self.auth
 
+        # Keep enough connections alive for concurrent downloads
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
     def __del__(self):
         self.session.close()
 
-    def fetch(self, filename):
-        """Snippet adapted from https://urs.earthdata.nasa.gov/documentation/for_users/data_access/python"""
+    def download(self, filename: str, destination: Path):
+        """
+        Stream the zip archive of an elevation file to destination. Connection and
+        server errors are retried with exponential backoff, and the download resumes
+        from the content already in destination when the server supports it.
+        """
         url = f"{self.url}/NASADEM_SHHP_{filename}/NASADEM_SHHP_{filename}.zip"
-        r1 = self.session.request("get", url)
-        r = self.session.get(r1.url, auth=self.session.auth)
 
-        if not r.ok:
-            raise NasaConnectionError(r.status_code)
+        for attempt in range(self.retries + 1):
+            try:
+                return self._download(url, destination)
+            except (requests.RequestException, NasaConnectionError) as exc:
+                retryable = not isinstance(exc, NasaConnectionError) or (
+                    exc.error_code == 429 or exc.error_code >= 500
+                )
+                if not retryable or attempt == self.retries:
+                    raise
+
+                delay = self.backoff * 2**attempt
+                logger.warning(
+                    f"Download of {filename} failed ({exc!r}), retrying in {delay}s"
+                )
+                time.sleep(delay)
+
+    def _download(self, url: str, destination: Path):
+        offset = os.path.getsize(destination) if os.path.exists(destination) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
+
+        with self.session.get(url, headers=headers, stream=True) as r:
+            if r.status_code == 416 and offset > 0:
+                return  # The previous download was already complete
 
-        return r.content
+            if not r.ok:
+                raise NasaConnectionError(r.status_code)
+
+            # The server may ignore the range and send the whole content
+            mode = "ab" if r.status_code == 206 else "wb"
+            with open(destination, mode) as f:
+                for chunk in r.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
 
 
 class NasaProvider(IGetElevationFiles):
     """Look for elevation files in a folder and try to download missing files from
     NASA EarthData."""
 
-    def __init__(self, assets: Path, connection: NasaConnection):
+    def __init__(self, assets: Path, connection: NasaConnection, workers: int = 4):
         os.makedirs(assets, exist_ok=True)
         self.assets = assets
         self.connection = connection
+        self.workers = workers
+        # Files being downloaded, by a single thread each, as they share a part file
+        self._downloads = {}
+        self._lock = threading.Lock()
 
     def get_paths(self, files: List[str]) -> List[Path]:
         paths = []
@@ -101,24 +182,62 @@ class NasaProvider(IGetElevationFiles):
                 missing_files.append(file)
 
         files_in_error = []
-        for file in missing_files:
-            filename = file.removesuffix(".hgts")
-
-            try:
-                content = self.connection.fetch(filename)
-                z = zipfile.ZipFile(io.BytesIO(content))
-                with TemporaryDirectory() as tmpdir:
-                    z.extractall(tmpdir)
-                    shutil.move(Path(tmpdir) / file, self.assets / file)
-                    paths.append(self.assets / file)
-                    print(f"Downloaded elevation file {file}")
-            except NasaConnectionError as exc:
-                files_in_error.append(filename)
-                print(
-                    f"Error when trying to download {file}: response has {exc.error_code}"
-                )
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for file, path in zip(
+                missing_files, executor.map(self._download, missing_files)
+            ):
+                if path is None:
+                    files_in_error.append(file.removesuffix(".hgts"))
+                else:
+                    paths.append(path)
 
         if len(files_in_error) > 0:
             raise ElevationFileNotFoundError(files_in_error)
 
         return paths
+
+    def get_local_paths(self, files) -> List[Path]:
+        """Paths of the files already downloaded."""
+        return [self.assets / f for f in files if os.path.exists(self.assets / f)]
+
+    def _download(self, file: str) -> Optional[Path]:
+        """
+        Download and extract a file, returning None if it cannot be downloaded. Threads
+        requesting a file being downloaded wait for it.
+        """
+        with self._lock:
+            download = self._downloads.setdefault(file, threading.Lock())
+
+        with download:
+            if os.path.exists(self.assets / file):
+                return self.assets / file
+            return self._download_once(file)
+
+    def _download_once(self, file: str) -> Optional[Path]:
+        filename = file.removesuffix(".hgts")
+        archive = self.assets / f"{filename}.zip.part"
+
+        try:
+            self.connection.download(filename, archive)
+            with (
+                zipfile.ZipFile(archive) as z,
+                TemporaryDirectory(dir=self.assets) as tmpdir,
+            ):
+                z.extract(file, tmpdir)
+                shutil.move(Path(tmpdir) / file, self.assets / file)
+        except NasaConnectionError as exc:
+            logger.error(
+                f"Error when trying to download {file}: response has {exc.error_code}"
+            )
+            return None
+        except requests.RequestException as exc:
+            logger.error(f"Error when trying to download {file}: {exc!r}")
+            return None
+        except (zipfile.BadZipFile, KeyError) as exc:
+            logger.error(f"Error when trying to extract {file}: {exc!r}")
+            os.remove(archive)
+            return None
+
+        os.remove(archive)
+        logger.info(f"Downloaded elevation file {file}")
+        return self.assets / file
@@ -0,0 +1,184 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import os
+from pathlib import Path
+import re
+from tempfile import TemporaryDirectory
+import threading
+import zipfile
+
+import pytest
+
+from gpx2mesh.elevation.sources import (
+    ElevationFileNotFoundError,
+    NasaConnection,
+    NasaProvider,
+)
+
+
+HGTS_CONTENT = os.urandom(512 * 1024)
+
+
+def zip_content(filename: str):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr(filename, HGTS_CONTENT)
+
+    return archive.getvalue()
+
+
+class NasaStandIn(ThreadingHTTPServer):
+    """Serve zipped .hgts files like NASA EarthData, with configurable failures."""
+
+    def __init__(self, files, failures=0, truncate=False):
+        super().__init__(("127.0.0.1", 0), NasaStandInHandler)
+        self.files = {f"{name}.zip": zip_content(f"{name}.hgts") for name in files}
+        self.failures = failures
+        self.truncate = truncate
+        self.data_requests = Counter()
+        self.ranges = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class NasaStandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        name = self.path.rsplit("NASADEM_SHHP_", 1)[-1]
+        if name not in server.files:
+            self.send_error(404)
+            return
+
+        if self.headers.get("Authorization") is None:
+            self.send_error(401)
+            return
+
+        with server.lock:
+            server.data_requests[name] += 1
+            attempt = server.data_requests[name]
+            server.ranges.append(self.headers.get("Range"))
+
+        if attempt <= server.failures:
+            self.send_error(503)
+            return
+
+        content = server.files[name]
+        start = 0
+        if match := re.match(r"bytes=(\d+)-", self.headers.get("Range", "")):
+            start = int(match.group(1))
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(content) - start))
+        self.end_headers()
+
+        if server.truncate and attempt == 1:
+            # Drop the connection in the middle of the first response
+            self.wfile.write(content[: len(content) // 2])
+            self.close_connection = True
+            return
+
+        self.wfile.write(content[start:])
+
+
+@pytest.fixture
+def stand_in(request):
+    server = NasaStandIn(**request.param)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def provider(assets: Path, server: NasaStandIn, workers=4):
+    connection = NasaConnection(user="u", pwd="p", url=server.url, backoff=0)
+    return NasaProvider(assets, connection, workers=workers)
+
+
+@pytest.mark.parametrize(
+    "stand_in",
+    [{"files": ["n45e004", "n45e005", "n46e004", "n46e005"]}],
+    indirect=True,
+)
+def test_concurrent_downloads(stand_in):
+    files = ["n45e004.hgts", "n45e005.hgts", "n46e004.hgts", "n46e005.hgts"]
+
+    with TemporaryDirectory() as tmp_dir:
+        assets = Path(tmp_dir)
+        paths = provider(assets, stand_in).get_paths(files)
+
+        assert paths == [assets / file for file in files]
+        for path in paths:
+            assert path.read_bytes() == HGTS_CONTENT
+        assert sorted(p.name for p in assets.iterdir()) == files
+
+
+@pytest.mark.parametrize(
+    "stand_in", [{"files": ["n45e004"], "failures": 2}], indirect=True
+)
+def test_download_retries_server_errors(stand_in):
+    with TemporaryDirectory() as tmp_dir:
+        assets = Path(tmp_dir)
+        paths = provider(assets, stand_in).get_paths(["n45e004.hgts"])
+
+        assert paths == [assets / "n45e004.hgts"]
+        assert stand_in.data_requests["n45e004.zip"] == 3
+
+
+@pytest.mark.parametrize(
+    "stand_in", [{"files": ["n45e004"], "truncate": True}], indirect=True
+)
+def test_download_resumes_interrupted_transfer(stand_in):
+    with TemporaryDirectory() as tmp_dir:
+        assets = Path(tmp_dir)
+        paths = provider(assets, stand_in).get_paths(["n45e004.hgts"])
+
+        assert paths == [assets / "n45e004.hgts"]
+        assert paths[0].read_bytes() == HGTS_CONTENT
+
+        # The second request only asks for the part that was not received
+        first_range, second_range = stand_in.ranges
+        assert first_range is None
+        assert int(re.match(r"bytes=(\d+)-", second_range).group(1)) > 0
+
+
+@pytest.mark.parametrize(
+    "stand_in", [{"files": ["n45e004"], "failures": 10}], indirect=True
+)
+def test_missing_files_are_reported_together(stand_in):
+    with TemporaryDirectory() as tmp_dir:
+        assets = Path(tmp_dir)
+
+        with pytest.raises(ElevationFileNotFoundError) as exc_info:
+            provider(assets, stand_in).get_paths(["n45e004.hgts", "n45e005.hgts"])
+
+        assert exc_info.value.missing_files == ["n45e004", "n45e005"]
+        assert stand_in.data_requests["n45e004.zip"] == 4
+
+
+@pytest.mark.parametrize("stand_in", [{"files": ["n45e004"]}], indirect=True)
+def test_concurrent_requests_download_a_file_once(stand_in):
+    with TemporaryDirectory() as tmp_dir:
+        assets = Path(tmp_dir)
+        shared = provider(assets, stand_in)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(lambda _: shared.get_paths(["n45e004.hgts"]), range(4))
+            )
+
+        assert results == [[assets / "n45e004.hgts"]] * 4
+        assert (assets / "n45e004.hgts").read_bytes() == HGTS_CONTENT
+        assert stand_in.data_requests["n45e004.zip"] == 1
@@ -2,7 +2,7 @@ import io
 from pathlib import Path
 import struct
 from tempfile import TemporaryDirectory
-from unittest.mock import MagicMock
+from unittest.mock import ANY, MagicMock
 import zipfile
 
 import pytest
@@ -25,9 +25,16 @@ def zip_content(filename: str):
     return archive.getvalue()
 
 
+def write_zip_content(filename: str):
+    def download(_, destination: Path):
+        destination.write_bytes(zip_content(filename))
+
+    return download
+
+
 def test_download_missing_files():
     mocked_connection = MagicMock(NasaConnection)
-    mocked_connection.fetch.return_value = zip_content("toto.hgts")
+    mocked_connection.download.side_effect = write_zip_content("toto.hgts")
 
     with TemporaryDirectory() as tmp_dir:
         provider = NasaProvider(Path(tmp_dir), mocked_connection)
@@ -35,13 +42,14 @@ def test_download_missing_files():
         paths = provider.get_paths(["toto.hgts"])
 
         assert paths == [Path(tmp_dir) / "toto.hgts"]
+        assert list(Path(tmp_dir).iterdir()) == [Path(tmp_dir) / "toto.hgts"]
 
-        mocked_connection.fetch.assert_called_once_with("toto")
+        mocked_connection.download.assert_called_once_with("toto", ANY)
 
 
 def test_does_not_download_existing_files():
     mocked_connection = MagicMock(NasaConnection)
-    mocked_connection.fetch.return_value = zip_content("toto.hgts")
+    mocked_connection.download.side_effect = write_zip_content("toto.hgts")
 
     with TemporaryDirectory() as tmp_dir:
         assets = Path(tmp_dir)
@@ -55,12 +63,12 @@ def test_does_not_download_existing_files():
             assets / "toto.hgts",
         ]
 
-        mocked_connection.fetch.assert_called_once_with("toto")
+        mocked_connection.download.assert_called_once_with("toto", ANY)
 
 
 def test_raises_exception_file_does_not_exists_on_remote():
     mocked_connection = MagicMock(NasaConnection)
-    mocked_connection.fetch.side_effect = NasaConnectionError(error_code=404)
+    mocked_connection.download.side_effect = NasaConnectionError(error_code=404)
 
     with TemporaryDirectory() as tmp_dir:
         provider = NasaProvider(Path(tmp_dir), mocked_connection)
@@ -70,4 +78,4 @@ def test_raises_exception_file_does_not_exists_on_remote():
 
         assert exc_info.value.missing_files == ["toto"]
 
-        mocked_connection.fetch.assert_called_once_with("toto")
+        mocked_connection.download.assert_called_once_with("toto", ANY)
@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+
+import gpx2mesh.elevation
+from gpx2mesh.elevation import load_cropped_elevation_map
+from gpx2mesh.elevation.cache import MemoryTileCache, PreprocessedTileCache
+from gpx2mesh.elevation.sources import AssetsFolderProvider
+from gpx2mesh.track import TrackBounds
+
+
+def test_cache_preprocesses_tile_once(assets, monkeypatch):
+    cache = PreprocessedTileCache(assets / "cache")
+
+    tile = cache.get(assets / "n45e004.hgts")
+
+    expected = gpx2mesh.elevation.preprocess_tile(assets / "n45e004.hgts")
+    np.testing.assert_array_equal(tile, expected)
+    assert isinstance(tile, np.memmap)
+    assert tile.dtype == np.dtype("<f4")
+
+    def fail(path):
+        raise AssertionError("Tile should not be preprocessed again")
+
+    monkeypatch.setattr(gpx2mesh.elevation, "preprocess_tile", fail)
+    np.testing.assert_array_equal(cache.get(assets / "n45e004.hgts"), expected)
+
+
+def test_cache_entry_changes_with_source_file(assets, tile_size):
+    cache = PreprocessedTileCache(assets / "cache")
+    cache.get(assets / "n45e004.hgts")
+
+    np.ones((tile_size, tile_size), dtype=">f4").tofile(assets / "n45e004.hgts")
+    os.utime(assets / "n45e004.hgts", ns=(0, 0))
+    tile = cache.get(assets / "n45e004.hgts")
+
+    np.testing.assert_array_equal(tile, np.ones((tile_size, tile_size)))
+    assert len(list((assets / "cache").glob("n45e004-*.npy"))) == 2
+
+
+def test_cache_evicts_least_recently_used_entries(assets, tile_size):
+    tile_bytes = tile_size * tile_size * 4
+    cache = PreprocessedTileCache(assets / "cache", max_size=int(tile_bytes * 2.5))
+
+    for name in ["n45e005.hgts", "n45e006.hgts", "n45e007.hgts"]:
+        np.zeros((tile_size, tile_size), dtype=">f4").tofile(assets / name)
+
+    cache.get(assets / "n45e005.hgts")
+    cache.get(assets / "n45e006.hgts")
+    os.utime(next((assets / "cache").glob("n45e005-*.npy")), (0, 0))
+    os.utime(next((assets / "cache").glob("n45e006-*.npy")), (1, 1))
+    cache.get(assets / "n45e005.hgts")
+    cache.get(assets / "n45e007.hgts")
+
+    entries = sorted(e.name.split("-")[0] for e in (assets / "cache").glob("*.npy"))
+    assert entries == ["n45e005", "n45e007"]
+
+
+def test_cropped_elevation_map_from_cache_is_not_copied(assets):
+    bounds = TrackBounds(lat_min=45.3, lat_max=45.5, lon_min=4.4, lon_max=4.6)
+    provider = AssetsFolderProvider(assets)
+    cache = PreprocessedTileCache(assets / "cache")
+
+    expected, expected_shift, expected_scale = load_cropped_elevation_map(
+        bounds, provider
+    )
+    cropped, shift, scale = load_cropped_elevation_map(bounds, provider, cache)
+
+    np.testing.assert_allclose(cropped, expected, rtol=1e-6)
+    assert isinstance(cropped.base, np.memmap)
+    assert (shift, scale) == (expected_shift, expected_scale)
+
+
+def test_cropped_elevation_map_from_cache_pyramid(assets):
+    bounds = TrackBounds(lat_min=45.3, lat_max=45.5, lon_min=4.4, lon_max=4.6)
+    provider = AssetsFolderProvider(assets)
+    cache = PreprocessedTileCache(assets / "cache")
+
+    expected, _, _ = load_cropped_elevation_map(bounds, provider, level=2)
+    cropped, _, _ = load_cropped_elevation_map(bounds, provider, cache, level=2)
+
+    np.testing.assert_allclose(cropped, expected, rtol=1e-5)
+    assert isinstance(cropped.base, np.memmap)
+    # The tile and its first two levels
+    assert len(list((assets / "cache").glob("n45e004-*.npy"))) == 3
+
+
+class CountingCache:
+    def __init__(self):
+        self.loads = []
+
+    def get(self, path):
+        self.loads.append(path)
+        return np.full((2, 2), len(self.loads), dtype=np.float32)
+
+
+def test_memory_cache_keeps_most_recently_used_tiles():
+    backing = CountingCache()
+    cache = MemoryTileCache(max_tiles=2, backing=backing)
+
+    first = cache.get("a")
+    cache.get("b")
+    assert cache.get("a") is first
+    cache.get("c")  # Evicts b, the least recently used
+    cache.get("a")
+    cache.get("b")
+
+    assert backing.loads == ["a", "b", "c", "b"]
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert not first.flags.writeable
+
+
+def test_memory_cache_preprocesses_tiles_without_backing(assets, tile_size):
+    cache = MemoryTileCache()
+
+    tile = cache.get(assets / "n45e004.hgts")
+
+    assert tile.shape == (tile_size, tile_size)
+    assert not np.isnan(tile).any()
+    assert cache.get(assets / "n45e004.hgts", level=2).shape == (91, 91)
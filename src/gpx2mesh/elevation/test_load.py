@@ -0,0 +1,197 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pytest
+
+import gpx2mesh.elevation
+from gpx2mesh.elevation import (
+    ELEVATION_NAN_VALUE,
+    crop_elevation_map,
+    crop_window,
+    downsample_elevation,
+    load_cropped_elevation_map,
+    load_elevation_map,
+    pyramid_level,
+)
+from gpx2mesh.elevation.sources import AssetsFolderProvider
+from gpx2mesh.profiling import profile
+from gpx2mesh.track import TrackBounds
+
+
+def test_cropped_elevation_map_matches_full_pipeline(provider):
+    bounds = TrackBounds(lat_min=45.3, lat_max=45.5, lon_min=4.4, lon_max=4.6)
+
+    full = load_elevation_map(bounds, provider)
+    expected, expected_shift, expected_scale = crop_elevation_map(full, bounds)
+
+    cropped, shift, scale = load_cropped_elevation_map(bounds, provider)
+
+    np.testing.assert_allclose(cropped, expected, rtol=1e-6)
+    assert shift == expected_shift
+    assert scale == expected_scale
+
+
+def test_elevation_loading_stages(provider):
+    bounds = TrackBounds(lat_min=45.3, lat_max=45.5, lon_min=4.4, lon_max=4.6)
+
+    with profile() as profiler:
+        load_cropped_elevation_map(bounds, provider)
+        crop_elevation_map(load_elevation_map(bounds, provider), bounds)
+
+    names = [record.name for record in profiler.records]
+    assert {"tile_fetch", "tile_decode", "void_fill", "smoothing"} <= set(names)
+    # Window selection and crop of both loaders
+    assert names.count("crop") == 3
+
+
+def test_cropped_elevation_map_across_tiles(tile_size):
+    steps = tile_size - 1
+
+    # A 2x2 tiles area, with tiles sharing their edge rows and columns
+    rng = np.random.default_rng(42)
+    area = rng.uniform(0, 1000, (2 * steps + 1, 2 * steps + 1)).astype(np.float32)
+    area[steps - 5 : steps + 5, steps - 5 : steps + 5] = ELEVATION_NAN_VALUE
+
+    bounds = TrackBounds(lat_min=45.8, lat_max=46.1, lon_min=4.9, lon_max=5.2)
+
+    with TemporaryDirectory() as tmp_dir:
+        assets = Path(tmp_dir)
+        for name, rows, cols in [
+            ("n46e004", slice(0, tile_size), slice(0, tile_size)),
+            ("n46e005", slice(0, tile_size), slice(steps, None)),
+            ("n45e004", slice(steps, None), slice(0, tile_size)),
+            ("n45e005", slice(steps, None), slice(steps, None)),
+        ]:
+            area[rows, cols].astype(">f4").tofile(assets / f"{name}.hgts")
+
+        provider = AssetsFolderProvider(assets)
+        cropped, shift, scale = load_cropped_elevation_map(bounds, provider)
+        full, _, _ = crop_elevation_map(load_elevation_map(bounds, provider), bounds)
+
+    expected = np.where(area == ELEVATION_NAN_VALUE, np.nan, area)
+    gpx2mesh.elevation.fill_voids(expected)
+    expected = gpx2mesh.elevation.smooth_elevation(expected)
+
+    # The area north-west corner is at lat 47, lon 4
+    row_min = round((47 - (shift[1] + scale)) * steps)
+    col_min = round((shift[0] - 4) * steps)
+    expected = expected[
+        row_min : row_min + cropped.shape[0], col_min : col_min + cropped.shape[1]
+    ]
+
+    assert cropped.shape[0] == cropped.shape[1] == round(scale * steps) + 1
+    assert shift[0] <= bounds.lon_min and shift[0] + scale >= bounds.lon_max
+    assert shift[1] <= bounds.lat_min and shift[1] + scale >= bounds.lat_max
+    np.testing.assert_allclose(cropped, expected, rtol=1e-6)
+    np.testing.assert_allclose(full, expected, rtol=1e-6)
+
+
+def test_fill_voids_matches_nearest_valid_cell():
+    from scipy import ndimage
+
+    rng = np.random.default_rng(0)
+    elev = rng.uniform(0, 1000, (100, 100))
+    for row, col in rng.integers(0, 95, (20, 2)):
+        elev[row : row + rng.integers(1, 6), col : col + rng.integers(1, 6)] = np.nan
+    elev[0:2, 10:14] = np.nan  # On the map border
+    voids = np.isnan(elev)
+
+    filled = elev.copy()
+    gpx2mesh.elevation.fill_voids(filled)
+
+    _, indices = ndimage.distance_transform_edt(voids, return_indices=True)
+    np.testing.assert_array_equal(filled, elev[tuple(indices)])
+
+
+def test_fill_voids_many_small_voids():
+    from scipy import ndimage
+
+    # Enough scattered voids for them to be filled at once rather than one by one
+    rng = np.random.default_rng(1)
+    elev = rng.uniform(0, 1000, (200, 200))
+    elev[rng.random(elev.shape) < 0.05] = np.nan
+    voids = np.isnan(elev)
+
+    filled = elev.copy()
+    gpx2mesh.elevation.fill_voids(filled)
+
+    _, indices = ndimage.distance_transform_edt(voids, return_indices=True)
+    np.testing.assert_array_equal(filled, elev[tuple(indices)])
+
+
+def test_fill_voids_harmonic():
+    # Harmonic functions are interpolated exactly
+    y, x = np.mgrid[0:30, 0:40].astype(float)
+    expected = x**2 - y**2 + 3 * x
+    elev = expected.copy()
+    elev[10:20, 5:15] = np.nan
+    elev[0:3, 30:35] = np.nan  # On the map border, a single one is missing
+
+    gpx2mesh.elevation.fill_voids(elev, "harmonic")
+
+    np.testing.assert_allclose(elev[10:20, 5:15], expected[10:20, 5:15])
+    assert not np.isnan(elev).any()
+
+
+def test_fill_voids_without_voids():
+    elev = np.ones((10, 10))
+
+    gpx2mesh.elevation.fill_voids(elev, "harmonic")
+
+    np.testing.assert_array_equal(elev, 1)
+    with pytest.raises(ValueError):
+        gpx2mesh.elevation.fill_voids(elev, "bicubic")
+
+
+@pytest.mark.parametrize("void_fill", ["nearest", "harmonic"])
+def test_cropped_elevation_map_fills_voids_like_full_map(provider, void_fill):
+    bounds = TrackBounds(lat_min=45.3, lat_max=45.5, lon_min=4.4, lon_max=4.6)
+
+    full = load_elevation_map(bounds, provider, void_fill)
+    expected, _, _ = crop_elevation_map(full, bounds)
+
+    cropped, _, _ = load_cropped_elevation_map(bounds, provider, void_fill=void_fill)
+
+    np.testing.assert_allclose(cropped, expected, rtol=1e-6)
+
+
+def test_downsample_elevation_averages_around_kept_samples():
+    rows, cols = np.mgrid[0:9, 0:7].astype(np.float32)
+    plane = 3 * rows + 2 * cols
+
+    downsampled = downsample_elevation(plane)
+
+    assert downsampled.shape == (5, 4)
+    # Planes are kept away from the borders, and constants everywhere
+    np.testing.assert_allclose(downsampled[1:-1, 1:-1], plane[2:-2:2, 2:-2:2])
+    np.testing.assert_allclose(downsample_elevation(np.full((9, 7), 4.0)), 4.0)
+
+
+@pytest.mark.usefixtures("tile_size")
+def test_pyramid_level_meets_resolution():
+    # Crops of 87, 44, 22 and 11 samples wide for levels 0 to 3
+    bounds = TrackBounds(lat_min=45.3, lat_max=45.5, lon_min=4.4, lon_max=4.6)
+
+    assert pyramid_level(bounds, 50.0, None) == 0
+    assert pyramid_level(bounds, 50.0, 0.5) == 0
+    assert pyramid_level(bounds, 50.0, 1.2) == 1
+    assert pyramid_level(bounds, 50.0, 3.0) == 2
+    # 45 samples per degree at level 3, which cannot be halved
+    assert pyramid_level(bounds, 50.0, 100.0) == 3
+
+
+def test_cropped_elevation_map_at_pyramid_level(provider):
+    bounds = TrackBounds(lat_min=45.3, lat_max=45.5, lon_min=4.4, lon_max=4.6)
+    window = crop_window(bounds, level=1)
+
+    full = downsample_elevation(load_elevation_map(bounds, provider))
+    expected = full[window.row_min % 180 :, window.col_min % 180 :][
+        : window.row_max - window.row_min, : window.col_max - window.col_min
+    ]
+
+    cropped, shift, scale = load_cropped_elevation_map(bounds, provider, level=1)
+
+    np.testing.assert_allclose(cropped, expected, rtol=1e-5)
+    assert shift == window.shift_vector
+    assert scale == window.scale
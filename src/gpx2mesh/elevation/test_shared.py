@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+from pathlib import Path
+
+import numpy as np
+
+from gpx2mesh.elevation.shared import SharedTileReader, SharedTileRegistry
+
+
+class FakeTileCache:
+    def __init__(self):
+        self.loads = []
+
+    def get(self, path):
+        self.loads.append(path)
+        return np.arange(12, dtype="<f4").reshape(3, 4) + len(str(path))
+
+
+def read_shared(tiles, path):
+    elev = SharedTileReader(tiles).get(path)
+    return float(elev.sum()), elev.flags.writeable
+
+
+def test_tiles_are_loaded_once_and_shared_across_processes(tmp_path):
+    cache = FakeTileCache()
+    with SharedTileRegistry(cache, tmp_path) as registry:
+        shared_file = registry.acquire(Path("a.hgts"))
+        assert registry.acquire(Path("a.hgts")) == shared_file
+        assert cache.loads == [Path("a.hgts")]
+
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            total, writeable = executor.submit(
+                read_shared, {"a.hgts": shared_file}, Path("a.hgts")
+            ).result()
+
+        assert total == np.arange(12).sum() + 12 * len("a.hgts")
+        assert not writeable
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_tiles_are_removed_with_their_last_reference(tmp_path):
+    registry = SharedTileRegistry(FakeTileCache(), tmp_path)
+    shared_file = registry.acquire(Path("a.hgts"))
+    registry.acquire(Path("a.hgts"))
+    view = SharedTileReader({"a.hgts": shared_file}).get("a.hgts")
+
+    registry.release(Path("a.hgts"))
+    assert shared_file.exists()
+
+    registry.release(Path("a.hgts"))
+    assert not shared_file.exists()
+    # Views taken before stay valid
+    assert view[2, 3] == 11 + len("a.hgts")
+
+    # A tile published again never reuses the file of a removed one
+    assert registry.acquire(Path("a.hgts")) != shared_file
+
+
+def test_reader_drops_unlisted_tiles(tmp_path):
+    with SharedTileRegistry(FakeTileCache(), tmp_path) as registry:
+        tiles = {"a": registry.acquire("a"), "b": registry.acquire("b")}
+        reader = SharedTileReader(tiles)
+        reader.get("a")
+        reader.get("b")
+
+        reader.update({"b": tiles["b"]})
+
+        assert list(reader._mapped) == [tiles["b"]]
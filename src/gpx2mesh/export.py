@@ -0,0 +1,119 @@
+import contextlib
+from pathlib import Path
+import zipfile
+
+import numpy as np
+
+# Faces written at once: bounds the memory used by the export, at about 200 bytes per
+# face, independently of the mesh size
+CHUNK_SIZE = 65536
+
+# Binary STL face record: normal, three vertices and an unused attribute
+_STL_FACE = np.dtype(
+    [("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")]
+)
+
+_3MF_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+</Types>
+"""
+_3MF_RELATIONSHIPS = """<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Target="/3D/3dmodel.model" Id="rel0" Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>
+</Relationships>
+"""
+_3MF_MODEL_START = """<?xml version="1.0" encoding="UTF-8"?>
+<model unit="millimeter" xml:lang="en-US" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">
+<resources><object id="1" type="model"><mesh><vertices>
+"""
+_3MF_MODEL_END = """</triangles></mesh></object></resources>
+<build><item objectid="1"/></build>
+</model>
+"""
+
+
+def export_mesh(mesh, output, file_type=None, chunk_size=CHUNK_SIZE):
+    """
+    Write a mesh as binary .stl or .3mf to a path or a binary file object, from its
+    vertex and face arrays only, chunk_size faces at a time. The file type defaults to
+    the output path suffix.
+    """
+    if file_type is None:
+        file_type = Path(output).suffix.lstrip(".").lower()
+    if file_type == "stl":
+        write_stl(mesh.vertices, mesh.faces, output, chunk_size)
+    elif file_type == "3mf":
+        write_3mf(mesh.vertices, mesh.faces, output, chunk_size)
+    else:
+        raise ValueError(f"Unknown export format: {file_type}")
+
+
+def write_stl(vertices, faces, output, chunk_size=CHUNK_SIZE):
+    """Write a binary .stl, computing the face normals chunk by chunk."""
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces)
+
+    with _open(output) as f:
+        f.write(b"gpx2mesh binary STL".ljust(80, b" "))
+        f.write(np.uint32(len(faces)).tobytes())
+
+        for start in range(0, len(faces), chunk_size):
+            triangles = vertices[faces[start : start + chunk_size]]
+            records = np.zeros(len(triangles), dtype=_STL_FACE)
+            records["normal"] = _normals(triangles)
+            records["vertices"] = triangles
+            f.write(records.tobytes())
+
+
+def write_3mf(vertices, faces, output, chunk_size=CHUNK_SIZE):
+    """Write a .3mf package, whose model is compressed as it is written."""
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces)
+
+    with (
+        _open(output) as f,
+        zipfile.ZipFile(f, "w", compression=zipfile.ZIP_DEFLATED) as package,
+    ):
+        package.writestr("[Content_Types].xml", _3MF_CONTENT_TYPES)
+        package.writestr("_rels/.rels", _3MF_RELATIONSHIPS)
+
+        with package.open("3D/3dmodel.model", "w", force_zip64=True) as model:
+            model.write(_3MF_MODEL_START.encode())
+            for start in range(0, len(vertices), chunk_size):
+                chunk = vertices[start : start + chunk_size].tolist()
+                model.write(
+                    "".join(
+                        f'<vertex x="{x:.6g}" y="{y:.6g}" z="{z:.6g}"/>\n'
+                        for x, y, z in chunk
+                    ).encode()
+                )
+            model.write(b"</vertices><triangles>\n")
+            for start in range(0, len(faces), chunk_size):
+                chunk = faces[start : start + chunk_size].tolist()
+                model.write(
+                    "".join(
+                        f'<triangle v1="{a}" v2="{b}" v3="{c}"/>\n' for a, b, c in chunk
+                    ).encode()
+                )
+            model.write(_3MF_MODEL_END.encode())
+
+
+def _normals(triangles):
+    """Unit normals of counterclockwise triangles, zero for degenerate ones."""
+    normals = np.cross(
+        triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]
+    )
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+@contextlib.contextmanager
+def _open(output):
+    """Open a path for writing, or use a file object as is, leaving it open."""
+    if hasattr(output, "write"):
+        yield output
+    else:
+        with open(output, "wb") as f:
+            yield f
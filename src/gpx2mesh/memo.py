@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+import pickle
+import sys
+from typing import Callable, Optional
+
+import numpy as np
+
+from gpx2mesh.caching import LoadOnceLRU, evict_least_recently_used, write_atomically
+
+logger = logging.getLogger(__name__)
+
+
+def stage_key(name: str, *inputs) -> str:
+    """
+    Hash the name of a stage and its inputs: arrays by dtype, shape and content, and
+    scalars, strings, bytes, None and (named) tuples or lists of them by value.
+    """
+    digest = hashlib.blake2b(name.encode(), digest_size=16)
+    for value in inputs:
+        _update(digest, value)
+    return digest.hexdigest()
+
+
+def _update(digest, value):
+    if isinstance(value, np.ndarray):
+        digest.update(f"array{value.dtype.str}{value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).data)
+    elif isinstance(value, bytes):
+        digest.update(b"bytes%d" % len(value))
+        digest.update(value)
+    elif isinstance(value, (tuple, list)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update(digest, item)
+    elif value is None or isinstance(value, (bool, int, float, str, np.generic)):
+        digest.update(repr(value).encode())
+    else:
+        raise TypeError(f"Cannot hash a stage input of type {type(value).__name__}")
+
+
+def memoize(stage_cache: Optional["StageCache"], name: str, inputs, compute: Callable):
+    """
+    Return the result of compute(), a stage depending only on inputs, from stage_cache
+    or computed and stored in it. Without stage_cache, always compute it.
+    """
+    if stage_cache is None:
+        return compute()
+    return stage_cache.get(stage_key(name, *inputs), compute, name)
+
+
+# Result of _load for entries not on disk, as None is a valid stage result
+_MISSING = object()
+
+
+class StageCache(LoadOnceLRU):
+    """
+    Keep the results of pipeline stages, keyed by a hash of their inputs, such as those
+    of build_mesh, so that rendering a track again with other options only runs the
+    stages these options change. The most recently used results are kept in memory up
+    to max_memory bytes, and, with a folder, pickled on disk up to max_disk bytes.
+
+    Results are shared between the calls getting them and must not be modified. Safe to
+    share between threads, a stage being computed only once when requested
+    concurrently.
+    """
+
+    def __init__(
+        self,
+        max_memory: int = 512 * 1024**2,
+        folder: Optional[Path] = None,
+        max_disk: int = 2 * 1024**3,
+    ):
+        super().__init__()
+        if folder is not None:
+            os.makedirs(folder, exist_ok=True)
+        self.max_memory = max_memory
+        self.folder = folder
+        self.max_disk = max_disk
+        self._sizes = {}
+        self._memory = 0
+
+    def get(self, key: str, compute: Callable, name: str = "stage"):
+        """Return the result of key, computing it with compute() if needed."""
+        return self._get(key, lambda: self._load_or_compute(key, compute, name))
+
+    def _load_or_compute(self, key: str, compute: Callable, name: str):
+        result = self._load(key)
+        if result is _MISSING:
+            with self._lock:
+                self.misses += 1
+            result = compute()
+            self._store(key, result)
+        else:
+            with self._lock:
+                self.hits += 1
+            logger.debug(f"Loaded {name} result from disk")
+
+        _freeze(result)
+        return result
+
+    def _evict(self, added):
+        size = _size(self._values[added])
+        if size > self.max_memory:
+            del self._values[added]
+            return
+        self._sizes[added] = size
+        self._memory += size
+        while self._memory > self.max_memory:
+            evicted, _ = self._values.popitem(last=False)
+            self._memory -= self._sizes.pop(evicted)
+
+    def _entry(self, key) -> Path:
+        return Path(self.folder) / f"{key}.pkl"
+
+    def _load(self, key):
+        if self.folder is None or not os.path.exists(self._entry(key)):
+            return _MISSING
+        entry = self._entry(key)
+        try:
+            with open(entry, "rb") as f:
+                result = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return _MISSING  # Evicted meanwhile, or unreadable
+        os.utime(entry)  # Mark the entry as recently used
+        return result
+
+    def _store(self, key, result):
+        if self.folder is None:
+            return
+        write_atomically(
+            self._entry(key),
+            lambda f: pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+        evict_least_recently_used(
+            self.folder, "*.pkl", self.max_disk, keep=self._entry(key)
+        )
+
+
+def _freeze(result):
+    """Make the arrays of a result read-only, as it is shared between calls."""
+    if isinstance(result, np.ndarray):
+        result.flags.writeable = False
+    elif isinstance(result, (tuple, list)):
+        for item in result:
+            _freeze(item)
+
+
+def _size(result) -> int:
+    """Approximate memory used by a result, counting its arrays and meshes."""
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, (tuple, list)):
+        return sum(_size(item) for item in result)
+    if hasattr(result, "vertices") and hasattr(result, "faces"):
+        # Meshes, whose cached properties may grow up to a few times their arrays
+        return 4 * (result.vertices.nbytes + result.faces.nbytes)
+    return sys.getsizeof(result)
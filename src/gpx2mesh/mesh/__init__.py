@@ -1,7 +1,11 @@
-import trimesh
-from gpx2mesh.mesh.medal import shape_mesh_into_medal
-from gpx2mesh.mesh.elevation import elevation_to_mesh
-from gpx2mesh.mesh.track import add_gpx_track_to_terrain
+from functools import cache
+import logging
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import trimesh
+
+logger = logging.getLogger(__name__)
 
 
 def generate_mesh(
@@ -13,20 +17,131 @@ def generate_mesh(
     track_height=0.5,
     track_width=1.0,
     debug=False,
-) -> trimesh.Trimesh:
-    terrain_mesh = elevation_to_mesh(elevation_array, width, depth, base_thickness)
-
-    track_mesh = add_gpx_track_to_terrain(
-        elevation_array,
-        track_points,
-        width,
-        depth,
-        track_height,
-        track_width,
-        debug,
-    )
-    mesh = trimesh.util.concatenate([terrain_mesh, track_mesh])
-
-    mesh = shape_mesh_into_medal(mesh)
-
-    return mesh
+    terrain_error=None,
+    terrain_triangles=None,
+    clip="disc",
+    stage_cache=None,
+) -> "trimesh.Trimesh":
+    """
+    Generate the medal mesh. The terrain is meshed directly within the medal disc with
+    clip="disc", or meshed as a square and intersected with a cylinder with
+    clip="boolean", which needs a boolean backend and is much slower.
+
+    With a stage_cache (see gpx2mesh.memo), the terrain heightfield, the terrain mesh
+    and the track mesh are reused when their inputs did not change.
+
+    The terrain heightfield is computed once, to mesh the terrain and to lay the track
+    on it: the track is split where it crosses the triangles of the terrain mesh so
+    that it follows them exactly.
+    """
+    if clip not in ("disc", "boolean"):
+        raise ValueError(f"Unknown clip method: {clip}")
+
+    # Imported on first use, so that the lighter mesh modules can be used without
+    # trimesh
+    import trimesh
+    from gpx2mesh.memo import memoize, stage_key
+    from gpx2mesh.mesh.decimate import resample_heightfield
+    from gpx2mesh.mesh.elevation import heightfield_to_disc_mesh, heightfield_to_mesh
+    from gpx2mesh.mesh.heightfield import scale_elevation
+    from gpx2mesh.mesh.medal import add_ring_and_hook, shape_mesh_into_medal
+    from gpx2mesh.mesh.track import add_track_to_heightfield
+    from gpx2mesh.profiling import stage
+
+    # Inputs are hashed once, and their hashes used in the keys of the stages
+    elevation_key = track_key = None
+    if stage_cache is not None:
+        elevation_key = stage_key("elevation", elevation_array)
+        track_key = stage_key("track", track_points)
+
+    # Only computed if a stage needing it is not cached
+    # The triangle budget is that of the terrain mesh of the clip method
+    terrain = "disc" if clip == "disc" else "square"
+    heightfield_options = (depth, terrain_error, terrain_triangles, terrain)
+
+    @cache
+    def heightfield():
+        return memoize(
+            stage_cache,
+            "heightfield",
+            (elevation_key, *heightfield_options),
+            lambda: resample_heightfield(
+                scale_elevation(elevation_array, depth),
+                terrain_error,
+                terrain_triangles,
+                terrain,
+            ),
+        )
+
+    with stage("terrain_mesh"):
+        mesh_terrain = (
+            heightfield_to_disc_mesh if clip == "disc" else heightfield_to_mesh
+        )
+        terrain_mesh = memoize(
+            stage_cache,
+            "terrain_mesh",
+            (elevation_key, *heightfield_options, width, base_thickness, clip),
+            lambda: mesh_terrain(heightfield(), width, base_thickness),
+        )
+
+    # The track ribbon must stay within the disc, including its half width
+    radius = width / 2
+    with stage("track_mesh"):
+        track_options = (width, track_height, track_width)
+        clip_radius = radius - track_width / 2 if clip == "disc" else None
+        track_mesh = memoize(
+            stage_cache,
+            "track_mesh",
+            (
+                elevation_key,
+                track_key,
+                *heightfield_options,
+                *track_options,
+                clip_radius,
+            ),
+            lambda: add_track_to_heightfield(
+                heightfield(),
+                track_points,
+                *track_options,
+                clip_radius=clip_radius,
+                conform=terrain,
+            ),
+        )
+
+    if debug:
+        # Out of the track mesh stage, so that it is also plotted when cached.
+        # Matplotlib is slow to import, and only needed for debugging
+        from gpx2mesh.mesh.debug import plot_track
+
+        plot_track(track_points * width, heightfield(), width)
+
+    with stage("medal_shaping"):
+        mesh = trimesh.util.concatenate(
+            [m for m in (terrain_mesh, track_mesh) if m is not None]
+        )
+        if clip == "disc":
+            return add_ring_and_hook(mesh, radius, radius, radius)
+        return shape_mesh_into_medal(mesh)
+
+
+def validate_mesh(mesh: "trimesh.Trimesh"):
+    """
+    Repair a mesh in place: merge duplicate vertices, remove duplicate faces and
+    unreferenced vertices, and wind faces consistently. Meshes of generate_mesh need
+    none of these global passes, so this is mostly a check, logging a warning if faces
+    had to be repaired or if the mesh is not watertight.
+    """
+    faces = len(mesh.faces)
+    winding_consistent = mesh.is_winding_consistent
+
+    mesh.merge_vertices()
+    mesh.update_faces(mesh.unique_faces())
+    mesh.remove_unreferenced_vertices()
+    mesh.fix_normals()
+
+    if len(mesh.faces) != faces:
+        logger.warning(f"Removed {faces - len(mesh.faces)} duplicate faces")
+    if not winding_consistent:
+        logger.warning("Mesh faces were not consistently wound")
+    if not mesh.is_watertight:
+        logger.warning("Mesh is not watertight")
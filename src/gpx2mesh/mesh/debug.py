@@ -0,0 +1,9 @@
+from matplotlib import pyplot as plt
+
+
+def plot_track(track_mesh_coords, elevation_array, width, filename="debug.png"):
+    """Save a plot of the track over the elevation map, in mesh coordinates."""
+    plt.plot(track_mesh_coords[:, 0], track_mesh_coords[:, 1], "r")
+    plt.imshow(elevation_array, extent=[0, width, 0, width])
+    plt.colorbar()
+    plt.savefig(filename)
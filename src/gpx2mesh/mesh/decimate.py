@@ -0,0 +1,137 @@
+import logging
+from math import pi
+
+import numpy as np
+
+from gpx2mesh.profiling import stage
+
+logger = logging.getLogger(__name__)
+
+
+def resample_heightfield(
+    heightfield, max_error=None, max_triangles=None, mesh="square"
+):
+    """
+    Resample a heightfield on the coarsest regular grid, spanning the same extent, whose
+    bilinear reconstruction stays within max_error of the original heightfield, and
+    whose terrain mesh has at most max_triangles faces, see terrain_triangles for the
+    mesh kinds. Constraints left to None are ignored, and the heightfield is returned
+    as is if no coarser grid is needed.
+    """
+    rows, cols = heightfield.shape
+    if max_error is None and max_triangles is None:
+        return heightfield
+
+    with stage("terrain_resample"):
+        # Grids are indexed by their number of rows, columns follow the same ratio
+        size = rows
+        if max_triangles is not None:
+            size = _largest_size_within_budget(rows, cols, max_triangles, mesh)
+
+        if max_error is not None:
+            # Smallest grid within the error bound, assuming that the error decreases
+            # with the grid size
+            low, high = 2, size
+            while low < high:
+                middle = (low + high) // 2
+                if _resampling_error(heightfield, middle) <= max_error:
+                    high = middle
+                else:
+                    low = middle + 1
+            size = high
+
+        if size >= rows:
+            return heightfield
+
+        resampled = resample_grid(heightfield, _shape(rows, cols, size))
+
+    new_rows, new_cols = resampled.shape
+    logger.info(f"Terrain resampled from {rows}x{cols} to {new_rows}x{new_cols}")
+    return resampled
+
+
+def budget_shape(rows, cols, max_triangles, mesh="square"):
+    """
+    Shape of the grid a rows x cols heightfield is resampled on to have at most
+    max_triangles faces, before considering any error bound.
+    """
+    size = min(_largest_size_within_budget(rows, cols, max_triangles, mesh), rows)
+    return _shape(rows, cols, size) if size < rows else (rows, cols)
+
+
+def terrain_triangles(rows, cols, mesh="square"):
+    """
+    Number of faces of the terrain mesh of a rows x cols heightfield, with mesh="square"
+    for heightfield_to_mesh. With mesh="disc", the faces of heightfield_to_disc_mesh
+    are approximated: two per grid cell within the disc, and four per circle section
+    for the band around them, the side wall and the base.
+    """
+    if mesh == "disc":
+        return round(pi / 2 * (rows - 1) * (cols - 1) + 4 * pi * (max(rows, cols) - 1))
+    return 4 * (rows - 1) * (cols - 1) + 4 * (rows - 1) + 4 * (cols - 1)
+
+
+def resample_grid(heightfield, shape):
+    """Bilinear sampling of the heightfield on a regular grid of the given shape."""
+    # Imported on first use, so that budget_shape does not need scipy
+    from scipy.ndimage import map_coordinates
+
+    rows, cols = heightfield.shape
+    coordinates = np.meshgrid(
+        np.linspace(0, rows - 1, shape[0]),
+        np.linspace(0, cols - 1, shape[1]),
+        indexing="ij",
+    )
+    return map_coordinates(heightfield, coordinates, order=1)
+
+
+def _shape(rows, cols, size):
+    return (size, max(2, round((cols - 1) * (size - 1) / (rows - 1)) + 1))
+
+
+def _largest_size_within_budget(rows, cols, max_triangles, mesh):
+    low, high = 2, rows
+    while low < high:
+        middle = (low + high + 1) // 2
+        if terrain_triangles(*_shape(rows, cols, middle), mesh) <= max_triangles:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _resampling_error(heightfield, size):
+    """
+    Maximum vertical deviation between the original heightfield samples and the terrain
+    mesh of the resampled heightfield.
+    """
+    rows, cols = heightfield.shape
+    resampled = resample_grid(heightfield, _shape(rows, cols, size))
+    reconstructed = _mesh_interpolate(resampled, heightfield.shape)
+    return np.abs(reconstructed - heightfield).max()
+
+
+def _mesh_interpolate(heightfield, shape):
+    """
+    Sample the terrain mesh of a heightfield on a regular grid of the given shape, over
+    the same extent. Quads are split along their (i, j + 1) - (i + 1, j) diagonal, like
+    in elevation_to_mesh.
+    """
+    rows, cols = heightfield.shape
+    u = np.linspace(0, rows - 1, shape[0])
+    v = np.linspace(0, cols - 1, shape[1])
+    i = np.minimum(u.astype(int), rows - 2)[:, None]
+    j = np.minimum(v.astype(int), cols - 2)[None, :]
+    fu = u[:, None] - i
+    fv = v[None, :] - j
+
+    z00 = heightfield[i, j]
+    z01 = heightfield[i, j + 1]
+    z10 = heightfield[i + 1, j]
+    z11 = heightfield[i + 1, j + 1]
+
+    return np.where(
+        fu + fv <= 1,
+        z00 + fv * (z01 - z00) + fu * (z10 - z00),
+        z11 + (1 - fv) * (z10 - z11) + (1 - fu) * (z01 - z11),
+    )
@@ -1,36 +1,44 @@
 import numpy as np
 import trimesh
 
+from gpx2mesh.mesh.decimate import resample_grid, resample_heightfield
+from gpx2mesh.mesh.heightfield import sample_heightfield, scale_elevation
+
+# Smallest grid meshed as a disc, coarser ones are upsampled
+DISC_MIN_SAMPLES = 8
+
 
 def elevation_to_mesh(
     elevation_array,
     width=40.0,
     target_depth=5.0,
     base_thickness=1.0,
+    max_error=None,
+    max_triangles=None,
 ):
+    """
+    Create a watertight terrain mesh from an elevation map, north toward +y. If
+    max_error (in mm) or max_triangles are set, the terrain is resampled on the
+    coarsest grid meeting them.
+    """
+    heightfield = terrain_heightfield(
+        elevation_array, target_depth, max_error, max_triangles
+    )
+    return heightfield_to_mesh(heightfield, width, base_thickness)
+
+
+def heightfield_to_mesh(scaled_elevation, width=40.0, base_thickness=1.0):
+    """Create the terrain mesh of elevation_to_mesh from a terrain_heightfield."""
     # Get dimensions
-    rows, cols = elevation_array.shape
+    rows, cols = scaled_elevation.shape
 
     # Calculate scaling factors to fit target dimensions
     x_scale = width / (cols - 1)  # Scale to fit target width
     y_scale = width / (rows - 1)  # Scale to fit target height
 
-    # Normalize elevation data to fit target depth
-    elevation_min = elevation_array.min()
-    elevation_max = elevation_array.max()
-    elevation_range = elevation_max - elevation_min
-
-    if elevation_range > 0:
-        # Scale elevations to fit within target_depth
-        normalized_elevation = (elevation_array - elevation_min) / elevation_range
-        scaled_elevation = normalized_elevation * target_depth
-    else:
-        # Handle flat terrain case
-        scaled_elevation = np.zeros_like(elevation_array)
-
-    # Create coordinate grids with scaled dimensions
+    # Create coordinate grids with scaled dimensions, rows going southward
     x = np.arange(cols) * x_scale
-    y = np.arange(rows) * y_scale
+    y = width - np.arange(rows) * y_scale
     X, Y = np.meshgrid(x, y)
 
     # Create vertices for the top surface
@@ -47,127 +55,337 @@ def elevation_to_mesh(
     # Combine all vertices
     vertices = np.vstack([top_vertices, bottom_vertices])
 
-    # Create faces for the top surface
-    top_faces = []
-    for i in range(rows - 1):
-        for j in range(cols - 1):
-            # Current quad vertices (top surface)
-            v1 = i * cols + j
-            v2 = i * cols + (j + 1)
-            v3 = (i + 1) * cols + j
-            v4 = (i + 1) * cols + (j + 1)
-
-            # Create two triangles for each quad
-            top_faces.extend(
-                [
-                    [v1, v2, v3],  # First triangle
-                    [v2, v4, v3],  # Second triangle
-                ]
-            )
-
-    # Create faces for the bottom surface (flipped normals)
-    bottom_faces = []
+    # Create faces for the top and bottom surfaces (flipped normals for the bottom)
     offset = len(top_vertices)  # Offset for bottom vertices
-    for i in range(rows - 1):
-        for j in range(cols - 1):
-            # Current quad vertices (bottom surface)
-            v1 = offset + i * cols + j
-            v2 = offset + i * cols + (j + 1)
-            v3 = offset + (i + 1) * cols + j
-            v4 = offset + (i + 1) * cols + (j + 1)
-
-            # Create two triangles (flipped winding order)
-            bottom_faces.extend(
-                [
-                    [v1, v3, v2],  # First triangle
-                    [v2, v3, v4],  # Second triangle
-                ]
-            )
+    top_faces = _grid_faces(rows, cols)
+    bottom_faces = top_faces[:, [0, 2, 1]] + offset
 
     # Create side faces to connect top and bottom
-    side_faces = []
-
-    # Front and back edges
-    for j in range(cols - 1):
-        # Front edge (y=0)
-        top_front_1 = j
-        top_front_2 = j + 1
-        bottom_front_1 = offset + j
-        bottom_front_2 = offset + j + 1
-
-        side_faces.extend(
-            [
-                [top_front_1, bottom_front_1, top_front_2],
-                [top_front_2, bottom_front_1, bottom_front_2],
-            ]
-        )
-
-        # Back edge (y=max)
-        back_row = (rows - 1) * cols
-        top_back_1 = back_row + j
-        top_back_2 = back_row + j + 1
-        bottom_back_1 = offset + back_row + j
-        bottom_back_2 = offset + back_row + j + 1
-
-        side_faces.extend(
-            [
-                [top_back_1, top_back_2, bottom_back_1],
-                [top_back_2, bottom_back_2, bottom_back_1],
-            ]
-        )
-
-    # Left and right edges
-    for i in range(rows - 1):
-        # Left edge (x=0)
-        top_left_1 = i * cols
-        top_left_2 = (i + 1) * cols
-        bottom_left_1 = offset + i * cols
-        bottom_left_2 = offset + (i + 1) * cols
-
-        side_faces.extend(
-            [
-                [top_left_1, top_left_2, bottom_left_1],
-                [top_left_2, bottom_left_2, bottom_left_1],
-            ]
-        )
-
-        # Right edge (x=max)
-        top_right_1 = i * cols + (cols - 1)
-        top_right_2 = (i + 1) * cols + (cols - 1)
-        bottom_right_1 = offset + i * cols + (cols - 1)
-        bottom_right_2 = offset + (i + 1) * cols + (cols - 1)
-
-        side_faces.extend(
-            [
-                [top_right_1, bottom_right_1, top_right_2],
-                [top_right_2, bottom_right_1, bottom_right_2],
-            ]
-        )
-
-    # Combine all faces
-    all_faces = np.array(top_faces + bottom_faces + side_faces)
-
-    # Create the mesh
-    mesh = trimesh.Trimesh(vertices=vertices, faces=all_faces)
-
-    # Ensure the mesh is watertight and has correct normals
-    mesh.remove_duplicate_faces()
-    mesh.remove_unreferenced_vertices()
-    mesh.fix_normals()
-
-    # Reflection around y axis to flip north/south orientation, without changing its center
-    center = mesh.centroid
-    translate_to_origin = trimesh.transformations.translation_matrix(-center)
-    reflect = np.array(
+    side_faces = _side_faces(rows, cols, offset)
+
+    # Combine all faces, reversed as the faces are wound for rows going northward
+    all_faces = np.vstack([top_faces, bottom_faces, side_faces])[:, ::-1]
+
+    # Vertices are unique and faces consistently wound outward, nothing to merge or fix
+    return trimesh.Trimesh(vertices=vertices, faces=all_faces, process=False)
+
+
+def elevation_to_disc_mesh(
+    elevation_array,
+    width=40.0,
+    target_depth=5.0,
+    base_thickness=1.0,
+    max_error=None,
+    max_triangles=None,
+):
+    """
+    Create a watertight terrain mesh from an elevation map, clipped to the disc
+    inscribed in the width x width square. The grid cells well inside the disc are
+    kept as is, and the staircase they leave is stitched to an exact circle whose
+    heights are interpolated from the terrain. North is toward +y, like the flipped
+    mesh of elevation_to_mesh.
+    """
+    heightfield = terrain_heightfield(
+        elevation_array, target_depth, max_error, max_triangles, "disc"
+    )
+    return heightfield_to_disc_mesh(heightfield, width, base_thickness)
+
+
+def heightfield_to_disc_mesh(scaled_elevation, width=40.0, base_thickness=1.0):
+    """Create the terrain mesh of elevation_to_disc_mesh from a terrain_heightfield."""
+    scaled_elevation, cells, border, border_angles, circle_vertices, angles = (
+        _disc_layout(scaled_elevation, width)
+    )
+    rows, cols = scaled_elevation.shape
+    x_scale = width / (cols - 1)
+    y_scale = width / (rows - 1)
+    radius = width / 2
+
+    # Grid vertices used by the inner cells, renumbered
+    i, j = np.nonzero(cells)
+    v1 = i * cols + j
+    quads = np.stack([v1, v1 + 1, v1 + cols, v1 + cols + 1], axis=-1)
+    used, inverse = np.unique(
+        np.concatenate([quads.ravel(), border]), return_inverse=True
+    )
+    quads = inverse[: quads.size].reshape(-1, 4)
+    border = inverse[quads.size :]
+    used_i, used_j = np.divmod(used, cols)
+    grid_vertices = np.column_stack(
+        [
+            used_j * x_scale,
+            width - used_i * y_scale,
+            scaled_elevation[used_i, used_j],
+        ]
+    )
+
+    # Rows go southward, so the row-major triangles of _grid_faces are flipped to face up
+    top_faces = np.stack([quads[:, [0, 2, 1]], quads[:, [1, 2, 3]]], axis=1)
+    top_faces = top_faces.reshape(-1, 3)
+
+    # Circle vertices, at the top and at the base, and the center of the base
+    sections = len(circle_vertices)
+    base_z = -base_thickness
+    vertices = np.vstack(
+        [
+            grid_vertices,
+            circle_vertices,
+            np.column_stack([circle_vertices[:, :2], np.full(sections, base_z)]),
+            [[radius, radius, base_z]],
+        ]
+    )
+    top_circle = len(grid_vertices) + np.arange(sections)
+    base_circle = top_circle + sections
+    base_center = len(vertices) - 1
+
+    band_faces = _zip_loops(border, border_angles, top_circle, angles)
+    following = np.roll(np.arange(sections), -1)
+    side_faces = np.concatenate(
+        [
+            np.column_stack([top_circle, base_circle, top_circle[following]]),
+            np.column_stack(
+                [top_circle[following], base_circle, base_circle[following]]
+            ),
+        ]
+    )
+    bottom_faces = np.column_stack(
+        [
+            np.full(sections, base_center),
+            base_circle[following],
+            base_circle,
+        ]
+    )
+
+    faces = np.vstack([top_faces, band_faces, side_faces, bottom_faces])
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+
+def disc_band(scaled_elevation, width=40.0):
+    """
+    Band of triangles of the mesh of heightfield_to_disc_mesh stitching the grid cells
+    kept as is to the circle. Returns the heightfield of the cells, upsampled if too
+    coarse, the mask of the cells kept, and the (n, 3, 3) triangles of the band.
+    """
+    scaled_elevation, cells, border, border_angles, circle_vertices, angles = (
+        _disc_layout(scaled_elevation, width)
+    )
+    rows, cols = scaled_elevation.shape
+    border_i, border_j = np.divmod(border, cols)
+    vertices = np.vstack(
         [
-            [1, 0, 0, 0],  # keep x
-            [0, -1, 0, 0],  # flip y
-            [0, 0, 1, 0],  # keep z
-            [0, 0, 0, 1],
+            np.column_stack(
+                [
+                    border_j * (width / (cols - 1)),
+                    width - border_i * (width / (rows - 1)),
+                    scaled_elevation[border_i, border_j],
+                ]
+            ),
+            circle_vertices,
         ]
     )
-    translate_back = trimesh.transformations.translation_matrix(center)
-    transforms = translate_back @ reflect @ translate_to_origin
-    mesh.apply_transform(transforms)
+    faces = _zip_loops(
+        np.arange(len(border)),
+        border_angles,
+        len(border) + np.arange(len(circle_vertices)),
+        angles,
+    )
+    return scaled_elevation, cells, vertices[faces]
+
+
+def _disc_layout(scaled_elevation, width):
+    """
+    Layout of the disc mesh of a heightfield. Returns the heightfield, upsampled if
+    too coarse, the mask of the cells kept as is, the grid indices of the vertices of
+    their border and their angles, see _disc_cells, and the vertices of the circle and
+    their angles, counterclockwise.
+    """
+    rows, cols = scaled_elevation.shape
+    if min(rows, cols) < DISC_MIN_SAMPLES:
+        # Coarser grids leave no cells well inside the disc
+        rows, cols = max(rows, DISC_MIN_SAMPLES), max(cols, DISC_MIN_SAMPLES)
+        scaled_elevation = resample_grid(scaled_elevation, (rows, cols))
+    x_scale = width / (cols - 1)
+    y_scale = width / (rows - 1)
+    spacing = max(x_scale, y_scale)
+    radius = width / 2
+
+    # Shrink the inner region until its border is seen from the center in a single
+    # turn, which is what the stitching to the circle relies on
+    inner_radius = radius - spacing
+    while True:
+        inner = _disc_cells(rows, cols, x_scale, y_scale, radius, inner_radius)
+        if inner is not None:
+            break
+        inner_radius -= spacing / 2
+        if inner_radius <= 0:
+            raise ValueError(f"Terrain grid {rows}x{cols} is too coarse for a disc")
+    cells, border, border_angles = inner
+
+    # Circle vertices, whose heights are interpolated from the terrain
+    sections = max(64, int(np.ceil(2 * np.pi * radius / spacing)))
+    angles = np.linspace(0, 2 * np.pi, sections, endpoint=False)
+    circle_x = radius + radius * np.cos(angles)
+    circle_y = radius + radius * np.sin(angles)
+    circle_z = sample_heightfield(
+        scaled_elevation, np.column_stack([circle_x, circle_y]), width
+    )
+    circle_vertices = np.column_stack([circle_x, circle_y, circle_z])
+    return scaled_elevation, cells, border, border_angles, circle_vertices, angles
+
+
+def terrain_heightfield(
+    elevation_array,
+    target_depth=5.0,
+    max_error=None,
+    max_triangles=None,
+    mesh="square",
+):
+    """
+    Elevations scaled to span [0, target_depth] mm, resampled on the coarsest grid
+    within max_error mm and max_triangles faces of its mesh="square" or "disc" terrain
+    mesh, see resample_heightfield.
+    """
+    return resample_heightfield(
+        scale_elevation(elevation_array, target_depth), max_error, max_triangles, mesh
+    )
+
+
+def _disc_cells(rows, cols, x_scale, y_scale, radius, inner_radius):
+    """
+    Select the grid cells whose corners are all within inner_radius of the disc center.
+    Returns the cell mask, the vertices of the region border, counterclockwise, and
+    their unwrapped angles around the center; or None if the border is not a single
+    loop turning strictly around the center.
+    """
+    x = np.arange(cols) * x_scale - radius
+    y = radius - np.arange(rows) * y_scale
+    inside = np.hypot(x[None, :], y[:, None]) < inner_radius
+    cells = inside[:-1, :-1] & inside[:-1, 1:] & inside[1:, :-1] & inside[1:, 1:]
+    if not cells.any():
+        return None
+
+    # Border edges, each cell being walked top, right, bottom then left in index
+    # space, which keeps edges shared by two kept cells opposite to each other
+    padded = np.pad(cells, 1)
+    i, j = np.nonzero(cells)
+    v = i * cols + j
+    edges = [
+        (v, v + 1, ~padded[i, j + 1]),
+        (v + 1, v + cols + 1, ~padded[i + 1, j + 2]),
+        (v + cols + 1, v + cols, ~padded[i + 2, j + 1]),
+        (v + cols, v, ~padded[i + 1, j]),
+    ]
+    starts = np.concatenate([start[keep] for start, _, keep in edges])
+    ends = np.concatenate([end[keep] for _, end, keep in edges])
+    if len(np.unique(starts)) != len(starts):
+        # Cells touching by a corner only
+        return None
+
+    following = dict(zip(starts.tolist(), ends.tolist()))
+    loop = [starts[0]]
+    for _ in range(len(starts) - 1):
+        loop.append(following[loop[-1]])
+    if following[loop[-1]] != loop[0] or len(set(loop)) != len(loop):
+        return None
+
+    # The index space walk is clockwise once rows are flipped northward
+    border = np.array(loop[::-1])
+    border_i, border_j = np.divmod(border, cols)
+    angles = np.unwrap(np.arctan2(y[border_i], x[border_j]))
+    if np.any(np.diff(angles) <= 0) or angles[-1] - angles[0] >= 2 * np.pi:
+        return None
+    return cells, border, angles
+
+
+def _zip_loops(inner, inner_angles, outer, outer_angles):
+    """
+    Triangulate the band between two counterclockwise loops around the same center,
+    given the increasing angles of their vertices, merging both loops by angle.
+    """
+    # Angles of both loops over the turn starting at the first inner vertex
+    start = inner_angles[0]
+    inner_next = np.append(inner_angles[1:], start + 2 * np.pi)
+    outer_angles = start + np.mod(outer_angles - start, 2 * np.pi)
+    order = np.argsort(outer_angles, kind="stable")
+    outer = outer[order]
+    outer_angles = outer_angles[order]
+
+    # Each event moves to the next vertex of one loop, forming a triangle with the
+    # current vertex of the other loop
+    is_outer = np.concatenate(
+        [np.zeros(len(inner_next), dtype=bool), np.ones(len(outer), dtype=bool)]
+    )
+    events = np.argsort(np.concatenate([inner_next, outer_angles]), kind="stable")
+    is_outer = is_outer[events]
+    inner_seen = np.cumsum(~is_outer) - ~is_outer
+    outer_seen = np.cumsum(is_outer) - is_outer
+
+    n_inner, n_outer = len(inner), len(outer)
+    current_inner = inner[inner_seen % n_inner]
+    next_inner = inner[(inner_seen + 1) % n_inner]
+    previous_outer = outer[(outer_seen - 1) % n_outer]
+    current_outer = outer[outer_seen % n_outer]
+
+    return np.where(
+        is_outer[:, None],
+        np.column_stack([previous_outer, current_outer, current_inner]),
+        np.column_stack([current_inner, previous_outer, next_inner]),
+    )
+
+
+def _grid_faces(rows, cols):
+    """
+    Triangulate a rows x cols grid of vertices stored in row-major order. Each quad is
+    split into two triangles, [v1, v2, v3] and [v2, v4, v3], in row-major quad order.
+    """
+    i, j = np.meshgrid(np.arange(rows - 1), np.arange(cols - 1), indexing="ij")
+    v1 = i * cols + j
+    v2 = v1 + 1
+    v3 = v1 + cols
+    v4 = v3 + 1
+
+    faces = np.stack(
+        [
+            np.stack([v1, v2, v3], axis=-1),  # First triangle
+            np.stack([v2, v4, v3], axis=-1),  # Second triangle
+        ],
+        axis=-2,
+    )
+    return faces.reshape(-1, 3)
+
+
+def _side_faces(rows, cols, offset):
+    """
+    Create the faces of the four walls connecting the top surface border to the bottom
+    surface border, whose vertices start at `offset`.
+    """
+    # Front (y=0) and back (y=max) edges, interleaved along the columns
+    j = np.arange(cols - 1)
+    back_row = (rows - 1) * cols
+    front_back = np.stack(
+        [
+            np.stack([j, offset + j, j + 1], axis=-1),
+            np.stack([j + 1, offset + j, offset + j + 1], axis=-1),
+            np.stack([back_row + j, back_row + j + 1, offset + back_row + j], axis=-1),
+            np.stack(
+                [back_row + j + 1, offset + back_row + j + 1, offset + back_row + j],
+                axis=-1,
+            ),
+        ],
+        axis=-2,
+    ).reshape(-1, 3)
+
+    # Left (x=0) and right (x=max) edges, interleaved along the rows
+    left = np.arange(rows - 1) * cols
+    right = left + (cols - 1)
+    left_right = np.stack(
+        [
+            np.stack([left, left + cols, offset + left], axis=-1),
+            np.stack([left + cols, offset + left + cols, offset + left], axis=-1),
+            np.stack([right, offset + right, right + cols], axis=-1),
+            np.stack([right + cols, offset + right, offset + right + cols], axis=-1),
+        ],
+        axis=-2,
+    ).reshape(-1, 3)
 
-    return mesh
+    return np.vstack([front_back, left_right])
@@ -0,0 +1,216 @@
+import numpy as np
+
+from gpx2mesh.track.index import TrackIndex
+
+
+def scale_elevation(elevation_array, target_depth):
+    """Normalize elevations to span [0, target_depth], flat terrains being at 0."""
+    elevation_min = elevation_array.min()
+    elevation_max = elevation_array.max()
+    elevation_range = elevation_max - elevation_min
+
+    if elevation_range > 0:
+        normalized_elevation = (elevation_array - elevation_min) / elevation_range
+        return normalized_elevation * target_depth
+    return np.zeros_like(elevation_array)
+
+
+def sample_heightfield(heightfield, points, width, triangulated=False):
+    """
+    Bilinear sampling of a heightfield covering the width x width square of the mesh,
+    rows going southward, at (x, y) points in mm. Points out of the square are sampled
+    on its border. If triangulated is set, the heightfield is instead sampled on the
+    triangles of its terrain mesh, each grid cell being split along the diagonal from
+    its north-east to its south-west corner.
+    """
+    i, j, du, dv = grid_cells(heightfield.shape, points, width)
+
+    if triangulated:
+        z00, z01 = heightfield[i, j], heightfield[i, j + 1]
+        z10, z11 = heightfield[i + 1, j], heightfield[i + 1, j + 1]
+        return np.where(
+            du + dv <= 1,
+            z00 + du * (z01 - z00) + dv * (z10 - z00),
+            z11 + (1 - du) * (z10 - z11) + (1 - dv) * (z01 - z11),
+        )
+
+    north = heightfield[i, j] + du * (heightfield[i, j + 1] - heightfield[i, j])
+    south = heightfield[i + 1, j] + du * (
+        heightfield[i + 1, j + 1] - heightfield[i + 1, j]
+    )
+    return north + dv * (south - north)
+
+
+def grid_cells(shape, points, width):
+    """
+    Cells (i, j) of a heightfield of the given shape, see sample_heightfield, holding
+    (x, y) points in mm, and the fractional positions (du, dv) of the points in them.
+    """
+    rows, cols = shape
+    u = np.clip(points[:, 0] * ((cols - 1) / width), 0, cols - 1)
+    v = np.clip((width - points[:, 1]) * ((rows - 1) / width), 0, rows - 1)
+    j = np.minimum(u.astype(np.intp), cols - 2)
+    i = np.minimum(v.astype(np.intp), rows - 2)
+    return i, j, u - j, v - i
+
+
+def sample_triangles(triangles, points):
+    """
+    Sample (n, 3, 3) triangles of a surface at (x, y) points, from the triangle
+    holding each point, or the closest one of those whose bounding box holds it.
+    Points out of these bounding boxes are sampled as NaN.
+    """
+    index = TrackIndex(points)
+    candidates, indices = index.query_boxes(
+        triangles[:, :, :2].min(axis=1), triangles[:, :, :2].max(axis=1)
+    )
+
+    # Barycentric coordinates of the points in their candidate triangles
+    a, b, c = (triangles[candidates, k] for k in range(3))
+    ab, ac, ap = b[:, :2] - a[:, :2], c[:, :2] - a[:, :2], points[indices] - a[:, :2]
+    area = _cross(ab, ac)
+    degenerate = area == 0
+    area[degenerate] = 1
+    weight_b = _cross(ap, ac) / area
+    weight_c = _cross(ab, ap) / area
+    weight_a = 1 - weight_b - weight_c
+
+    # The point is the deepest within the triangle holding it, or the least out of
+    # the closest one
+    depth = np.minimum(np.minimum(weight_a, weight_b), weight_c)
+    depth[degenerate] = -np.inf
+    order = np.lexsort((depth, indices))
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = indices[order[1:]] != indices[order[:-1]]
+    best = order[last]
+
+    elevations = np.full(len(points), np.nan)
+    elevations[indices[best]] = (
+        weight_a[best] * a[best, 2]
+        + weight_b[best] * b[best, 2]
+        + weight_c[best] * c[best, 2]
+    )
+    return elevations
+
+
+def densify_segments(points, spacing):
+    """
+    Insert evenly spaced points along each segment of a polyline, so that consecutive
+    points are at most spacing apart. The polyline points are kept.
+    """
+    segments = np.diff(points, axis=0)
+    counts = np.ceil(np.linalg.norm(segments, axis=1) / spacing).astype(np.intp)
+    counts = np.maximum(counts, 1)
+
+    # Segment and position along it of each point, the last point excepted
+    segment = np.repeat(np.arange(len(segments)), counts)
+    first = np.repeat(np.cumsum(counts) - counts, counts)
+    t = (np.arange(len(segment)) - first) / counts[segment]
+    return np.vstack([points[segment] + t[:, None] * segments[segment], points[-1:]])
+
+
+def subdivide_on_grid(points, shape, width):
+    """
+    Split the segments of a polyline in mesh coordinates where they cross the rows,
+    columns and cell diagonals of a heightfield of the given shape, see
+    sample_heightfield. The terrain mesh being planar between these crossings, the
+    polyline sampled at its points follows it exactly. The polyline points are kept.
+    """
+    rows, cols = shape
+    if len(points) < 2:
+        return points
+
+    # Grid coordinates of the points, u along the columns and v along the rows
+    u = points[:, 0] * ((cols - 1) / width)
+    v = (width - points[:, 1]) * ((rows - 1) / width)
+
+    starts = np.arange(len(points) - 1)
+    crossings = [
+        (starts, np.zeros(len(starts))),
+        _integer_crossings(u[:-1], u[1:]),
+        _integer_crossings(v[:-1], v[1:]),
+        _integer_crossings(u[:-1] + v[:-1], u[1:] + v[1:]),
+    ]
+    return _split_segments(points, crossings)
+
+
+def subdivide_on_triangles(points, triangles):
+    """
+    Split the segments of a polyline where they cross the edges of (n, 3, 2+)
+    triangles, so that the surface of these triangles is planar between its points.
+    The polyline points are kept.
+    """
+    if len(points) < 2:
+        return points
+
+    starts = points[:-1]
+    segments = np.diff(points, axis=0)
+    edge_starts = triangles[:, :, :2].reshape(-1, 2)
+    edges = np.roll(triangles[:, :, :2], -1, axis=1).reshape(-1, 2) - edge_starts
+
+    # Segments crossing an edge have their midpoint within half their length of the
+    # edge bounding box
+    index = TrackIndex(starts + segments / 2)
+    reach = np.linalg.norm(segments, axis=1).max() / 2
+    edge_ends = edge_starts + edges
+    candidates, segment = index.query_boxes(
+        np.minimum(edge_starts, edge_ends) - reach,
+        np.maximum(edge_starts, edge_ends) + reach,
+    )
+
+    # Parameters of the crossings along the segments and along the edges
+    offsets = edge_starts[candidates] - starts[segment]
+    denominator = _cross(segments[segment], edges[candidates])
+    parallel = denominator == 0
+    denominator[parallel] = 1
+    t = _cross(offsets, edges[candidates]) / denominator
+    s = _cross(offsets, segments[segment]) / denominator
+    crossing = ~parallel & (t > 0) & (t < 1) & (s >= 0) & (s <= 1)
+
+    crossings = [
+        (np.arange(len(segments)), np.zeros(len(segments))),
+        (segment[crossing], t[crossing]),
+    ]
+    return _split_segments(points, crossings)
+
+
+def _split_segments(points, crossings):
+    """
+    Split the segments of a polyline at crossings, pairs of segment indices and
+    parameters t along them, the starts of the segments being crossings with t = 0.
+    """
+    segment = np.concatenate([segment for segment, _ in crossings])
+    t = np.concatenate([t for _, t in crossings])
+
+    # Order the crossings along the polyline, merging those crossing several lines at
+    # once, such as on grid vertices
+    order = np.lexsort((t, segment))
+    segment, t = segment[order], t[order]
+    distinct = np.ones(len(t), dtype=bool)
+    distinct[1:] = (segment[1:] != segment[:-1]) | (t[1:] != t[:-1])
+    segment, t = segment[distinct], t[distinct]
+
+    segments = np.diff(points, axis=0)
+    return np.vstack([points[segment] + t[:, None] * segments[segment], points[-1:]])
+
+
+def _cross(a, b):
+    """z component of the cross products of (x, y) vectors."""
+    return a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+
+
+def _integer_crossings(start, end):
+    """
+    Segment indices and parameters t, strictly within (0, 1), at which values going
+    linearly from start to end along each segment are integers, by increasing value.
+    """
+    low = np.minimum(start, end)
+    high = np.maximum(start, end)
+    first = np.floor(low) + 1
+    counts = np.maximum(np.ceil(high) - first, 0).astype(np.intp)
+
+    segment = np.repeat(np.arange(len(start)), counts)
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    values = first[segment] + (np.arange(len(segment)) - offsets)
+    t = (values - start[segment]) / (end - start)[segment]
+    return segment, t
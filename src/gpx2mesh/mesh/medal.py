@@ -36,6 +36,11 @@ def shape_mesh_into_medal(terrain: trimesh.Trimesh):
 
     terrain = terrain.intersection(cylinder)
 
+    return add_ring_and_hook(terrain, radius, center_x, center_y)
+
+
+def add_ring_and_hook(terrain: trimesh.Trimesh, radius, center_x, center_y):
+    """Surround a disc shaped terrain with a ring, and add the hook on its north side."""
     ring = trimesh.creation.annulus(
         r_min=radius, r_max=radius + 2, height=5, sections=100
     )
@@ -0,0 +1,60 @@
+import numpy as np
+
+from gpx2mesh.mesh.decimate import (
+    _mesh_interpolate,
+    resample_heightfield,
+    terrain_triangles,
+)
+from gpx2mesh.mesh.elevation import (
+    elevation_to_mesh,
+    heightfield_to_disc_mesh,
+    terrain_heightfield,
+)
+
+
+def smooth_heightfield(size):
+    x, y = np.meshgrid(np.linspace(0, 3, size), np.linspace(0, 3, size))
+    return 2.5 + 2.5 * np.sin(x) * np.cos(y)
+
+
+def test_resampled_mesh_stays_within_error():
+    heightfield = smooth_heightfield(401)
+
+    resampled = resample_heightfield(heightfield, max_error=0.01)
+
+    assert resampled.shape[0] < 100
+    error = np.abs(_mesh_interpolate(resampled, heightfield.shape) - heightfield)
+    assert error.max() <= 0.01
+
+
+def test_resampled_mesh_fits_triangle_budget():
+    heightfield = smooth_heightfield(401)
+
+    resampled = resample_heightfield(heightfield, max_triangles=10_000)
+
+    assert terrain_triangles(*resampled.shape) <= 10_000
+    assert terrain_triangles(resampled.shape[0] + 1, resampled.shape[1] + 1) > 10_000
+
+
+def test_triangle_budget_of_disc_mesh():
+    heightfield = smooth_heightfield(401)
+
+    resampled = terrain_heightfield(heightfield, max_triangles=10_000, mesh="disc")
+
+    faces = len(heightfield_to_disc_mesh(resampled).faces)
+    assert 9_000 < faces <= 10_000
+    assert (
+        resampled.shape[0]
+        > resample_heightfield(heightfield, max_triangles=10_000).shape[0]
+    )
+
+
+def test_resampling_is_a_drop_in_replacement():
+    elevation = smooth_heightfield(201) * 100
+
+    full = elevation_to_mesh(elevation, width=50, target_depth=5)
+    decimated = elevation_to_mesh(elevation, width=50, target_depth=5, max_error=0.02)
+
+    assert decimated.is_watertight
+    assert len(decimated.faces) < len(full.faces) / 4
+    np.testing.assert_allclose(decimated.bounds, full.bounds, atol=0.02)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from gpx2mesh.mesh.elevation import (
+    _grid_faces,
+    elevation_to_disc_mesh,
+    elevation_to_mesh,
+)
+
+
+def test_grid_faces_winding():
+    faces = _grid_faces(2, 3)
+
+    assert faces.tolist() == [
+        [0, 1, 3],
+        [1, 4, 3],
+        [1, 2, 4],
+        [2, 5, 4],
+    ]
+
+
+def test_elevation_mesh_is_watertight():
+    elevation = np.arange(20, dtype=float).reshape((4, 5))
+
+    mesh = elevation_to_mesh(elevation, width=10.0, target_depth=2.0)
+
+    assert mesh.is_watertight
+    assert mesh.is_winding_consistent
+    assert mesh.volume > 0
+    assert len(mesh.faces) == 2 * 2 * 3 * 4 + 4 * (3 + 4)
+
+
+def test_elevation_mesh_keeps_north_up():
+    elevation = np.zeros((5, 5))
+    elevation[0] = 1
+
+    mesh = elevation_to_mesh(elevation, width=10.0, target_depth=2.0)
+
+    np.testing.assert_allclose(mesh.bounds[:, :2], [[0, 0], [10, 10]])
+    top = mesh.vertices[mesh.vertices[:, 2] > 0]
+    np.testing.assert_allclose(top[:, 1], 10)
+
+
+def test_disc_mesh_is_watertight():
+    y, x = np.mgrid[0:41, 0:41] / 40
+    elevation = np.sin(6 * x) * np.cos(4 * y)
+
+    mesh = elevation_to_disc_mesh(elevation, width=10.0, target_depth=2.0)
+
+    assert mesh.is_watertight
+    assert mesh.is_winding_consistent
+    np.testing.assert_allclose(mesh.bounds[:, :2], [[0, 0], [10, 10]], atol=0.01)
+    # Close to the cylinder volume, as the terrain averages to half its depth
+    assert mesh.volume == pytest.approx(np.pi * 25 * (1 + 1), rel=0.05)
+
+
+def test_disc_mesh_keeps_north_up():
+    elevation = np.zeros((21, 21))
+    elevation[:10] = 1
+
+    mesh = elevation_to_disc_mesh(elevation, width=10.0, target_depth=2.0)
+
+    top = mesh.vertices[mesh.vertices[:, 2] > -1]
+    # Rows 0 to 9 span y from 10 down to 5.5, the rows below are at 0
+    np.testing.assert_allclose(top[top[:, 1] > 5.51, 2], 2)
+    np.testing.assert_allclose(top[top[:, 1] < 4.99, 2], 0)
+
+
+def test_coarse_disc_mesh_is_watertight():
+    mesh = elevation_to_disc_mesh(np.eye(2), width=10.0)
+
+    assert mesh.is_watertight
@@ -0,0 +1,44 @@
+import numpy as np
+import trimesh
+
+from gpx2mesh.mesh import generate_mesh, validate_mesh
+
+
+def synthetic_medal(clip="disc"):
+    y, x = np.mgrid[0:60, 0:60] / 59
+    elevation = np.sin(5 * x) * np.cos(3 * y)
+    track = np.column_stack(
+        [np.linspace(0.1, 0.9, 50), 0.5 + 0.2 * np.sin(np.arange(50))]
+    )
+    return generate_mesh(elevation, track, width=50, clip=clip)
+
+
+def test_medal_is_generated_watertight():
+    mesh = synthetic_medal()
+
+    assert mesh.is_watertight
+    assert mesh.is_winding_consistent
+    assert mesh.volume > 0
+
+
+def test_validate_mesh_keeps_generated_faces():
+    mesh = synthetic_medal()
+    faces = len(mesh.faces)
+
+    validate_mesh(mesh)
+
+    assert len(mesh.faces) == faces
+    assert mesh.is_watertight
+
+
+def test_validate_mesh_repairs_faces():
+    mesh = trimesh.creation.box()
+    faces = mesh.faces.copy()
+    faces[0] = faces[0, ::-1]
+    mesh = trimesh.Trimesh(mesh.vertices, np.vstack([faces, faces[:1]]), process=False)
+
+    validate_mesh(mesh)
+
+    assert len(mesh.faces) == 12
+    assert mesh.is_winding_consistent
+    assert mesh.volume > 0
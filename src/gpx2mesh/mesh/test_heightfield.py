@@ -0,0 +1,117 @@
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+
+from gpx2mesh.mesh.heightfield import (
+    densify_segments,
+    sample_heightfield,
+    sample_triangles,
+    scale_elevation,
+    subdivide_on_grid,
+    subdivide_on_triangles,
+)
+
+
+def test_sample_heightfield_matches_linear_interpolator():
+    rng = np.random.default_rng(0)
+    heightfield = rng.uniform(0, 5, (30, 40))
+    points = rng.uniform(0, 50, (1000, 2))
+    points[:4] = [[0, 0], [50, 50], [0, 50], [50, 0]]  # Corners of the grid
+
+    # Rows go southward, from y = 50 to y = 0
+    interpolator = RegularGridInterpolator(
+        (np.linspace(50, 0, 30), np.linspace(0, 50, 40)), heightfield
+    )
+
+    np.testing.assert_allclose(
+        sample_heightfield(heightfield, points, 50.0), interpolator(points[:, [1, 0]])
+    )
+
+
+def test_sample_heightfield_clamps_points_out_of_the_grid():
+    heightfield = np.array([[1.0, 2.0], [3.0, 4.0]])
+
+    elevations = sample_heightfield(
+        heightfield, np.array([[-1.0, 20.0], [12.0, -5.0], [5.0, 5.0]]), 10.0
+    )
+
+    np.testing.assert_allclose(elevations, [1.0, 4.0, 2.5])
+
+
+def test_scale_elevation_flat_terrain():
+    np.testing.assert_array_equal(scale_elevation(np.full((3, 3), 7.0), 5.0), 0)
+
+
+def test_densify_segments():
+    points = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 0.25]])
+
+    dense = densify_segments(points, 0.3)
+
+    np.testing.assert_allclose(
+        dense,
+        [[0.0, 0.0], [0.25, 0.0], [0.5, 0.0], [0.75, 0.0], [1.0, 0.0], [1.0, 0.25]],
+    )
+
+
+def test_subdivide_on_grid_follows_the_terrain_mesh():
+    rng = np.random.default_rng(1)
+    heightfield = rng.uniform(0, 5, (6, 8))
+    points = np.array([[1.0, 1.0], [9.0, 6.5], [3.0, 8.0]])
+
+    subdivided = subdivide_on_grid(points, heightfield.shape, 10.0)
+
+    # Original points are kept, in order along the segments
+    np.testing.assert_array_equal(subdivided[[0, -1]], points[[0, -1]])
+    assert any(np.allclose(point, points[1]) for point in subdivided)
+
+    # Between consecutive points the terrain mesh is planar, so that midpoints are
+    # sampled at the mean of their ends
+    elevations = sample_heightfield(heightfield, subdivided, 10.0, triangulated=True)
+    midpoints = (subdivided[1:] + subdivided[:-1]) / 2
+    np.testing.assert_allclose(
+        sample_heightfield(heightfield, midpoints, 10.0, triangulated=True),
+        (elevations[1:] + elevations[:-1]) / 2,
+    )
+
+
+def test_sample_heightfield_triangulated_is_exact_on_grid_vertices():
+    heightfield = np.array([[0.0, 1.0], [2.0, 7.0]])
+    points = np.array([[0.0, 1.0], [1.0, 1.0], [0.0, 0.0], [1.0, 0.0], [0.75, 0.25]])
+
+    elevations = sample_heightfield(heightfield, points, 1.0, triangulated=True)
+
+    # The last point is in the south-east triangle, of vertices 1, 2 and 7
+    np.testing.assert_allclose(elevations, [0.0, 1.0, 2.0, 7.0, 4.25])
+
+
+def test_sample_triangles():
+    triangles = np.array(
+        [
+            [[0.0, 0.0, 0.0], [2.0, 0.0, 2.0], [0.0, 2.0, 4.0]],
+            [[2.0, 0.0, 2.0], [2.0, 2.0, 0.0], [0.0, 2.0, 4.0]],
+        ]
+    )
+    points = np.array([[0.5, 0.5], [1.5, 1.5], [2.0, 2.0], [2.0, 2.05], [5.0, 5.0]])
+
+    elevations = sample_triangles(triangles, points)
+
+    # The fourth point is out of the triangles, but within the bounding box of the
+    # second one once offset, and the last one out of both
+    np.testing.assert_allclose(elevations[:3], [1.5, 1.5, 0.0])
+    assert np.isnan(elevations[4])
+
+
+def test_subdivide_on_triangles():
+    triangles = np.array(
+        [
+            [[0.0, 0.0], [2.0, 0.0], [0.0, 2.0]],
+            [[2.0, 0.0], [2.0, 2.0], [0.0, 2.0]],
+        ]
+    )
+    points = np.array([[0.5, 0.5], [1.5, 1.0], [3.0, 1.0]])
+
+    subdivided = subdivide_on_triangles(points, triangles)
+
+    # The first segment crosses the shared diagonal, the second one the border
+    np.testing.assert_allclose(
+        subdivided, [[0.5, 0.5], [7 / 6, 5 / 6], [1.5, 1.0], [2.0, 1.0], [3.0, 1.0]]
+    )
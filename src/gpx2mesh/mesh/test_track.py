@@ -0,0 +1,90 @@
+import numpy as np
+
+from gpx2mesh.mesh.elevation import heightfield_to_disc_mesh
+from gpx2mesh.mesh.track import (
+    add_track_to_heightfield,
+    clip_track_to_disc,
+    create_track_mesh,
+)
+
+
+def test_track_mesh_skips_duplicate_points():
+    coords = np.array([[0.0, 0.0], [1.0, 0.0], [1.001, 0.0], [1.0, 1.0], [1.0, 2.0]])
+    elevations = np.array([1.0, 1.5, 1.5, 2.0, 2.5])
+
+    mesh = create_track_mesh(coords, elevations, track_height=0.5, track_width=0.2)
+
+    assert len(mesh.vertices) == 4 * 4
+    assert len(mesh.faces) == 8 * 3 + 4
+    assert mesh.is_watertight
+    assert mesh.is_winding_consistent
+    assert mesh.volume > 0
+    np.testing.assert_allclose(mesh.bounds, [[0.0, -0.1, 1.0], [1.1, 2.0, 3.0]])
+
+
+def test_track_mesh_needs_two_distinct_points():
+    coords = np.array([[0.0, 0.0], [0.001, 0.0]])
+
+    assert create_track_mesh(coords, np.zeros(2), 0.5, 0.2) is None
+
+
+def test_clip_track_to_disc():
+    coords = np.array([[0.0, 0.0], [2.0, 0.0], [3.0, 0.0], [3.0, 2.0], [0.0, 2.0]])
+
+    runs = clip_track_to_disc(coords, center=(2.0, 0.0), radius=1.5)
+
+    assert len(runs) == 1
+    np.testing.assert_allclose(
+        runs[0], [[0.5, 0.0], [2.0, 0.0], [3.0, 0.0], [3.0, np.sqrt(1.25)]]
+    )
+
+
+def test_clip_track_to_disc_splits_runs():
+    coords = np.array([[0.0, 0.0], [3.0, 0.0], [0.0, 0.5], [0.0, 3.0], [-3.0, 2.0]])
+
+    runs = clip_track_to_disc(coords, center=(0.0, 0.0), radius=1.0)
+
+    assert len(runs) == 2
+    np.testing.assert_allclose(runs[0], [[0.0, 0.0], [1.0, 0.0]])
+    np.testing.assert_allclose(np.linalg.norm(runs[1][[0, -1]], axis=1), 1.0)
+    np.testing.assert_allclose(runs[1][1:], [[0.0, 0.5], [0.0, 1.0]])
+
+
+def test_clip_track_to_disc_keeps_crossing_segments():
+    coords = np.array([[-2.0, 0.0], [2.0, 0.0]])
+
+    runs = clip_track_to_disc(coords, center=(0.0, 0.0), radius=1.0)
+
+    np.testing.assert_allclose(runs[0], [[-1.0, 0.0], [1.0, 0.0]])
+
+
+def test_track_follows_disc_mesh_near_the_rim():
+    y, x = np.mgrid[0:40, 0:40] / 39
+    heightfield = 2.5 + 2.5 * np.sin(6 * x) * np.cos(4 * y)
+    t = np.linspace(0, 6 * np.pi, 400)
+    radius = 0.48 * (0.8 + 0.2 * np.sin(5 * t))
+    track = 0.5 + np.column_stack([radius * np.cos(t), radius * np.sin(t)])
+
+    terrain = heightfield_to_disc_mesh(heightfield, width=50.0)
+    ribbon = add_track_to_heightfield(
+        heightfield, track, 50.0, clip_radius=24.5, conform="disc"
+    )
+
+    # Middle of the ribbon base at the track points, and between them, where the
+    # terrain is stitched to the circle. The track is within the clip radius, the
+    # ribbon has a single run
+    base = ribbon.vertices.reshape(-1, 4, 3)[:, 2:].mean(axis=1)
+    middles = (base[1:] + base[:-1]) / 2
+    # The ribbon merges its points closer than 0.01 mm, so that its base is only
+    # planar between the remaining ones up to the terrain slope over that distance
+    for points, tolerance in [(base, 1e-9), (middles, 1e-2)]:
+        points = points[np.hypot(points[:, 0] - 25, points[:, 1] - 25) > 22]
+        locations, rays, _ = terrain.ray.intersects_location(
+            points + [0, 0, 10],
+            np.tile([0.0, 0.0, -1.0], (len(points), 1)),
+            multiple_hits=False,
+        )
+
+        assert len(points) > 100
+        assert len(rays) == len(points)
+        np.testing.assert_allclose(locations[:, 2], points[rays, 2], atol=tolerance)
@@ -1,7 +1,20 @@
+import logging
+
 import numpy as np
 import trimesh
-from scipy.interpolate import RegularGridInterpolator
-from matplotlib import pyplot as plt
+
+from gpx2mesh.mesh.elevation import disc_band
+from gpx2mesh.mesh.heightfield import (
+    densify_segments,
+    grid_cells,
+    sample_heightfield,
+    sample_triangles,
+    scale_elevation,
+    subdivide_on_grid,
+    subdivide_on_triangles,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def add_gpx_track_to_terrain(
@@ -12,83 +25,168 @@ def add_gpx_track_to_terrain(
     track_height=0.5,
     track_width=1.0,
     debug=False,
+    clip_radius=None,
 ):
-    # Convert track into mesh coordinates
-    track_mesh_coords = track_points * width
-
-    if debug:
-        plt.plot(track_mesh_coords[:, 0], track_mesh_coords[:, 1], "r")
-        plt.imshow(elevation_array, extent=[0, width, 0, width])
-        plt.colorbar()
-        plt.savefig("debug.png")
-
-    # Sample elevations along the track from the terrain
-    track_elevations = sample_terrain_elevations(
-        track_mesh_coords,
-        elevation_array,
+    """
+    Create the track mesh over the terrain. If clip_radius is set, only the parts of
+    the track within clip_radius of the terrain center are kept.
+    """
+    return add_track_to_heightfield(
+        scale_elevation(elevation_array, target_depth),
+        track_points,
         width,
-        target_depth,
-    )
-
-    # Create the track geometry
-    track_mesh = create_track_mesh(
-        track_mesh_coords, track_elevations, track_height, track_width
+        track_height,
+        track_width,
+        debug,
+        clip_radius,
     )
 
-    return track_mesh
 
-
-def sample_terrain_elevations(
-    track_coords,
-    elevation_array,
-    width,
-    target_depth,
+def add_track_to_heightfield(
+    scaled_elevation,
+    track_points,
+    width=40.0,
+    track_height=0.5,
+    track_width=1.0,
+    debug=False,
+    clip_radius=None,
+    sample_spacing=None,
+    conform=None,
 ):
     """
-    Sample elevation values along the track path.
-
-    Returns elevations in the final mesh coordinate system.
+    Create the track mesh of add_gpx_track_to_terrain over the terrain of a
+    scale_elevation heightfield. If sample_spacing is set, the track is sampled at
+    least every sample_spacing mm, so that the ribbon follows the terrain between the
+    track points.
+
+    If conform is "square" or "disc", the track is rather split where it crosses the
+    triangles of the terrain mesh of heightfield_to_mesh or heightfield_to_disc_mesh,
+    and laid on them, so that the ribbon follows that mesh exactly with as few
+    vertices as possible.
     """
-    rows, cols = elevation_array.shape
+    if conform not in (None, "square", "disc"):
+        raise ValueError(f"Unknown terrain mesh: {conform}")
 
-    # Create coordinate grids that match the mesh coordinate system
-    x_grid = np.linspace(0, width, cols)
-    y_grid = np.linspace(width, 0, rows)
+    # Convert track into mesh coordinates
+    track_mesh_coords = track_points * width
 
-    # Normalize and scale elevation data (same as terrain mesh)
-    elevation_min = elevation_array.min()
-    elevation_max = elevation_array.max()
-    elevation_range = elevation_max - elevation_min
+    if debug:
+        # Matplotlib is slow to import, and only needed for debugging
+        from gpx2mesh.mesh.debug import plot_track
 
-    if elevation_range > 0:
-        normalized_elevation = (elevation_array - elevation_min) / elevation_range
-        scaled_elevation = normalized_elevation * target_depth
+        plot_track(track_mesh_coords, scaled_elevation, width)
+
+    if clip_radius is None:
+        runs = [track_mesh_coords]
     else:
-        scaled_elevation = np.zeros_like(elevation_array)
-
-    # Create interpolator
-    # Note: elevation_array[0,0] corresponds to the "bottom-left" in mesh coordinates
-    # We need to be careful about the Y-axis orientation
-    interpolator = RegularGridInterpolator(
-        (y_grid, x_grid),
-        scaled_elevation,
-        bounds_error=False,
-        fill_value=0,
-        method="linear",
+        runs = clip_track_to_disc(
+            track_mesh_coords, (width / 2, width / 2), clip_radius
+        )
+        if not runs:
+            logger.warning("Track is outside of the medal")
+            return None
+
+    if sample_spacing is not None:
+        runs = [densify_segments(run, sample_spacing) for run in runs]
+    band = None
+    if conform == "disc":
+        # The disc mesh keeps the cells well inside the disc, and stitches them to the
+        # circle with a band of triangles
+        scaled_elevation, cells, band = disc_band(scaled_elevation, width)
+    if conform is not None:
+        runs = [subdivide_on_grid(run, scaled_elevation.shape, width) for run in runs]
+    if band is not None:
+        # Once split on the grid, the segments of a run are each within a cell, so
+        # that the runs reaching the band have a point or a segment middle out of the
+        # inner cells
+        runs = [
+            subdivide_on_triangles(run, band)
+            if _out_of_cells(
+                np.vstack([run, (run[1:] + run[:-1]) / 2]), cells, width
+            ).any()
+            else run
+            for run in runs
+        ]
+
+    # Sample elevations along the track from the terrain, all runs at once
+    points = np.concatenate(runs)
+    track_elevations = sample_heightfield(
+        scaled_elevation, points, width, triangulated=conform is not None
+    )
+    if band is not None:
+        in_band = _out_of_cells(points, cells, width)
+        if in_band.any():
+            band_elevations = sample_triangles(band, points[in_band])
+            # Points out of the bounding boxes of the band triangles, beyond the
+            # circle, are interpolated like the circle vertices
+            track_elevations[in_band] = np.where(
+                np.isnan(band_elevations),
+                sample_heightfield(scaled_elevation, points[in_band], width),
+                band_elevations,
+            )
+    logger.debug(
+        f"Track elevation sampling: track elevation range "
+        f"{track_elevations.min():.2f} to {track_elevations.max():.2f}"
     )
+    run_elevations = np.split(track_elevations, np.cumsum([len(r) for r in runs])[:-1])
+
+    # Create the track geometry
+    track_meshes = [
+        create_track_mesh(coords, elevations, track_height, track_width)
+        for coords, elevations in zip(runs, run_elevations)
+    ]
+    track_meshes = [mesh for mesh in track_meshes if mesh is not None]
+    if not track_meshes:
+        return None
+    if len(track_meshes) == 1:
+        return track_meshes[0]
+    return trimesh.util.concatenate(track_meshes)
 
-    # Sample elevations at track points
-    # track_coords is in (x, y) format, interpolator expects (y, x)
-    track_elevations = interpolator(track_coords[:, [1, 0]])
 
-    print("Track elevation sampling:")
-    print(f"  Terrain elevation range: {elevation_min:.2f} to {elevation_max:.2f}")
-    print(f"  Scaled elevation range: 0.0 to {target_depth:.2f}")
-    print(
-        f"  Track elevation range: {track_elevations.min():.2f} to {track_elevations.max():.2f}"
+def clip_track_to_disc(track_coords, center, radius):
+    """
+    Clip a track to a disc. Returns the runs of the track within the disc, each one
+    starting and ending on the circle where the track crosses it.
+    """
+    if len(track_coords) < 2:
+        return []
+
+    # Parameters t of the segment points on the circle, from |a + t d - c| = radius
+    starts = track_coords[:-1]
+    segments = np.diff(track_coords, axis=0)
+    offsets = starts - center
+    a = np.einsum("ij,ij->i", segments, segments)
+    b = np.einsum("ij,ij->i", offsets, segments)
+    c = np.einsum("ij,ij->i", offsets, offsets) - radius**2
+    discriminant = b**2 - a * c
+
+    crossing = (a > 0) & (discriminant > 0)
+    root = np.sqrt(np.where(crossing, discriminant, 0))
+    safe_a = np.where(crossing, a, 1)
+    t_in = np.where(crossing, np.clip((-b - root) / safe_a, 0, 1), 0)
+    t_out = np.where(crossing, np.clip((-b + root) / safe_a, 0, 1), 0)
+    # Degenerate segments are kept whole if their point is inside the disc
+    t_out[(a == 0) & (c < 0)] = 1
+
+    # Parts of segments inside the disc, a run going on while they end and start
+    # at the same track point
+    pieces = np.flatnonzero(t_out > t_in)
+    if len(pieces) == 0:
+        return []
+    continued = np.zeros(len(pieces), dtype=bool)
+    continued[1:] = (
+        (pieces[1:] == pieces[:-1] + 1)
+        & (t_out[pieces[:-1]] == 1)
+        & (t_in[pieces[1:]] == 0)
     )
 
-    return track_elevations
+    ends = starts[pieces] + t_out[pieces, None] * segments[pieces]
+    first_pieces = pieces[~continued]
+    run_starts = (
+        starts[first_pieces] + t_in[first_pieces, None] * segments[first_pieces]
+    )
+    run_ends = np.split(ends, np.flatnonzero(~continued)[1:])
+    return [np.vstack([start, run]) for start, run in zip(run_starts, run_ends)]
 
 
 def create_track_mesh(track_coords, track_elevations, track_height, track_width):
@@ -98,149 +196,113 @@ def create_track_mesh(track_coords, track_elevations, track_height, track_width)
     The track is created as a ribbon/tube following the path.
     """
     if len(track_coords) < 2:
-        print("Not enough points in track")
+        logger.warning("Not enough points in track")
         return None
 
-    # Remove consecutive duplicate points (with smaller tolerance for better precision)
-    unique_indices = [0]  # Always keep first point
-    for i in range(1, len(track_coords)):
-        if not np.allclose(
-            track_coords[i], track_coords[i - 1], atol=0.01
-        ):  # Much smaller tolerance
-            unique_indices.append(i)
-
-    if len(unique_indices) < 2:
-        print("Not enough unique points in track")
+    ribbon = _track_ribbon(track_coords, track_elevations, track_height, track_width)
+    if ribbon is None:
+        logger.warning("Not enough unique points in track")
         return None
 
-    track_coords = track_coords[unique_indices]
-    track_elevations = track_elevations[unique_indices]
-
-    print("Track mesh creation:")
-    print(
-        f"  Original points: {len(track_coords)}, After deduplication: {len(unique_indices)}"
+    vertices, faces = ribbon
+    logger.info(f"Created track mesh: {len(vertices)} vertices, {len(faces)} faces")
+
+    # The ribbon is closed and wound outward by construction
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+
+# Faces joining the 4 vertices of a track point to the 4 vertices of the next one
+_SEGMENT_FACES = np.array(
+    [
+        # Top surface triangles (track surface)
+        [0, 1, 4],
+        [1, 5, 4],
+        # Bottom surface triangles (flipped normals)
+        [2, 6, 3],
+        [3, 6, 7],
+        # Left side wall triangles
+        [0, 4, 2],
+        [4, 6, 2],
+        # Right side wall triangles
+        [1, 3, 5],
+        [5, 3, 7],
+    ]
+)
+
+
+def _track_ribbon(track_coords, track_elevations, track_height, track_width):
+    """
+    Compute the vertices and faces of the track ribbon. Each track point gets 4
+    vertices: top left, top right, bottom left and bottom right. Returns None if the
+    track has less than 2 distinct points.
+    """
+    # Remove consecutive duplicate points (with smaller tolerance for better precision)
+    unique = np.ones(len(track_coords), dtype=bool)  # Always keep first point
+    unique[1:] = ~np.all(
+        np.isclose(track_coords[1:], track_coords[:-1], atol=0.01), axis=1
     )
-    print(f"  Track width: {track_width:.2f}, Track height: {track_height:.2f}")
-
-    # Calculate track center line with elevated height
-    track_z = track_elevations + track_height
-
-    # Create track ribbon by adding width perpendicular to path direction
-    vertices = []
-    faces = []
-
-    for i in range(len(track_coords)):
-        x, y = track_coords[i]
-        z = track_z[i]
-
-        # Calculate direction vector for track width
-        if i == 0:
-            # First point: use direction to next point
-            if len(track_coords) > 1:
-                direction = track_coords[i + 1] - track_coords[i]
-            else:
-                direction = np.array([1, 0])
-        elif i == len(track_coords) - 1:
-            # Last point: use direction from previous point
-            direction = track_coords[i] - track_coords[i - 1]
-        else:
-            # Middle points: use average direction for smoother curves
-            dir1 = track_coords[i] - track_coords[i - 1]
-            dir2 = track_coords[i + 1] - track_coords[i]
-            direction = (dir1 + dir2) / 2
-
-        # Normalize direction and get perpendicular
-        direction_length = np.linalg.norm(direction)
-        if direction_length > 1e-6:  # Avoid division by very small numbers
-            direction = direction / direction_length
-            perpendicular = np.array(
-                [-direction[1], direction[0]]
-            )  # 90-degree rotation
-        else:
-            perpendicular = np.array([1, 0])
-
-        # Create track vertices (left and right edges)
-        half_width = track_width / 2
-        left_point = np.array([x, y]) + perpendicular * half_width
-        right_point = np.array([x, y]) - perpendicular * half_width
-
-        # Add vertices: top surface and bottom surface for each edge
-        base_idx = len(vertices)
-        vertices.extend(
-            [
-                [left_point[0], left_point[1], z],  # 0: Top left
-                [right_point[0], right_point[1], z],  # 1: Top right
-                [left_point[0], left_point[1], track_elevations[i]],  # 2: Bottom left
-                [
-                    right_point[0],
-                    right_point[1],
-                    track_elevations[i],
-                ],  # 3: Bottom right
-            ]
-        )
 
-        # Create faces connecting this segment to the previous one
-        if i > 0:
-            prev_base = base_idx - 4
-            curr_base = base_idx
-
-            # Top surface triangles (track surface)
-            faces.extend(
-                [
-                    [prev_base, prev_base + 1, curr_base],  # Triangle 1
-                    [prev_base + 1, curr_base + 1, curr_base],  # Triangle 2
-                ]
-            )
-
-            # Bottom surface triangles (flipped normals)
-            faces.extend(
-                [
-                    [prev_base + 2, curr_base + 2, prev_base + 3],
-                    [prev_base + 3, curr_base + 2, curr_base + 3],
-                ]
-            )
+    if unique.sum() < 2:
+        return None
 
-            # Left side wall triangles
-            faces.extend(
-                [
-                    [prev_base, curr_base, prev_base + 2],
-                    [curr_base, curr_base + 2, prev_base + 2],
-                ]
-            )
+    logger.debug(
+        f"Track mesh creation: {len(track_coords)} points, {unique.sum()} after "
+        f"deduplication, width {track_width:.2f}, height {track_height:.2f}"
+    )
 
-            # Right side wall triangles
-            faces.extend(
-                [
-                    [prev_base + 1, prev_base + 3, curr_base + 1],
-                    [curr_base + 1, prev_base + 3, curr_base + 3],
-                ]
-            )
+    track_coords = track_coords[unique]
+    track_elevations = track_elevations[unique]
 
-    # Create end caps to close the ribbon
-    if len(vertices) >= 4:
-        # Start cap
-        faces.extend(
-            [
-                [0, 2, 1],  # Front face triangle 1
-                [1, 2, 3],  # Front face triangle 2
-            ]
-        )
+    # Calculate track center line with elevated height
+    track_z = track_elevations + track_height
 
-        # End cap
-        end_base = len(vertices) - 4
-        faces.extend(
+    # Direction vector for track width: to the next point for the first point, from the
+    # previous point for the last one, and the average direction for middle points
+    segments = np.diff(track_coords, axis=0)
+    direction = np.empty_like(track_coords)
+    direction[0] = segments[0]
+    direction[-1] = segments[-1]
+    direction[1:-1] = (segments[:-1] + segments[1:]) / 2
+
+    # Normalize direction and get perpendicular, avoiding division by very small numbers
+    direction_length = np.linalg.norm(direction, axis=1)
+    valid = direction_length > 1e-6
+    perpendicular = np.tile([1.0, 0.0], (len(track_coords), 1))
+    direction = direction[valid] / direction_length[valid, None]
+    perpendicular[valid] = np.column_stack([-direction[:, 1], direction[:, 0]])
+
+    # Create track vertices (left and right edges), top and bottom
+    half_width = track_width / 2
+    left_points = track_coords + perpendicular * half_width
+    right_points = track_coords - perpendicular * half_width
+    vertices = np.stack(
+        [
+            np.column_stack([left_points, track_z]),  # 0: Top left
+            np.column_stack([right_points, track_z]),  # 1: Top right
+            np.column_stack([left_points, track_elevations]),  # 2: Bottom left
+            np.column_stack([right_points, track_elevations]),  # 3: Bottom right
+        ],
+        axis=1,
+    ).reshape(-1, 3)
+
+    # Faces connecting each point to the next one, and end caps to close the ribbon
+    bases = 4 * np.arange(len(track_coords) - 1)
+    end_base = len(vertices) - 4
+    faces = np.vstack(
+        [
+            (bases[:, None, None] + _SEGMENT_FACES).reshape(-1, 3),
+            [[0, 2, 1], [1, 2, 3]],  # Start cap
             [
                 [end_base, end_base + 1, end_base + 2],
                 [end_base + 1, end_base + 3, end_base + 2],
-            ]
-        )
-
-    if not vertices or not faces:
-        return None
+            ],  # End cap
+        ]
+    )
 
-    print(f"  Created track mesh: {len(vertices)} vertices, {len(faces)} faces")
+    return vertices, faces
 
-    track_mesh = trimesh.Trimesh(vertices=vertices, faces=faces)
-    track_mesh.fix_normals()
 
-    return track_mesh
+def _out_of_cells(points, cells, width):
+    """Mask of the points out of the cells set in a mask of the heightfield cells."""
+    i, j, _, _ = grid_cells((cells.shape[0] + 1, cells.shape[1] + 1), points, width)
+    return ~cells[i, j]
@@ -0,0 +1,82 @@
+from typing import TYPE_CHECKING, Optional
+from xml.etree.ElementTree import ParseError
+
+if TYPE_CHECKING:
+    from gpx2mesh.elevation.sources import IGetElevationFiles
+
+# Peak memory of build_mesh, measured with tracemalloc, in bytes per elevation sample
+# of the crop window for loading it and for searching the resampling size within an
+# error bound, and per sample of the meshed grid for meshing it
+LOAD_BYTES_PER_SAMPLE = 40
+ERROR_BYTES_PER_SAMPLE = 60
+MESH_BYTES_PER_SAMPLE = 320
+
+
+def preflight(
+    filename,
+    files_provider: "IGetElevationFiles",
+    terrain_error: Optional[float] = 0.05,
+    terrain_triangles: Optional[int] = None,
+    memory_budget: Optional[int] = None,
+    width: float = 50.0,
+    resolution: Optional[float] = None,
+) -> dict:
+    """
+    Check a track before rendering it with the same terrain options as build_mesh,
+    without loading elevation data nor building its mesh. Returns a JSON serializable
+    report with the track bounds, the tiles it needs and whether they are available
+    locally, and estimates of the terrain grid size, triangle count and peak memory in
+    bytes. The report is not ok if the track is invalid, or if the memory estimate
+    exceeds memory_budget bytes. The grid is that of the level of the tiles pyramid
+    used for a medal of width mm at resolution mm per sample, like build_mesh.
+
+    The estimates are upper bounds when the terrain is resampled within an error
+    bound, as the resampled size depends on the elevation data.
+    """
+    from gpx2mesh.elevation import crop_window, get_crop_filenames, pyramid_level
+    from gpx2mesh.mesh import decimate
+    from gpx2mesh.track import InvalidTrackFile, load_track
+
+    report = {"track": str(filename), "ok": True, "errors": []}
+    try:
+        points, bounds = load_track(filename)
+        window = crop_window(bounds, pyramid_level(bounds, width, resolution))
+        files = get_crop_filenames(bounds)
+    except (InvalidTrackFile, ParseError, OSError) as e:
+        report["ok"] = False
+        report["errors"].append(f"Invalid track: {type(e).__name__} {e}".strip())
+        return report
+
+    local_files = {path.name for path in files_provider.get_local_paths(files)}
+    rows = window.row_max - window.row_min
+    cols = window.col_max - window.col_min
+    mesh_rows, mesh_cols = rows, cols
+    if terrain_triangles is not None:
+        mesh_rows, mesh_cols = decimate.budget_shape(
+            rows, cols, terrain_triangles, "disc"
+        )
+
+    memory = (
+        LOAD_BYTES_PER_SAMPLE * rows * cols
+        + MESH_BYTES_PER_SAMPLE * mesh_rows * mesh_cols
+    )
+    if terrain_error is not None:
+        memory += ERROR_BYTES_PER_SAMPLE * rows * cols
+    report.update(
+        {
+            "points": len(points),
+            "bounds": bounds._asdict(),
+            "tiles": [{"file": file, "local": file in local_files} for file in files],
+            "missing_tiles": [file for file in files if file not in local_files],
+            "grid": {"rows": rows, "cols": cols},
+            "mesh_grid": {"rows": mesh_rows, "cols": mesh_cols},
+            "triangles": decimate.terrain_triangles(mesh_rows, mesh_cols, "disc"),
+            "memory_bytes": memory,
+        }
+    )
+    if memory_budget is not None and memory > memory_budget:
+        report["ok"] = False
+        report["errors"].append(
+            f"Estimated memory {memory} bytes exceeds the budget of {memory_budget}"
+        )
+    return report
@@ -0,0 +1,170 @@
+from collections import namedtuple
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Measures of a stage run. Times are in seconds, start being relative to the start of
+# profiling, and memory in bytes. peak_alloc is the peak of memory allocated during
+# the stage above the allocated memory at its start, only measured if the profiler
+# traces memory. max_rss is the peak resident memory of the process so far.
+StageRecord = namedtuple(
+    "StageRecord",
+    ["name", "thread", "depth", "start", "wall", "cpu", "peak_alloc", "max_rss"],
+)
+
+_DISABLED = contextlib.nullcontext()
+
+# Profiler of the stages run in any thread, None when profiling is disabled
+_active: Optional["Profiler"] = None
+
+
+def stage(name: str):
+    """
+    Context manager measuring a stage of the medal generation when profiling is
+    enabled, doing nothing otherwise.
+    """
+    profiler = _active
+    if profiler is None:
+        return _DISABLED
+    return profiler.stage(name)
+
+
+@contextlib.contextmanager
+def profile(memory: bool = False):
+    """
+    Enable profiling of the stages run within the block, in every thread, yielding
+    the Profiler collecting them. Tracing memory allocations with memory=True slows
+    down the stages noticeably.
+    """
+    global _active
+    profiler = Profiler(memory)
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    previous, _active = _active, profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
+        if started_tracing:
+            tracemalloc.stop()
+
+
+class Profiler:
+    """Collect the StageRecord of every stage run while it is active."""
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.records: List[StageRecord] = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        stack = self._local.__dict__.setdefault("stack", [])
+        frame = {"peak": 0, "allocated": 0}
+        if self.memory:
+            # tracemalloc has a single peak, restarted for each stage: parents get
+            # the peaks of their children when they end
+            allocated, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            frame = {"peak": allocated, "allocated": allocated}
+
+        stack.append(frame)
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - cpu_start
+            stack.pop()
+
+            peak_alloc = None
+            if self.memory:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                peak_alloc = peak - frame["allocated"]
+                if stack:
+                    stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+
+            record = StageRecord(
+                name=name,
+                thread=threading.get_ident(),
+                depth=len(stack),
+                start=start - self._origin,
+                wall=wall,
+                cpu=cpu,
+                peak_alloc=peak_alloc,
+                max_rss=_max_rss(),
+            )
+            with self._lock:
+                self.records.append(record)
+
+    def to_json(self) -> list:
+        """Records as JSON serializable dicts, by start time."""
+        return [record._asdict() for record in sorted(self.records, key=_start)]
+
+    def to_chrome_trace(self) -> dict:
+        """Records in the Chrome trace event format, for chrome://tracing or Perfetto."""
+        events = [
+            {
+                "name": record.name,
+                "ph": "X",
+                "ts": record.start * 1e6,
+                "dur": record.wall * 1e6,
+                "pid": os.getpid(),
+                "tid": record.thread,
+                "args": {
+                    "cpu_ms": record.cpu * 1e3,
+                    "peak_alloc_bytes": record.peak_alloc,
+                    "max_rss_bytes": record.max_rss,
+                },
+            }
+            for record in sorted(self.records, key=_start)
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path, trace_format: str = "json"):
+        """Write the records as "json" or "chrome" trace."""
+        if trace_format not in ("json", "chrome"):
+            raise ValueError(f"Unknown trace format: {trace_format}")
+        data = self.to_json() if trace_format == "json" else self.to_chrome_trace()
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def summary(self) -> str:
+        """Table of the records, indented by depth, by start time."""
+        lines = [f"{'stage':<28} {'wall ms':>9} {'cpu ms':>9} {'peak MB':>8}"]
+        for record in sorted(self.records, key=_start):
+            name = "  " * record.depth + record.name
+            peak = "" if record.peak_alloc is None else f"{record.peak_alloc / 1e6:.1f}"
+            lines.append(
+                f"{name:<28} {record.wall * 1e3:>9.1f} {record.cpu * 1e3:>9.1f} {peak:>8}"
+            )
+        return "\n".join(lines)
+
+
+def _start(record: StageRecord) -> float:
+    return record.start
+
+
+def _max_rss() -> Optional[int]:
+    if resource is None:
+        return None
+    # Bytes on macOS, kilobytes elsewhere
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
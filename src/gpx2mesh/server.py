@@ -0,0 +1,205 @@
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import queue
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+from xml.etree.ElementTree import ParseError
+
+import numpy as np
+
+from gpx2mesh import build_mesh
+from gpx2mesh.elevation.sources import ElevationFileNotFoundError, IGetElevationFiles
+from gpx2mesh.export import export_mesh
+from gpx2mesh.profiling import stage
+from gpx2mesh.track import InvalidTrackFile
+
+EXPORT_FORMATS = {"stl": "model/stl", "3mf": "model/3mf"}
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class RenderService:
+    """
+    Render medals from GPX contents on a pool of worker threads, fed by a bounded job
+    queue. The elevation files provider and tile cache are shared by every job, so
+    that connections and tiles stay warm between requests.
+    """
+
+    def __init__(
+        self,
+        files_provider: IGetElevationFiles,
+        tile_cache=None,
+        workers: int = 2,
+        queue_size: int = 16,
+        latency_window: int = 1000,
+        **build_options,
+    ):
+        self.files_provider = files_provider
+        self.tile_cache = tile_cache
+        self.build_options = build_options
+        self.workers = workers
+
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._in_progress = 0
+        self._counts = {"completed": 0, "failed": 0, "rejected": 0}
+        self._wait_times = deque(maxlen=latency_window)
+        self._render_times = deque(maxlen=latency_window)
+
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True) for _ in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, gpx: bytes, export_format: str = "stl") -> Future:
+        """
+        Queue a rendering, whose future resolves to the exported medal. Raise
+        QueueFullError if the queue is full.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+
+        future = Future()
+        try:
+            self._jobs.put_nowait((gpx, export_format, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._counts["rejected"] += 1
+            raise QueueFullError()
+        return future
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = {
+                "queue_depth": self._jobs.qsize(),
+                "queue_size": self._jobs.maxsize,
+                "workers": self.workers,
+                "in_progress": self._in_progress,
+                **self._counts,
+                "wait_seconds": _percentiles(self._wait_times),
+                "render_seconds": _percentiles(self._render_times),
+            }
+        for counter in ("hits", "misses"):
+            if hasattr(self.tile_cache, counter):
+                metrics[f"tile_cache_{counter}"] = getattr(self.tile_cache, counter)
+        return metrics
+
+    def stop(self):
+        """Stop the workers once the queued jobs are done."""
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        while (job := self._jobs.get()) is not None:
+            gpx, export_format, future, queued_at = job
+            started_at = time.perf_counter()
+            with self._lock:
+                self._in_progress += 1
+                self._wait_times.append(started_at - queued_at)
+
+            try:
+                mesh = build_mesh(
+                    io.BytesIO(gpx),
+                    self.files_provider,
+                    tile_cache=self.tile_cache,
+                    **self.build_options,
+                )
+                medal = io.BytesIO()
+                with stage("export"):
+                    export_mesh(mesh, medal, export_format)
+                future.set_result(medal.getvalue())
+                outcome = "completed"
+            except Exception as e:
+                future.set_exception(e)
+                outcome = "failed"
+
+            with self._lock:
+                self._in_progress -= 1
+                self._counts[outcome] += 1
+                self._render_times.append(time.perf_counter() - started_at)
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"p50": float(p50), "p95": float(p95), "max": float(max(values))}
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /render?format=stl|3mf with a GPX body returns the medal, GET /metrics the
+    service metrics as JSON, and GET /health an empty 200 response.
+    """
+
+    service: RenderService
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            self._send(
+                200, json.dumps(self.service.metrics()).encode(), "application/json"
+            )
+        elif path == "/health":
+            self._send(200, b"", "text/plain")
+        else:
+            self._send_error(404, f"Unknown path {path}")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/render":
+            self._send_error(404, f"Unknown path {url.path}")
+            return
+
+        export_format = parse_qs(url.query).get("format", ["stl"])[0]
+        if export_format not in EXPORT_FORMATS:
+            self._send_error(400, f"Unknown export format {export_format}")
+            return
+
+        gpx = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            future = self.service.submit(gpx, export_format)
+        except QueueFullError:
+            self._send_error(503, "Render queue is full", {"Retry-After": "1"})
+            return
+
+        try:
+            medal = future.result()
+        except (InvalidTrackFile, ParseError) as e:
+            self._send_error(400, f"Invalid GPX file {e}".strip())
+        except ElevationFileNotFoundError as e:
+            self._send_error(
+                422, f"Missing elevation files {', '.join(e.missing_files)}"
+            )
+        except Exception as e:
+            self._send_error(500, f"{type(e).__name__}: {e}")
+        else:
+            self._send(200, medal, EXPORT_FORMATS[export_format])
+
+    def _send(self, status, body: bytes, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, headers=None):
+        body = json.dumps({"error": message}).encode()
+        self._send(status, body, "application/json", headers)
+
+
+def make_server(service: RenderService, host="127.0.0.1", port=8000):
+    """Create an HTTP server for the render service, to run with serve_forever."""
+    handler = type("Handler", (RenderRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
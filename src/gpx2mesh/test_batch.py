@@ -0,0 +1,78 @@
+import logging
+from pathlib import Path
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+import gpx2mesh.batch
+from gpx2mesh.batch import _fetch_tiles, _render_tracks, collect_tracks, render_batch
+from gpx2mesh.elevation.sources import AssetsFolderProvider, ElevationFileNotFoundError
+
+GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="local test">
+  <trk>
+    <trkseg>
+      <trkpt lat="45.76154" lon="4.82598"><ele>172</ele></trkpt>
+      <trkpt lat="45.76181" lon="4.82615"><ele>174</ele></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+
+def test_collect_tracks(tmp_path):
+    (tmp_path / "b").mkdir()
+    for name in ["a.gpx", "b/c.gpx", "b/d.txt"]:
+        (tmp_path / name).write_text(GPX)
+    (tmp_path / "manifest.txt").write_text("# Race\nb/c.gpx\n\na.gpx\n")
+
+    assert collect_tracks(str(tmp_path)) == [tmp_path / "a.gpx", tmp_path / "b/c.gpx"]
+    assert collect_tracks(str(tmp_path / "**/c.gpx")) == [tmp_path / "b/c.gpx"]
+    assert collect_tracks(str(tmp_path / "manifest.txt")) == [
+        tmp_path / "b/c.gpx",
+        tmp_path / "a.gpx",
+    ]
+
+
+# Missing files are reported with their extension by AssetsFolderProvider, and
+# without it by NasaProvider
+@pytest.mark.parametrize("missing_file", ["n01e001.hgts", "n01e001"])
+def test_fetch_tiles_keeps_available_files(missing_file):
+    provider = Mock()
+    provider.get_paths.side_effect = [
+        ElevationFileNotFoundError([missing_file]),
+        [Path("assets/n00e000.hgts")],
+    ]
+
+    paths = _fetch_tiles(["n00e000.hgts", "n01e001.hgts"], provider)
+
+    assert paths == {"n00e000.hgts": Path("assets/n00e000.hgts")}
+    provider.get_paths.assert_called_with(["n00e000.hgts"])
+
+
+def test_render_batch_reports_failures(tmp_path):
+    (tmp_path / "valid.gpx").write_text(GPX)
+    (tmp_path / "invalid.gpx").write_text("<gpx></gpx>")
+    tracks = [tmp_path / "valid.gpx", tmp_path / "invalid.gpx"]
+
+    results = render_batch(tracks, AssetsFolderProvider(tmp_path / "assets"), workers=2)
+
+    assert [result.track for result in results] == tracks
+    assert all(result.output is None for result in results)
+    assert results[0].error == "missing elevation files n45e004.hgts"
+    assert results[1].error.startswith("InvalidTrackFile")
+
+
+def test_render_tracks_logs_unexpected_errors(tmp_path, monkeypatch, caplog):
+    def build_mesh(*args, **kwargs):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(gpx2mesh.batch, "build_mesh", build_mesh)
+    parsed_track = (np.zeros((2, 2)), None)
+
+    with caplog.at_level(logging.ERROR, logger="gpx2mesh.batch"):
+        results = _render_tracks([(tmp_path / "a.gpx", parsed_track)], {}, None, {})
+
+    assert results[0].error == "RuntimeError: bug"
+    assert caplog.records[0].exc_info is not None
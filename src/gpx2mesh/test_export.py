@@ -0,0 +1,53 @@
+import io
+
+import numpy as np
+import pytest
+import trimesh
+
+from gpx2mesh.export import export_mesh, write_stl
+
+
+@pytest.fixture
+def mesh():
+    return trimesh.creation.icosphere(subdivisions=2)
+
+
+def test_stl_matches_trimesh_export(mesh):
+    output = io.BytesIO()
+
+    write_stl(mesh.vertices, mesh.faces, output, chunk_size=7)
+
+    expected = trimesh.exchange.stl.export_stl(mesh)
+    assert len(output.getvalue()) == len(expected)
+    # Same records after the header
+    actual = np.frombuffer(output.getvalue()[84:], dtype=np.uint8).reshape(-1, 50)
+    expected = np.frombuffer(expected[84:], dtype=np.uint8).reshape(-1, 50)
+    np.testing.assert_allclose(
+        actual[:, :48].copy().view("<f4"),
+        expected[:, :48].copy().view("<f4"),
+        atol=1e-6,
+    )
+
+
+def test_export_mesh_to_path(mesh, tmp_path):
+    export_mesh(mesh, tmp_path / "medal.stl", chunk_size=100)
+
+    loaded = trimesh.load(tmp_path / "medal.stl")
+    assert len(loaded.faces) == len(mesh.faces)
+    assert loaded.volume == pytest.approx(mesh.volume)
+
+
+def test_export_3mf(mesh):
+    output = io.BytesIO()
+
+    export_mesh(mesh, output, "3mf", chunk_size=50)
+
+    output.seek(0)
+    loaded = trimesh.load(output, file_type="3mf", force="mesh")
+    assert len(loaded.faces) == len(mesh.faces)
+    assert loaded.volume == pytest.approx(mesh.volume, rel=1e-4)
+
+
+def test_export_mesh_rejects_unknown_format(mesh):
+    with pytest.raises(ValueError):
+        export_mesh(mesh, "medal.obj")
@@ -0,0 +1,55 @@
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = {"matplotlib", "scipy", "trimesh"}
+
+# Cumulative import time budgets, in seconds, generous enough for slow machines
+IMPORT_BUDGETS = {
+    "gpx2mesh": 0.05,
+    "gpx2mesh.track": 0.5,
+    "gpx2mesh.elevation.cache": 1.0,
+    "gpx2mesh.mesh.decimate": 0.5,
+}
+
+
+def import_times(code, *args):
+    """Run Python code with -X importtime, returning the cumulative time by module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *code, *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative) / 1e6
+    return times
+
+
+@pytest.mark.parametrize("module", IMPORT_BUDGETS)
+def test_import_is_light(module):
+    times = import_times(["-c", f"import {module}"])
+
+    heavy = {name for name in times if name.split(".")[0] in HEAVY_MODULES}
+    assert not heavy, f"{module} imports {', '.join(sorted(heavy))}"
+    assert times[module] < IMPORT_BUDGETS[module]
+
+
+def test_mesh_does_not_import_matplotlib():
+    times = import_times(["-c", "import gpx2mesh.mesh"])
+
+    assert not any(name.startswith("matplotlib") for name in times)
+
+
+def test_cli_help_does_not_import_the_package():
+    main = Path(__file__).parents[2] / "main.py"
+
+    times = import_times([str(main), "--help"])
+
+    assert not any(name.startswith("gpx2mesh") for name in times)
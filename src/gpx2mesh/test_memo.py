@@ -0,0 +1,155 @@
+from collections import namedtuple
+import io
+import threading
+
+import numpy as np
+import pytest
+
+from gpx2mesh import build_mesh
+from gpx2mesh.memo import StageCache, memoize, stage_key
+from gpx2mesh.track import load_track
+
+GPX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="local test">
+  <trk>
+    <trkseg>
+      <trkpt lat="45.70" lon="4.70"><ele>172</ele></trkpt>
+      <trkpt lat="45.75" lon="4.78"><ele>174</ele></trkpt>
+      <trkpt lat="45.78" lon="4.80"><ele>180</ele></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+
+def test_stage_key_depends_on_inputs():
+    Point = namedtuple("Point", ["x", "y"])
+    array = np.arange(6, dtype=float)
+
+    key = stage_key("stage", array, 1.5, Point(1, 2), None)
+
+    assert key == stage_key("stage", array.copy(), 1.5, Point(1, 2), None)
+    assert key != stage_key("other", array, 1.5, Point(1, 2), None)
+    assert key != stage_key("stage", array.reshape(2, 3), 1.5, Point(1, 2), None)
+    assert key != stage_key("stage", array.astype(np.float32), 1.5, Point(1, 2), None)
+    assert key != stage_key("stage", array, 1.5, Point(1, 3), None)
+    with pytest.raises(TypeError):
+        stage_key("stage", object())
+
+
+def test_memoize_without_cache_computes():
+    assert memoize(None, "stage", (1,), lambda: 2) == 2
+
+
+def test_stage_cache_evicts_least_recently_used():
+    cache = StageCache(max_memory=2000)
+    compute = {
+        key: (lambda value=i: np.full(100, value)) for i, key in enumerate("abc")
+    }
+
+    first = cache.get("a", compute["a"])
+    cache.get("b", compute["b"])
+    assert cache.get("a", compute["a"]) is first
+    cache.get("c", compute["c"])
+
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert not first.flags.writeable
+    cache.get("b", compute["b"])  # Evicted as least recently used
+    assert cache.misses == 4
+
+
+def test_stage_cache_stores_results_on_disk(tmp_path):
+    cache = StageCache(folder=tmp_path, max_disk=2000)
+    cache.get("a", lambda: np.zeros(100))
+
+    def fail():
+        raise AssertionError("Result should be read from disk")
+
+    other = StageCache(folder=tmp_path)
+    np.testing.assert_array_equal(other.get("a", fail), np.zeros(100))
+
+    cache.get("b", lambda: np.ones(100))
+    cache.get("c", lambda: np.ones(100))
+    assert sorted(p.stem for p in tmp_path.glob("*.pkl")) == ["b", "c"]
+
+
+def test_stage_cache_reads_none_results_from_disk(tmp_path):
+    StageCache(folder=tmp_path).get("a", lambda: None)
+
+    def fail():
+        raise AssertionError("Result should be read from disk")
+
+    other = StageCache(folder=tmp_path)
+    assert other.get("a", fail) is None
+    assert (other.hits, other.misses) == (1, 0)
+
+
+def test_stage_cache_computes_once_concurrently():
+    cache = StageCache()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait()
+        return np.zeros(10)
+
+    threads = [
+        threading.Thread(target=cache.get, args=("a", compute)) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+
+
+def test_build_mesh_reuses_unchanged_stages(provider):
+    cache = StageCache()
+    build_mesh(io.BytesIO(GPX), provider, stage_cache=cache)
+    misses = cache.misses
+
+    mesh = build_mesh(io.BytesIO(GPX), provider, track_height=1.0, stage_cache=cache)
+
+    # Only the track mesh depends on its height
+    assert cache.misses == misses + 1
+    expected = build_mesh(io.BytesIO(GPX), provider, track_height=1.0)
+    np.testing.assert_allclose(mesh.vertices, expected.vertices)
+    np.testing.assert_array_equal(mesh.faces, expected.faces)
+
+    build_mesh(io.BytesIO(GPX), provider, base_thickness=2.0, stage_cache=cache)
+
+    # The terrain mesh depends on the base thickness, but not its heightfield
+    assert cache.misses == misses + 2
+
+
+def test_build_mesh_plots_cached_track(provider, monkeypatch):
+    plots = []
+    monkeypatch.setattr(
+        "gpx2mesh.mesh.debug.plot_track", lambda *args: plots.append(args)
+    )
+    cache = StageCache()
+
+    build_mesh(io.BytesIO(GPX), provider, debug=True, stage_cache=cache)
+    misses = cache.misses
+    build_mesh(io.BytesIO(GPX), provider, debug=True, stage_cache=cache)
+
+    build_mesh(io.BytesIO(GPX), provider, stage_cache=cache)
+
+    # Plotting does not change the stages, but is done on every build asking for it
+    assert cache.misses == misses
+    assert len(plots) == 2
+
+
+def test_build_mesh_from_parsed_track(provider, tmp_path):
+    (tmp_path / "track.gpx").write_bytes(GPX)
+    parsed_track = load_track(tmp_path / "track.gpx")
+    (tmp_path / "track.gpx").unlink()
+
+    mesh = build_mesh(tmp_path / "track.gpx", provider, parsed_track=parsed_track)
+
+    expected = build_mesh(io.BytesIO(GPX), provider)
+    np.testing.assert_array_equal(mesh.vertices, expected.vertices)
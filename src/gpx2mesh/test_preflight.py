@@ -0,0 +1,76 @@
+from gpx2mesh.elevation.sources import AssetsFolderProvider
+from gpx2mesh.preflight import preflight
+
+GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="local test">
+  <trk>
+    <trkseg>
+      <trkpt lat="45.9" lon="4.9"><ele>172</ele></trkpt>
+      <trkpt lat="46.1" lon="5.1"><ele>174</ele></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+
+def test_preflight_report(tmp_path):
+    (tmp_path / "track.gpx").write_text(GPX)
+    (tmp_path / "n45e004.hgts").touch()
+
+    report = preflight(
+        tmp_path / "track.gpx", AssetsFolderProvider(tmp_path), terrain_error=None
+    )
+
+    assert report["ok"]
+    assert report["points"] == 2
+    assert report["tiles"] == [
+        {"file": "n45e004.hgts", "local": True},
+        {"file": "n45e005.hgts", "local": False},
+        {"file": "n46e004.hgts", "local": False},
+        {"file": "n46e005.hgts", "local": False},
+    ]
+    assert report["missing_tiles"] == ["n45e005.hgts", "n46e004.hgts", "n46e005.hgts"]
+    # 0.24 degree wide window, with 3600 samples per degree
+    assert report["grid"] == {"rows": 866, "cols": 866}
+    assert report["mesh_grid"] == report["grid"]
+    assert 1.1e6 < report["triangles"] < 1.2e6
+    assert report["memory_bytes"] == 360 * 866**2
+
+
+def test_preflight_budgets(tmp_path):
+    (tmp_path / "track.gpx").write_text(GPX)
+
+    report = preflight(
+        tmp_path / "track.gpx",
+        AssetsFolderProvider(tmp_path),
+        terrain_triangles=10000,
+        memory_budget=10 * 1024**2,
+    )
+
+    assert not report["ok"]
+    assert report["errors"][0].startswith("Estimated memory")
+    # The budget is that of the disc mesh, with fewer faces than the square one
+    assert 60 < report["mesh_grid"]["rows"] < 80
+    assert 9000 < report["triangles"] <= 10000
+
+
+def test_preflight_invalid_track(tmp_path):
+    (tmp_path / "track.gpx").write_text("<gpx></gpx>")
+
+    report = preflight(tmp_path / "track.gpx", AssetsFolderProvider(tmp_path))
+
+    assert not report["ok"]
+    assert report["errors"] == [
+        "Invalid track: InvalidTrackFile No <trk> element in .gpx file"
+    ]
+
+
+def test_preflight_invalid_track_point(tmp_path):
+    (tmp_path / "track.gpx").write_text(
+        '<gpx><trk><trkseg><trkpt lon="4.5"/></trkseg></trk></gpx>'
+    )
+
+    report = preflight(tmp_path / "track.gpx", AssetsFolderProvider(tmp_path))
+
+    assert not report["ok"]
+    assert report["errors"][0].startswith("Invalid track: InvalidTrackFile")
@@ -0,0 +1,72 @@
+import json
+import threading
+
+import numpy as np
+
+from gpx2mesh.profiling import profile, stage
+
+
+def test_stage_does_nothing_when_disabled():
+    with stage("outside"):
+        pass
+
+    with profile() as profiler:
+        pass
+
+    assert profiler.records == []
+
+
+def test_profile_nested_stages():
+    def work():
+        with stage("thread"):
+            pass
+
+    with profile() as profiler:
+        with stage("parent"):
+            with stage("child"):
+                pass
+            # Stages of other threads are not nested in the stages of this one
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+    records = {record.name: record for record in profiler.records}
+    assert records["parent"].depth == 0
+    assert records["child"].depth == 1
+    assert records["thread"].depth == 0
+    assert records["thread"].thread != records["parent"].thread
+    assert records["parent"].wall >= records["child"].wall
+    assert records["parent"].peak_alloc is None
+
+
+def test_profile_memory_peaks():
+    with profile(memory=True) as profiler:
+        with stage("parent"):
+            with stage("child"):
+                array = np.ones(10_000_000, dtype=np.uint8)
+                del array
+            with stage("small"):
+                np.ones(1_000, dtype=np.uint8)
+
+    records = {record.name: record for record in profiler.records}
+    assert records["child"].peak_alloc >= 10_000_000
+    assert records["small"].peak_alloc < 100_000
+    # Parents account for the peaks of their children
+    assert records["parent"].peak_alloc >= 10_000_000
+
+
+def test_profile_writes_chrome_trace(tmp_path):
+    with profile() as profiler:
+        with stage("parent"):
+            with stage("child"):
+                pass
+
+    profiler.write(tmp_path / "trace.json", "chrome")
+    trace = json.loads((tmp_path / "trace.json").read_text())
+
+    events = trace["traceEvents"]
+    assert [event["name"] for event in events] == ["parent", "child"]
+    assert all(event["ph"] == "X" for event in events)
+    assert events[0]["ts"] <= events[1]["ts"]
+    assert events[0]["dur"] >= events[1]["dur"]
+    assert "child" in profiler.summary()
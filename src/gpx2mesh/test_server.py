@@ -0,0 +1,96 @@
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+import trimesh
+
+import gpx2mesh.server
+from gpx2mesh.server import QueueFullError, RenderService, make_server
+from gpx2mesh.track import InvalidTrackFile
+
+
+@pytest.fixture
+def fake_build_mesh(monkeypatch):
+    release = threading.Event()
+    release.set()
+
+    def build_mesh(gpx, files_provider, tile_cache=None, **options):
+        release.wait()
+        if gpx.read() == b"invalid":
+            raise InvalidTrackFile()
+        return trimesh.creation.box()
+
+    monkeypatch.setattr(gpx2mesh.server, "build_mesh", build_mesh)
+    return release
+
+
+@pytest.fixture
+def server(fake_build_mesh):
+    service = RenderService(files_provider=None, workers=1, queue_size=1)
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.stop()
+
+
+def post(url, body):
+    try:
+        with urlopen(Request(url, data=body, method="POST")) as response:
+            return response.status, response.headers["Content-Type"], response.read()
+    except HTTPError as e:
+        return e.code, e.headers["Content-Type"], e.read()
+
+
+def test_render_medal(server):
+    status, content_type, body = post(f"{server}/render?format=3mf", b"<gpx/>")
+
+    assert (status, content_type) == (200, "model/3mf")
+    assert body.startswith(b"PK")
+
+
+def test_render_invalid_track(server):
+    status, _, body = post(f"{server}/render", b"invalid")
+
+    assert status == 400
+    assert json.loads(body) == {"error": "Invalid GPX file"}
+
+
+def test_render_unknown_format(server):
+    status, _, _ = post(f"{server}/render?format=obj", b"<gpx/>")
+
+    assert status == 400
+
+
+def test_metrics(server):
+    post(f"{server}/render", b"<gpx/>")
+    post(f"{server}/render", b"invalid")
+
+    with urlopen(f"{server}/metrics") as response:
+        metrics = json.load(response)
+
+    assert metrics["completed"] == 1
+    assert metrics["failed"] == 1
+    assert metrics["queue_depth"] == 0
+    assert metrics["render_seconds"]["p50"] >= 0
+
+
+def test_full_queue_rejects_jobs(fake_build_mesh):
+    fake_build_mesh.clear()
+    service = RenderService(files_provider=None, workers=1, queue_size=1)
+
+    running = service.submit(b"<gpx/>")
+    # Wait for the worker to take the first job, then fill the queue
+    while service.metrics()["in_progress"] == 0:
+        pass
+    queued = service.submit(b"<gpx/>")
+    with pytest.raises(QueueFullError):
+        service.submit(b"<gpx/>")
+
+    fake_build_mesh.set()
+    assert running.result(timeout=5) and queued.result(timeout=5)
+    assert service.metrics()["rejected"] == 1
+    service.stop()
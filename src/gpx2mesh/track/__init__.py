@@ -1,4 +1,5 @@
 from collections import namedtuple
+from datetime import datetime, timezone
 from typing import Tuple
 import xml.etree.ElementTree as ET
 import numpy as np
@@ -6,50 +7,108 @@ import numpy as np
 
 TrackBounds = namedtuple("TrackBounds", ["lat_min", "lat_max", "lon_min", "lon_max"])
 
+# `points` holds (lon, lat) rows. `elevations` and `times` (POSIX seconds) are only
+# loaded on demand, and are NaN where a point has no value. `segments` holds the index
+# of the first point of each non-empty <trkseg>.
+TrackPoints = namedtuple("TrackPoints", ["points", "elevations", "times", "segments"])
+
 
 class InvalidTrackFile(Exception):
     pass
 
 
-def load_track(track_file: str) -> Tuple[np.ndarray, TrackBounds]:
-    tree = ET.parse(track_file)
-    root = tree.getroot()
-    track = root.find("{*}trk")
-    if track is None:
-        print("No <trk> element in .gpx file")
-        raise InvalidTrackFile
+def load_track(track_file) -> Tuple[np.ndarray, TrackBounds]:
+    track = load_track_points(track_file)
+    return track.points, track_bounds(track.points)
+
+
+def load_track_points(track_file, elevations=False, times=False) -> TrackPoints:
+    """
+    Stream the points of every <trkseg> of every <trk> of a .gpx file, clearing parsed
+    elements as it goes so that memory stays proportional to the number of points.
+    """
+    values = np.empty((4096, 4), dtype=np.float64)
+    count = 0
+    segments = []
+    has_track = False
+    has_segment = False
+    segment = None
+
+    for event, elem in ET.iterparse(track_file, events=("start", "end")):
+        tag = elem.tag.rsplit("}", 1)[-1]
 
-    segments = track.find("{*}trkseg")
-    if segments is None:
-        print("No <trkseg> element in .gpx file")
-        raise InvalidTrackFile
+        if event == "start":
+            if tag == "trk":
+                has_track = True
+            elif tag == "trkseg":
+                has_segment = True
+                segment = elem
+                segments.append(count)
+            continue
 
-    if len(segments) == 0:
-        print("<trkseg> element is empty")
-        raise InvalidTrackFile
+        if tag == "trkpt" and segment is not None:
+            if count == len(values):
+                values = np.resize(values, (2 * len(values), 4))
 
-    lat_min = float(segments[0].attrib["lat"])
-    lat_max = float(segments[0].attrib["lat"])
-    lon_min = float(segments[0].attrib["lon"])
-    lon_max = float(segments[0].attrib["lon"])
-    track = []
+            try:
+                values[count, 0] = float(elem.attrib["lon"])
+                values[count, 1] = float(elem.attrib["lat"])
+                values[count, 2] = (
+                    _child_value(elem, "ele", float) if elevations else np.nan
+                )
+                values[count, 3] = (
+                    _child_value(elem, "time", _parse_time) if times else np.nan
+                )
+            except (KeyError, ValueError) as e:
+                raise InvalidTrackFile(f"Invalid <trkpt> element: {e!r}") from e
+            count += 1
 
-    for seg in segments:
-        lat = float(seg.attrib["lat"])
-        lon = float(seg.attrib["lon"])
+            # Drop the parsed point from its segment
+            segment.clear()
+        elif tag == "trkseg":
+            segment = None
 
-        track.append((lon, lat))
+    if not has_track:
+        raise InvalidTrackFile("No <trk> element in .gpx file")
 
-        if lat < lat_min:
-            lat_min = float(lat)
-        if lat > lat_max:
-            lat_max = float(lat)
+    if not has_segment:
+        raise InvalidTrackFile("No <trkseg> element in .gpx file")
 
-        if lon < lon_min:
-            lon_min = float(lon)
-        if lon > lon_max:
-            lon_max = float(lon)
+    if count == 0:
+        raise InvalidTrackFile("<trkseg> element is empty")
 
-    return np.array(track), TrackBounds(
-        lat_min=lat_min, lat_max=lat_max, lon_min=lon_min, lon_max=lon_max
+    values = values[:count]
+    segments = sorted(set(s for s in segments if s < count))
+
+    return TrackPoints(
+        points=values[:, :2].copy(),
+        elevations=values[:, 2].copy() if elevations else None,
+        times=values[:, 3].copy() if times else None,
+        segments=np.array(segments),
     )
+
+
+def track_bounds(points: np.ndarray) -> TrackBounds:
+    lon_min, lat_min = points.min(axis=0)
+    lon_max, lat_max = points.max(axis=0)
+
+    return TrackBounds(
+        lat_min=float(lat_min),
+        lat_max=float(lat_max),
+        lon_min=float(lon_min),
+        lon_max=float(lon_max),
+    )
+
+
+def _child_value(elem: ET.Element, tag: str, parse):
+    child = elem.find(f"{{*}}{tag}")
+    if child is None or child.text is None:
+        return np.nan
+    return parse(child.text.strip())
+
+
+def _parse_time(text: str) -> float:
+    time = datetime.fromisoformat(text)
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)  # GPX times are in UTC
+    return time.timestamp()
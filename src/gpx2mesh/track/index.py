@@ -0,0 +1,121 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class TrackIndex:
+    """
+    Uniform grid index over the (x, y) points of a track, for bulk range and radius
+    queries. Points are bucketed by cell with a single sort: the indices of the points
+    of each cell are contiguous in `order`, between the `offsets` of the cell and of
+    the next one.
+
+    By default cells are sized so that the grid has about as many cells as points.
+    """
+
+    def __init__(self, points: np.ndarray, cell_size: Optional[float] = None):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.origin = self.points.min(axis=0)
+        extent = self.points.max(axis=0) - self.origin
+
+        if cell_size is None:
+            cell_size = extent.max() / max(np.sqrt(len(self.points)), 1)
+        # All points in a single cell for degenerate tracks
+        self.cell_size = float(cell_size) if cell_size > 0 else 1.0
+        self.shape = tuple(np.floor(extent / self.cell_size).astype(np.intp) + 1)
+
+        cells = self._cells(self.points)
+        self.order = np.argsort(cells, kind="stable")
+        self.offsets = np.zeros(self.shape[0] * self.shape[1] + 1, dtype=np.intp)
+        np.cumsum(
+            np.bincount(cells, minlength=len(self.offsets) - 1), out=self.offsets[1:]
+        )
+
+    def __len__(self):
+        return len(self.points)
+
+    def query_boxes(
+        self, lows: np.ndarray, highs: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the points within each [low, high] box, bounds included. Returns the
+        indices of the boxes and of the points of each match, ordered by box then
+        point.
+        """
+        lows = np.atleast_2d(lows)
+        highs = np.atleast_2d(highs)
+        queries, indices = self._candidates(lows, highs)
+
+        points = self.points[indices]
+        inside = np.all((points >= lows[queries]) & (points <= highs[queries]), axis=1)
+        return _sorted(queries[inside], indices[inside])
+
+    def query_radius(
+        self, centers: np.ndarray, radius
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the points within radius of each center, radius being a scalar or one
+        value per center. Returns the indices of the centers and of the points of each
+        match, ordered by center then point.
+        """
+        centers = np.atleast_2d(centers)
+        radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), len(centers))
+        queries, indices = self._candidates(
+            centers - radius[:, None], centers + radius[:, None]
+        )
+
+        offsets = self.points[indices] - centers[queries]
+        inside = np.einsum("ij,ij->i", offsets, offsets) <= radius[queries] ** 2
+        return _sorted(queries[inside], indices[inside])
+
+    def query_pairs(self, radius: float, min_gap: int = 1) -> np.ndarray:
+        """
+        Find the pairs of points within radius of each other that are more than
+        min_gap points apart along the track, such as the overlapping sections of an
+        out-and-back track. Returns an array of (i, j) rows with i < j.
+        """
+        queries, indices = self.query_radius(self.points, radius)
+        keep = indices - queries > min_gap
+        return np.column_stack([queries[keep], indices[keep]])
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        """Flat index of the cell of each point, clamped to the grid."""
+        cells = np.floor((points - self.origin) / self.cell_size).astype(np.intp)
+        cells = np.clip(cells, 0, np.array(self.shape) - 1)
+        return cells[:, 0] * self.shape[1] + cells[:, 1]
+
+    def _candidates(self, lows: np.ndarray, highs: np.ndarray):
+        """
+        Pairs of query and point indices of the points in the cells overlapping the
+        [low, high] box of each query, for all queries at once.
+        """
+        shape = np.array(self.shape)
+        first = np.floor((lows - self.origin) / self.cell_size).astype(np.intp)
+        last = np.floor((highs - self.origin) / self.cell_size).astype(np.intp)
+        # Boxes out of the grid overlap no cell
+        outside = np.any((last < 0) | (first >= shape), axis=1)
+        first = np.clip(first, 0, shape - 1)
+        last = np.clip(last, 0, shape - 1)
+
+        # Cells overlapping each box, row by row
+        rows = last[:, 0] - first[:, 0] + 1
+        cols = last[:, 1] - first[:, 1] + 1
+        counts = np.where(outside, 0, rows * cols)
+        query = np.repeat(np.arange(len(lows)), counts)
+        k = np.arange(len(query)) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_x = first[query, 0] + k // cols[query]
+        cell_y = first[query, 1] + k % cols[query]
+        cells = cell_x * self.shape[1] + cell_y
+
+        # Points of these cells
+        starts = self.offsets[cells]
+        sizes = self.offsets[cells + 1] - starts
+        query = np.repeat(query, sizes)
+        positions = np.repeat(starts - (np.cumsum(sizes) - sizes), sizes)
+        positions += np.arange(len(positions))
+        return query, self.order[positions]
+
+
+def _sorted(queries: np.ndarray, indices: np.ndarray):
+    order = np.lexsort((indices, queries))
+    return queries[order], indices[order]
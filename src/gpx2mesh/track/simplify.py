@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def simplify_track(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplify a track with the Douglas-Peucker algorithm: every removed point lies within
+    `tolerance` of the simplified track, in the same unit as the points. Distances of
+    a whole span to its chord are computed at once, so the Python overhead grows with
+    the number of kept points only.
+    """
+    if len(points) < 3 or tolerance <= 0:
+        return points
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    spans = [(0, len(points) - 1)]
+    while spans:
+        first, last = spans.pop()
+        if last - first < 2:
+            continue
+
+        distances = _distances_to_segment(
+            points[first + 1 : last], points[first], points[last]
+        )
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            spans.append((first, split))
+            spans.append((split, last))
+
+    return points[keep]
+
+
+def _distances_to_segment(points: np.ndarray, start: np.ndarray, end: np.ndarray):
+    """Distances from points to the [start, end] segment, which may be degenerate."""
+    segment = end - start
+    length_squared = segment @ segment
+    if length_squared == 0:
+        return np.linalg.norm(points - start, axis=1)
+
+    t = np.clip((points - start) @ segment / length_squared, 0, 1)
+    return np.linalg.norm(points - (start + t[:, None] * segment), axis=1)
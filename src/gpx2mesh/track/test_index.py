@@ -0,0 +1,73 @@
+import numpy as np
+
+from gpx2mesh.track.index import TrackIndex
+
+
+def random_walk(size, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.normal(size=(size, 2)), axis=0)
+
+
+def test_query_boxes_matches_brute_force():
+    points = random_walk(2000)
+    index = TrackIndex(points)
+    rng = np.random.default_rng(1)
+    lows = rng.uniform(points.min(axis=0) - 5, points.max(axis=0), (50, 2))
+    highs = lows + rng.uniform(0, 20, (50, 2))
+
+    queries, indices = index.query_boxes(lows, highs)
+
+    inside = np.all(
+        (points[None] >= lows[:, None]) & (points[None] <= highs[:, None]), axis=2
+    )
+    expected_queries, expected_indices = np.nonzero(inside)
+    np.testing.assert_array_equal(queries, expected_queries)
+    np.testing.assert_array_equal(indices, expected_indices)
+
+
+def test_query_radius_matches_brute_force():
+    points = random_walk(2000)
+    index = TrackIndex(points, cell_size=3.0)
+    centers = points[::100] + 0.5
+    radius = np.linspace(0.5, 10, len(centers))
+
+    queries, indices = index.query_radius(centers, radius)
+
+    distances = np.linalg.norm(points[None] - centers[:, None], axis=2)
+    expected_queries, expected_indices = np.nonzero(distances <= radius[:, None])
+    np.testing.assert_array_equal(queries, expected_queries)
+    np.testing.assert_array_equal(indices, expected_indices)
+
+
+def test_query_out_of_the_track():
+    index = TrackIndex(np.array([[0.0, 0.0], [1.0, 1.0]]))
+
+    queries, indices = index.query_radius(np.array([[10.0, 10.0]]), 1.0)
+
+    assert len(queries) == len(indices) == 0
+
+
+def test_query_pairs_finds_out_and_back_overlaps():
+    x = np.linspace(0, 10, 101)
+    points = np.vstack(
+        [
+            np.column_stack([x, np.zeros(101)]),
+            np.column_stack([x[::-1], np.full(101, 0.05)]),
+        ]
+    )
+    index = TrackIndex(points)
+
+    pairs = index.query_pairs(0.06, min_gap=5)
+
+    # Each point going out overlaps the point at the same position coming back
+    assert {(i, 201 - i) for i in range(95)} <= set(map(tuple, pairs))
+    assert np.all(pairs[:, 1] - pairs[:, 0] > 5)
+
+
+def test_index_of_a_single_point():
+    index = TrackIndex(np.array([[2.0, 3.0]]))
+
+    queries, indices = index.query_boxes(np.array([1.0, 2.0]), np.array([2.0, 3.0]))
+
+    assert len(index) == 1
+    np.testing.assert_array_equal(indices, [0])
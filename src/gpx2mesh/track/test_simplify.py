@@ -0,0 +1,38 @@
+import numpy as np
+
+from gpx2mesh.track.simplify import _distances_to_segment, simplify_track
+
+
+def test_simplify_noisy_straight_line():
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 10, 1000)
+    points = np.column_stack([x, rng.uniform(-0.01, 0.01, len(x))])
+
+    simplified = simplify_track(points, tolerance=0.05)
+
+    np.testing.assert_array_equal(simplified, points[[0, -1]])
+
+
+def test_simplify_keeps_corners():
+    points = np.array([[0, 0], [1, 0], [2, 0], [2, 1], [2, 2], [1, 2], [0, 2], [0, 0]])
+
+    simplified = simplify_track(points.astype(float), tolerance=0.1)
+
+    np.testing.assert_array_equal(simplified, [[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]])
+
+
+def test_simplified_track_stays_within_tolerance():
+    rng = np.random.default_rng(0)
+    points = np.cumsum(rng.normal(size=(5000, 2)), axis=0)
+
+    simplified = simplify_track(points, tolerance=2.0)
+
+    assert len(simplified) < len(points) / 5
+    distances = np.min(
+        [
+            _distances_to_segment(points, start, end)
+            for start, end in zip(simplified[:-1], simplified[1:])
+        ],
+        axis=0,
+    )
+    assert distances.max() <= 2.0
@@ -1,8 +1,15 @@
 from tempfile import NamedTemporaryFile
+import tracemalloc
 
+import numpy as np
 import pytest
 
-from gpx2mesh.track import InvalidTrackFile, TrackBounds, load_track
+from gpx2mesh.track import (
+    InvalidTrackFile,
+    TrackBounds,
+    load_track,
+    load_track_points,
+)
 
 
 def test_load_track():
@@ -67,5 +74,76 @@ def test_load_track_empty_trackseg():
 </gpx>""")
         fp.close()
 
-        with pytest.raises(InvalidTrackFile):
+        with pytest.raises(InvalidTrackFile, match="<trkseg> element is empty"):
             load_track(fp.name)
+
+
+@pytest.mark.parametrize(
+    "trkpt", ['<trkpt lon="4.5"/>', '<trkpt lat="north" lon="4.5"/>']
+)
+def test_load_track_invalid_trkpt(tmp_path, trkpt):
+    (tmp_path / "track.gpx").write_text(
+        f"<gpx><trk><trkseg>{trkpt}</trkseg></trk></gpx>"
+    )
+
+    with pytest.raises(InvalidTrackFile, match="Invalid <trkpt> element"):
+        load_track(tmp_path / "track.gpx")
+
+
+def test_load_track_points_from_every_segment():
+    with NamedTemporaryFile("w", delete_on_close=False) as fp:
+        fp.write("""<?xml version="1.0" encoding="UTF-8"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="local test">
+  <trk>
+    <trkseg>
+      <trkpt lat="45.1" lon="4.1"><ele>172</ele><time>2025-06-17T19:08:32Z</time></trkpt>
+      <trkpt lat="45.2" lon="4.2"><ele>174</ele><time>2025-06-17T19:08:35Z</time></trkpt>
+    </trkseg>
+    <trkseg>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="45.3" lon="4.3"><time>2025-06-17T19:08:38Z</time></trkpt>
+    </trkseg>
+  </trk>
+  <trk>
+    <trkseg>
+      <trkpt lat="45.4" lon="4.0"><ele>180</ele></trkpt>
+    </trkseg>
+  </trk>
+</gpx>""")
+        fp.close()
+
+        track = load_track_points(fp.name, elevations=True, times=True)
+        points, bounds = load_track(fp.name)
+
+    np.testing.assert_array_equal(
+        track.points, [[4.1, 45.1], [4.2, 45.2], [4.3, 45.3], [4.0, 45.4]]
+    )
+    np.testing.assert_array_equal(track.elevations, [172, 174, np.nan, 180])
+    np.testing.assert_array_equal(track.times - track.times[0], [0.0, 3.0, 6.0, np.nan])
+    np.testing.assert_array_equal(track.segments, [0, 2, 3])
+
+    np.testing.assert_array_equal(points, track.points)
+    assert bounds == TrackBounds(lat_min=45.1, lat_max=45.4, lon_min=4.0, lon_max=4.3)
+
+
+def test_load_track_memory_does_not_grow_with_the_file():
+    with NamedTemporaryFile("w", delete_on_close=False) as fp:
+        fp.write('<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>')
+        for i in range(20_000):
+            fp.write(
+                f'<trkpt lat="{45 + i * 1e-6}" lon="4.5">'
+                "<ele>172</ele><time>2025-06-17T19:08:32Z</time>"
+                "<extensions><hr>120</hr></extensions></trkpt>"
+            )
+        fp.write("</trkseg></trk></gpx>")
+        fp.close()
+
+        tracemalloc.start()
+        track, _ = load_track(fp.name)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    assert len(track) == 20_000
+    # The parsed points take 320 kB, the growable buffer up to four times as much
+    assert peak < 4 * 1024**2